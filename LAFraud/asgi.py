@@ -3,6 +3,20 @@ ASGI config for LAFraud project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving through this module enables the ASGI deployment mode: the read-heavy
+game views (home, properties, stock market) are routed to the async versions
+in ``game/async_views.py``, which run their independent queries concurrently.
+Run it with any ASGI server, for example::
+
+    uvicorn LAFraud.asgi:application --workers 4
+
+Live updates reach streams in any worker: events are relayed between the
+processes of one host through a file in the temporary directory (see
+``game/live.py``), so every worker and the ``run_exchange`` engine must run on
+the same host.
+
+Set ``LAFRAUD_ASYNC_VIEWS=0`` to serve the synchronous views through ASGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +26,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LAFraud.settings')
+os.environ.setdefault('LAFRAUD_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +49,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'game.middleware.PlayerContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -70,6 +73,48 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'LAFraud.wsgi.application'
 
+# Seconds a player's context (user, profile, inventory, gang) stays cached between
+# changes; see game/player.py.
+PLAYER_CONTEXT_TTL = 10
+
+CACHES = {
+    # Per-process first level of game/caching.py, also used for the player contexts.
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Second level of game/caching.py, shared by every process on the host; also holds what
+    # every process must see at once: player context versions and effect modifiers.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'lafraud-cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# How long an entry of game/caching.py stays in a process's own cache, and how
+# often a process re-reads the generations another process may have bumped.
+CACHE_L1_TIMEOUT = 30
+CACHE_GENERATION_TTL = 1
+
+# Action rate limits: (capacity, period) lets a player burst to `capacity` actions
+# and then sustain `capacity` per `period` seconds.
+ACTION_THROTTLES = {
+    'default': (30, 60),
+    'inventory': (20, 60),
+    'shop': (10, 60),
+    'train': (10, 60),
+    'travel': (5, 60),
+    'money': (20, 60),
+    'stocks': (30, 60),
+}
+
+# Players can share an address, so an IP's buckets are this many times larger.
+THROTTLE_IP_FACTOR = 5
+
+# ASGI deployment mode: when served through LAFraud.asgi, the read-heavy game
+# views are routed to their async versions in game/async_views.py.
+ASYNC_VIEWS = os.environ.get('LAFRAUD_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -78,6 +123,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Concurrent writers wait for the lock instead of failing with "database is locked".
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # An on-disk test database, so tests can exercise concurrent requests from several threads
+        # (the default in-memory one uses table locks that fail instead of waiting).
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
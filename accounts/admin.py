@@ -1,7 +1,14 @@
-from django.contrib import admin
+from decimal import Decimal
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
+from game import operations
+from game.admin import PlayerSearchMixin
+from game.models import Item
 from .models import User, Profile
 
 
@@ -13,7 +20,7 @@ class ProfileInline(admin.StackedInline):
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(PlayerSearchMixin, BaseUserAdmin):
     """Custom User Admin"""
     
     fieldsets = (
@@ -36,22 +43,90 @@ class UserAdmin(BaseUserAdmin):
     inlines = (ProfileInline,)
 
 
+class BulkActionForm(ActionForm):
+    """Parameters for the bulk profile actions, shown next to the action menu."""
+    
+    amount = forms.DecimalField(
+        label=_('Amount'), required=False, max_digits=15, decimal_places=2, min_value=Decimal('0.01'),
+    )
+    item = forms.ModelChoiceField(label=_('Item'), queryset=Item.objects.all(), required=False)
+    quantity = forms.IntegerField(label=_('Quantity'), required=False, min_value=1, initial=1)
+    dry_run = forms.BooleanField(label=_('Dry run'), required=False)
+
+
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(PlayerSearchMixin, admin.ModelAdmin):
     """Profile Admin"""
     
     list_display = ('user', 'level', 'character_type', 'money', 'is_in_jail', 'is_in_hospital')
-    list_filter = ('character_type', 'is_in_jail', 'is_in_hospital')
+    list_filter = ('character_type', 'is_in_jail', 'is_in_hospital', 'gang_memberships__gang')
+    list_select_related = ('user',)
     search_fields = ('user__email', 'user__username_display')
-    readonly_fields = ('user',)
+    readonly_fields = ('user', 'version')
+    action_form = BulkActionForm
+    actions = ('release_from_jail', 'release_from_hospital', 'reset_cooldowns', 'refund', 'grant_item')
     
     fieldsets = (
-        (_('User'), {'fields': ('user',)}),
+        (_('User'), {'fields': ('user', 'version')}),
         (_('Character Type'), {'fields': ('character_type',)}),
         (_('Attributes'), {'fields': ('strength', 'speed', 'dexterity', 'defense')}),
         (_('Stats'), {'fields': ('level', 'experience', 'life', 'max_life', 'energy', 'max_energy', 
                                 'endurance', 'max_endurance', 'mood', 'max_mood', 'knowledge_points')}),
         (_('Status'), {'fields': ('is_in_jail', 'jail_release_time', 'is_in_hospital', 'hospital_release_time')}),
-        (_('Money'), {'fields': ('money', 'bank_money')}),
-        (_('Location'), {'fields': ('current_location',)}),
-    )
\ No newline at end of file
+        (_('Money'), {'fields': ('money', 'bank_money', 'bank_accrued_at', 'bank_interest_carry')}),
+        (_('Location'), {'fields': ('current_location', 'travel_destination', 'departure_time', 'arrival_time')}),
+    )
+    
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Only the edited columns, so the player's concurrent actions are not undone.
+            obj.save(update_fields=form.changed_data)
+        else:
+            super().save_model(request, obj, form, change)
+    
+    def _action_params(self, request):
+        """Validated parameters of the submitted action form, or None if they are invalid."""
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        return form.cleaned_data if form.is_valid() else None
+    
+    def _run_bulk(self, request, description, operation, *args):
+        """Run a set-based operation on the selected profiles, or only count them on a dry run."""
+        dry_run = request.POST.get('dry_run') == 'on'
+        count = operation(*args, dry_run=dry_run)
+        if dry_run:
+            self.message_user(request, f"Dry run: {description} would affect {count} rows.", messages.INFO)
+            return
+        operations.log_operation(request.user, f"{description}: {count} rows")
+        self.message_user(request, f"{description}: {count} rows updated.", messages.SUCCESS)
+    
+    @admin.action(description=_('Release selected profiles from jail'))
+    def release_from_jail(self, request, queryset):
+        self._run_bulk(request, 'Release from jail', operations.release_from_jail, queryset)
+    
+    @admin.action(description=_('Release selected profiles from hospital'))
+    def release_from_hospital(self, request, queryset):
+        self._run_bulk(request, 'Release from hospital', operations.release_from_hospital, queryset)
+    
+    @admin.action(description=_('Reset crime and mission cooldowns'))
+    def reset_cooldowns(self, request, queryset):
+        self._run_bulk(request, 'Reset cooldowns', operations.reset_cooldowns, queryset)
+    
+    @admin.action(description=_('Refund the given amount'))
+    def refund(self, request, queryset):
+        params = self._action_params(request)
+        if not params or not params['amount']:
+            self.message_user(request, "Enter a positive amount to refund.", messages.ERROR)
+            return
+        amount = params['amount']
+        self._run_bulk(request, f'Refund ${amount}', operations.refund, queryset, amount)
+    
+    @admin.action(description=_('Grant the given item'))
+    def grant_item(self, request, queryset):
+        params = self._action_params(request)
+        if not params or not params['item']:
+            self.message_user(request, "Choose an item to grant.", messages.ERROR)
+            return
+        item = params['item']
+        quantity = params['quantity'] or 1
+        self._run_bulk(request, f'Grant {quantity} x {item.name}', operations.grant_item, queryset, item, quantity)
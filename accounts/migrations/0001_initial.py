@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:37
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('strength', models.IntegerField(default=10)),
+                ('speed', models.IntegerField(default=10)),
+                ('dexterity', models.IntegerField(default=10)),
+                ('defense', models.IntegerField(default=10)),
+                ('training_progress', models.FloatField(default=0)),
+                ('level', models.IntegerField(default=1)),
+                ('experience', models.IntegerField(default=0)),
+                ('life', models.IntegerField(default=100)),
+                ('max_life', models.IntegerField(default=100)),
+                ('energy', models.IntegerField(default=100)),
+                ('max_energy', models.IntegerField(default=100)),
+                ('endurance', models.IntegerField(default=100)),
+                ('max_endurance', models.IntegerField(default=100)),
+                ('mood', models.IntegerField(default=100)),
+                ('max_mood', models.IntegerField(default=100)),
+                ('knowledge_points', models.IntegerField(default=0)),
+                ('is_in_jail', models.BooleanField(default=False)),
+                ('jail_release_time', models.DateTimeField(blank=True, null=True)),
+                ('is_in_hospital', models.BooleanField(default=False)),
+                ('hospital_release_time', models.DateTimeField(blank=True, null=True)),
+                ('character_type', models.CharField(choices=[('criminal', 'Criminal'), ('police', 'Police Officer')], default='criminal', max_length=10)),
+                ('money', models.DecimalField(decimal_places=2, default=1000.0, max_digits=15)),
+                ('bank_money', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('bank_accrued_at', models.DateTimeField(blank=True, help_text='Interest is settled up to this time', null=True)),
+                ('bank_interest_carry', models.DecimalField(decimal_places=10, default=0, help_text='Interest earned below a cent, not credited yet', max_digits=12)),
+                ('departure_time', models.DateTimeField(blank=True, null=True)),
+                ('arrival_time', models.DateTimeField(blank=True, null=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('email', models.EmailField(max_length=254, unique=True, verbose_name='email address')),
+                ('is_email_verified', models.BooleanField(default=False)),
+                ('email_verification_token', models.CharField(blank=True, max_length=100, null=True)),
+                ('username_display', models.CharField(max_length=30, unique=True)),
+                ('date_joined', models.DateTimeField(auto_now_add=True)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'abstract': False,
+            },
+            managers=[
+                ('objects', accounts.models.UserManager()),
+            ],
+        ),
+    ]
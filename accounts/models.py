@@ -1,8 +1,13 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.db.models import F
 from django.utils.translation import gettext_lazy as _
 
 
+# Where players without a current_location are.
+HOME_CITY = 'Home City'
+
+
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
 
@@ -68,6 +73,8 @@ class Profile(models.Model):
     speed = models.IntegerField(default=10)
     dexterity = models.IntegerField(default=10)
     defense = models.IntegerField(default=10)
+    # Fraction of a stat point trained but not gained yet, carried into the next gym batch
+    training_progress = models.FloatField(default=0)
     
     # Character stats
     level = models.IntegerField(default=1)
@@ -98,9 +105,46 @@ class Profile(models.Model):
     # Money
     money = models.DecimalField(max_digits=15, decimal_places=2, default=1000.00)
     bank_money = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    bank_accrued_at = models.DateTimeField(null=True, blank=True, help_text="Interest is settled up to this time")
+    bank_interest_carry = models.DecimalField(
+        max_digits=12, decimal_places=10, default=0, help_text="Interest earned below a cent, not credited yet",
+    )
+    
+    # Location (none means the Home City)
+    current_location = models.ForeignKey(
+        'game.Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='players',
+    )
+    
+    # Travel in progress
+    travel_destination = models.ForeignKey(
+        'game.Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='incoming_players',
+    )
+    departure_time = models.DateTimeField(null=True, blank=True)
+    arrival_time = models.DateTimeField(null=True, blank=True)
+    
+    # Bumped by every write, so a change computed from an earlier read can detect conflicts
+    version = models.PositiveIntegerField(default=0)
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        bumped = not self._state.adding and (update_fields is None or bool(update_fields))
+        if self._state.adding:
+            self.version += 1
+        elif bumped:
+            # Whole-row saves are writes too, so version checks notice them. The stored
+            # version is incremented, not the one this copy was loaded with, which
+            # another request may have moved on since.
+            self.version = F('version') + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = [*update_fields, 'version']
+        super().save(*args, **kwargs)
+        if bumped:
+            # Deferred rather than refreshed: the stored value is only read back if used.
+            del self.version
     
-    # Location
-    current_location = models.CharField(max_length=50, default='Home City')
+    @property
+    def location_name(self):
+        return self.current_location.name if self.current_location_id else HOME_CITY
     
     def __str__(self):
         return f"{self.user.username_display}'s Profile"
\ No newline at end of file
@@ -9,6 +9,7 @@ from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.html import strip_tags
 
+from game import bank, profiles
 from .forms import UserRegistrationForm, UserLoginForm, EmailVerificationForm, CharacterCreationForm
 from .models import User, Profile
 
@@ -139,8 +140,9 @@ def character_creation(request, user_id):
         form = CharacterCreationForm(request.POST)
         if form.is_valid():
             character_type = form.cleaned_data.get('character_type')
-            profile.character_type = character_type
-            profile.save()
+            if not profiles.apply(profile, values={'character_type': character_type}, check_version=True):
+                messages.error(request, 'Your profile changed while you were choosing. Please try again.')
+                return redirect('character_creation', user_id=user.id)
             
             messages.success(request, f'Your {profile.get_character_type_display()} character has been created!')
             return redirect('game_home')
@@ -155,5 +157,6 @@ def profile_view(request):
     """View for user profile."""
     user = request.user
     profile = user.profile
+    bank.settle(profile)
     
     return render(request, 'accounts/profile.html', {'user': user, 'profile': profile})
\ No newline at end of file
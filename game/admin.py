@@ -1,14 +1,107 @@
+from functools import reduce
+from operator import or_
+
 from django.contrib import admin
+from django.contrib.admin.utils import lookup_spawns_duplicates
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
 from django.utils.translation import gettext_lazy as _
 
+from . import search
+from .caching import namespace, shared_key
+from .effects import refresh_modifiers
 from .models import (
-    Item, Weapon, Armor, MedicalSupply, Booster, TrainingEnhancer, TemporaryItem,
+    Item, Weapon, Armor, MedicalSupply, Booster, TrainingEnhancer, TemporaryItem, ActiveEffect,
     Inventory, InventoryItem, Property, OwnedProperty, Location, Mission, CompletedMission,
-    Gang, GangMember, Crime, CommittedCrime, Gym, GymSession, Battle, Bounty,
-    StockMarket, StockOwnership, Achievement, EarnedAchievement
+    Gang, GangMember, GangLedgerEntry, Crime, CommittedCrime, Gym, GymSession, Battle, Bounty,
+    StockMarket, StockPosition, StockOwnership, StockOrder, StockTrade, Achievement, EarnedAchievement, ExportWatermark,
+    EconomySnapshot
 )
 
 
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids an exact COUNT(*) over large history tables on every page view."""
+    
+    max_exact_count = 10000
+    # Seconds an unfiltered table's count is reused; it lags inserts and deletes by at most this.
+    count_ttl = 300
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            # Unfiltered: the real row count, counted once per count_ttl and process.
+            model = queryset.model
+            return caches['default'].get_or_set(
+                shared_key(f'count:{namespace(model)}'), model._default_manager.count, self.count_ttl,
+            )
+        # Filtered: count exactly, but stop scanning past the cap.
+        return queryset.order_by().values('pk')[:self.max_exact_count + 1].count()
+
+
+class PlayerSearchMixin:
+    """
+    Admin search that finds players' display names through the player search
+    index (game.search) instead of a LIKE scan of the users table.
+    
+    The search keeps Django's semantics: every word of it must be found, in any
+    of the search fields, case-insensitively. A word is looked up in display names
+    with ``search.containing()``, which narrows the names down through their
+    trigrams; a word shorter than a trigram only matches the start of a name,
+    where Django would scan for it anywhere. Each search field is matched with a subquery on the column of its
+    first relation (``profile_id IN (...)``), which that foreign key's index
+    serves, so the changelist never scans the table it lists.
+    """
+    
+    def _search_lookup(self, path, word):
+        if path.endswith(search.NAME_FIELD):
+            names = search.containing(word).values('user_id')
+            return Q(**{f'{path[:-len(search.NAME_FIELD)]}pk__in': names})
+        return Q(**{f'{path}__icontains': word})
+    
+    def _field_lookup(self, opts, field, word):
+        first, __, rest = field.partition('__')
+        relation = opts.get_field(first) if rest else None
+        if relation is not None and relation.concrete and (relation.many_to_one or relation.one_to_one):
+            related = relation.related_model._default_manager.filter(self._search_lookup(rest, word))
+            return Q(**{f'{first}__in': related.values('pk')})
+        return self._search_lookup(field, word)
+    
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        if (
+            not search_term.strip()
+            or not any(field.endswith(search.NAME_FIELD) for field in search_fields)
+            or any(field[0] in '^=@' for field in search_fields)
+        ):
+            return super().get_search_results(request, queryset, search_term)
+        opts = queryset.model._meta
+        matches = Q()
+        # Split as Django's own search does, so quoted phrases stay one word.
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            matches &= reduce(or_, (self._field_lookup(opts, field, bit) for field in search_fields))
+        may_have_duplicates = any(lookup_spawns_duplicates(opts, field) for field in search_fields)
+        return queryset.filter(matches), may_have_duplicates
+
+
+class HistoryAdmin(PlayerSearchMixin, admin.ModelAdmin):
+    """
+    Base admin for the large per-player history tables.
+    
+    Related profiles are joined into the changelist query, counts are cached or capped,
+    foreign keys use autocomplete widgets and dates are navigated with range
+    filters instead of a date hierarchy scan.
+    """
+    
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 class WeaponInline(admin.StackedInline):
     model = Weapon
     can_delete = False
@@ -71,14 +164,29 @@ class ItemAdmin(admin.ModelAdmin):
         return []
 
 
+@admin.register(ActiveEffect)
+class ActiveEffectAdmin(PlayerSearchMixin, admin.ModelAdmin):
+    list_display = ('profile', 'item', 'effect_type', 'amount', 'expires_at')
+    list_filter = ('effect_type',)
+    search_fields = ('profile__user__username_display', 'item__name')
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_modifiers(obj.profile_id)
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_modifiers(obj.profile_id)
+
+
 @admin.register(Inventory)
-class InventoryAdmin(admin.ModelAdmin):
+class InventoryAdmin(PlayerSearchMixin, admin.ModelAdmin):
     list_display = ('profile',)
     search_fields = ('profile__user__email', 'profile__user__username_display')
 
 
 @admin.register(InventoryItem)
-class InventoryItemAdmin(admin.ModelAdmin):
+class InventoryItemAdmin(PlayerSearchMixin, admin.ModelAdmin):
     list_display = ('inventory', 'item', 'quantity', 'equipped')
     list_filter = ('equipped',)
     search_fields = ('inventory__profile__user__username_display', 'item__name')
@@ -92,7 +200,7 @@ class PropertyAdmin(admin.ModelAdmin):
 
 
 @admin.register(OwnedProperty)
-class OwnedPropertyAdmin(admin.ModelAdmin):
+class OwnedPropertyAdmin(PlayerSearchMixin, admin.ModelAdmin):
     list_display = ('profile', 'property', 'purchase_date')
     search_fields = ('profile__user__username_display', 'property__name')
     date_hierarchy = 'purchase_date'
@@ -113,10 +221,12 @@ class MissionAdmin(admin.ModelAdmin):
 
 
 @admin.register(CompletedMission)
-class CompletedMissionAdmin(admin.ModelAdmin):
+class CompletedMissionAdmin(HistoryAdmin):
     list_display = ('profile', 'mission', 'completion_date', 'next_available_time')
+    list_filter = (('completion_date', admin.DateFieldListFilter),)
+    list_select_related = ('profile__user', 'mission')
     search_fields = ('profile__user__username_display', 'mission__name')
-    date_hierarchy = 'completion_date'
+    autocomplete_fields = ('profile', 'mission')
 
 
 @admin.register(Gang)
@@ -127,13 +237,23 @@ class GangAdmin(admin.ModelAdmin):
 
 
 @admin.register(GangMember)
-class GangMemberAdmin(admin.ModelAdmin):
+class GangMemberAdmin(PlayerSearchMixin, admin.ModelAdmin):
     list_display = ('profile', 'gang', 'role', 'join_date')
     list_filter = ('role', 'gang')
     search_fields = ('profile__user__username_display', 'gang__name')
     date_hierarchy = 'join_date'
 
 
+@admin.register(GangLedgerEntry)
+class GangLedgerEntryAdmin(HistoryAdmin):
+    list_display = ('gang', 'profile', 'kind', 'amount', 'experience', 'date')
+    list_filter = ('kind', ('date', admin.DateFieldListFilter))
+    list_select_related = ('gang', 'profile__user')
+    search_fields = ('gang__name', 'profile__user__username_display')
+    autocomplete_fields = ('gang', 'profile')
+    readonly_fields = ('compacted',)
+
+
 @admin.register(Crime)
 class CrimeAdmin(admin.ModelAdmin):
     list_display = ('name', 'required_level', 'energy_cost', 'jail_risk', 'jail_time')
@@ -141,11 +261,12 @@ class CrimeAdmin(admin.ModelAdmin):
 
 
 @admin.register(CommittedCrime)
-class CommittedCrimeAdmin(admin.ModelAdmin):
+class CommittedCrimeAdmin(HistoryAdmin):
     list_display = ('profile', 'crime', 'success', 'money_earned', 'date')
-    list_filter = ('success',)
+    list_filter = ('success', ('date', admin.DateFieldListFilter))
+    list_select_related = ('profile__user', 'crime')
     search_fields = ('profile__user__username_display', 'crime__name')
-    date_hierarchy = 'date'
+    autocomplete_fields = ('profile', 'crime')
 
 
 @admin.register(Gym)
@@ -155,23 +276,34 @@ class GymAdmin(admin.ModelAdmin):
 
 
 @admin.register(GymSession)
-class GymSessionAdmin(admin.ModelAdmin):
+class GymSessionAdmin(HistoryAdmin):
     list_display = ('profile', 'gym', 'stat_trained', 'energy_used', 'stat_gain', 'date')
-    list_filter = ('stat_trained', 'gym')
+    list_filter = ('stat_trained', 'gym', ('date', admin.DateFieldListFilter))
+    list_select_related = ('profile__user', 'gym')
     search_fields = ('profile__user__username_display', 'gym__name')
-    date_hierarchy = 'date'
+    autocomplete_fields = ('profile', 'gym')
 
 
 @admin.register(Battle)
-class BattleAdmin(admin.ModelAdmin):
+class BattleAdmin(HistoryAdmin):
     list_display = ('attacker', 'defender', 'attacker_won', 'money_stolen', 'experience_gained', 'date')
-    list_filter = ('attacker_won',)
+    list_filter = ('attacker_won', ('date', admin.DateFieldListFilter))
+    list_select_related = ('attacker__user', 'defender__user')
     search_fields = ('attacker__user__username_display', 'defender__user__username_display')
-    date_hierarchy = 'date'
+    autocomplete_fields = ('attacker', 'defender')
+    readonly_fields = ('replay_summary',)
+    
+    @admin.display(description='Replay')
+    def replay_summary(self, obj):
+        rounds = obj.rounds
+        if not rounds:
+            return '-'
+        last = rounds[-1]
+        return f"{len(rounds)} rounds, {len(obj.replay)} bytes, final life {last.attacker_life} / {last.defender_life}"
 
 
 @admin.register(Bounty)
-class BountyAdmin(admin.ModelAdmin):
+class BountyAdmin(PlayerSearchMixin, admin.ModelAdmin):
     list_display = ('target', 'placer', 'amount', 'is_active', 'placed_date')
     list_filter = ('is_active',)
     search_fields = ('target__user__username_display', 'placer__user__username_display')
@@ -184,11 +316,43 @@ class StockMarketAdmin(admin.ModelAdmin):
     search_fields = ('name', 'symbol', 'description')
 
 
+@admin.register(StockPosition)
+class StockPositionAdmin(PlayerSearchMixin, admin.ModelAdmin):
+    list_display = ('profile', 'stock', 'shares', 'cost_basis', 'average_cost')
+    list_select_related = ('profile__user', 'stock')
+    search_fields = ('profile__user__username_display', 'stock__symbol')
+    autocomplete_fields = ('profile', 'stock')
+    # Kept in step with the lots by game.portfolio.
+    readonly_fields = ('shares', 'cost_basis')
+
+
 @admin.register(StockOwnership)
-class StockOwnershipAdmin(admin.ModelAdmin):
+class StockOwnershipAdmin(HistoryAdmin):
     list_display = ('profile', 'stock', 'shares', 'purchase_price', 'purchase_date')
+    list_filter = (('purchase_date', admin.DateFieldListFilter),)
+    list_select_related = ('profile__user', 'stock')
     search_fields = ('profile__user__username_display', 'stock__name', 'stock__symbol')
-    date_hierarchy = 'purchase_date'
+    autocomplete_fields = ('profile', 'stock')
+
+
+@admin.register(StockOrder)
+class StockOrderAdmin(HistoryAdmin):
+    list_display = ('profile', 'stock', 'side', 'price', 'quantity', 'remaining', 'status', 'placed_date')
+    list_filter = ('side', 'status', ('placed_date', admin.DateFieldListFilter))
+    list_select_related = ('profile__user', 'stock')
+    search_fields = ('profile__user__username_display', 'stock__symbol')
+    autocomplete_fields = ('profile', 'stock')
+    # Orders are changed only by the exchange engine.
+    readonly_fields = ('remaining', 'status')
+
+
+@admin.register(StockTrade)
+class StockTradeAdmin(HistoryAdmin):
+    list_display = ('stock', 'price', 'shares', 'buy_order', 'sell_order', 'date')
+    list_filter = (('date', admin.DateFieldListFilter),)
+    list_select_related = ('stock',)
+    search_fields = ('stock__symbol',)
+    raw_id_fields = ('buy_order', 'sell_order')
 
 
 @admin.register(Achievement)
@@ -199,7 +363,27 @@ class AchievementAdmin(admin.ModelAdmin):
 
 
 @admin.register(EarnedAchievement)
-class EarnedAchievementAdmin(admin.ModelAdmin):
+class EarnedAchievementAdmin(HistoryAdmin):
     list_display = ('profile', 'achievement', 'earned_date')
+    list_filter = (('earned_date', admin.DateFieldListFilter),)
+    list_select_related = ('profile__user', 'achievement')
     search_fields = ('profile__user__username_display', 'achievement__name')
-    date_hierarchy = 'earned_date'
\ No newline at end of file
+    autocomplete_fields = ('profile', 'achievement')
+
+
+@admin.register(ExportWatermark)
+class ExportWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_id', 'rows_exported', 'updated_at')
+    readonly_fields = ('rows_exported', 'updated_at')
+
+
+@admin.register(EconomySnapshot)
+class EconomySnapshotAdmin(admin.ModelAdmin):
+    list_display = ('taken_at', 'players', 'wallet_money', 'bank_money', 'property_money', 'gang_money', 'stock_value')
+    date_hierarchy = 'taken_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # The design registry's record types are built from the models here; its data is
+        # loaded on first use, since Django warns against queries during app initialization.
+        from . import registry  # noqa: F401
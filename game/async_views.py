@@ -0,0 +1,235 @@
+"""
+Async versions of the read-heavy game views, used when the project is served
+through ASGI (see ``LAFraud/asgi.py``).
+
+Independent queries are evaluated concurrently, each in its own worker thread
+with its own database connection, instead of one after another.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+from . import bank, portfolio, profiles, registry
+from .live import bus, encode_event, from_json, profile_payload, profile_topic, stock_topic, to_json
+from .models import (
+    CompletedMission, CommittedCrime, Battle, OwnedProperty, StockMarket, StockOrder, StockPosition,
+)
+
+# Seconds of silence after which a comment line is sent to keep proxies from closing the stream.
+KEEPALIVE_INTERVAL = 15
+
+
+def _evaluate(queryset):
+    """Evaluate a queryset in a worker thread and release that thread's connection."""
+    try:
+        return list(queryset)
+    finally:
+        connections.close_all()
+
+
+async def fetch_all(*querysets):
+    """Evaluate several independent querysets concurrently, preserving order."""
+    return await asyncio.gather(*(
+        sync_to_async(_evaluate, thread_sensitive=False)(queryset) for queryset in querysets
+    ))
+
+
+async def _get_profile(request):
+    player = await request.aplayer()
+    return player.profile
+
+
+async def _render(request, template_name, context):
+    # Template rendering touches the session and context processors, which are synchronous.
+    return await sync_to_async(render)(request, template_name, context)
+
+
+def _release(profile, places, now):
+    """
+    Release the player from the ``places`` ('jail', 'hospital') whose time is up.
+
+    Each release is the same conditional update as in the synchronous view, so a
+    player sent back in the meantime stays there. Returns the places released from.
+    """
+    released = []
+    for place in places:
+        if profiles.apply(
+            profile,
+            values={f'is_in_{place}': False, f'{place}_release_time': None},
+            where={f'is_in_{place}': True, f'{place}_release_time__lte': now},
+        ):
+            released.append(place)
+    return released
+
+
+@login_required
+async def game_home(request):
+    """Home page for the game."""
+    profile = await _get_profile(request)
+    await sync_to_async(bank.settle)(profile)
+
+    # Get player stats
+    stats = {
+        'level': profile.level,
+        'experience': profile.experience,
+        'life': profile.life,
+        'max_life': profile.max_life,
+        'energy': profile.energy,
+        'max_energy': profile.max_energy,
+        'endurance': profile.endurance,
+        'max_endurance': profile.max_endurance,
+        'mood': profile.mood,
+        'max_mood': profile.max_mood,
+        'knowledge_points': profile.knowledge_points,
+        'money': profile.money,
+        'bank_money': profile.bank_money,
+        'current_location': profile.location_name,
+    }
+
+    # Check if player is in jail or hospital
+    status = {
+        'is_in_jail': profile.is_in_jail,
+        'jail_release_time': profile.jail_release_time,
+        'is_in_hospital': profile.is_in_hospital,
+        'hospital_release_time': profile.hospital_release_time,
+    }
+
+    # Check if player can be released from jail or hospital
+    now = timezone.now()
+    due = []
+    if profile.is_in_jail and profile.jail_release_time and profile.jail_release_time <= now:
+        due.append('jail')
+        status['is_in_jail'] = False
+
+    if profile.is_in_hospital and profile.hospital_release_time and profile.hospital_release_time <= now:
+        due.append('hospital')
+        status['is_in_hospital'] = False
+
+    # Get recent activities
+    recent_activity = fetch_all(
+        CommittedCrime.objects.filter(profile=profile).select_related('crime').order_by('-date')[:5],
+        CompletedMission.objects.filter(profile=profile).select_related('mission__location')
+        .order_by('-completion_date')[:5],
+        Battle.objects.filter(attacker=profile).select_related('defender__user').order_by('-date')[:5],
+    )
+    if due:
+        released, (recent_crimes, recent_missions, recent_battles) = await asyncio.gather(
+            sync_to_async(_release)(profile, due, now),
+            recent_activity,
+        )
+        if 'jail' in released:
+            messages.success(request, 'You have been released from jail!')
+        if 'hospital' in released:
+            messages.success(request, 'You have been released from the hospital!')
+    else:
+        recent_crimes, recent_missions, recent_battles = await recent_activity
+
+    context = {
+        'profile': profile,
+        'stats': stats,
+        'status': status,
+        'recent_crimes': recent_crimes,
+        'recent_missions': recent_missions,
+        'recent_battles': recent_battles,
+    }
+
+    return await _render(request, 'game/home.html', context)
+
+
+@login_required
+async def properties(request):
+    """View for properties."""
+    profile = await _get_profile(request)
+
+    design, (owned_properties,) = await asyncio.gather(
+        sync_to_async(registry.get)(),
+        fetch_all(OwnedProperty.objects.filter(profile=profile).select_related('property')),
+    )
+    properties = design.properties
+
+    context = {
+        'profile': profile,
+        'properties': properties,
+        'owned_properties': owned_properties,
+    }
+
+    return await _render(request, 'game/properties.html', context)
+
+
+@login_required
+async def stock_market(request):
+    """View for the stock market."""
+    profile = await _get_profile(request)
+
+    (stocks, positions, open_orders), valuation = await asyncio.gather(
+        fetch_all(
+            StockMarket.objects.all(),
+            portfolio.positions(profile),
+            StockOrder.objects.filter(profile=profile, status='open').select_related('stock'),
+        ),
+        sync_to_async(portfolio.valuation)(profile),
+    )
+
+    context = {
+        'profile': profile,
+        'stocks': stocks,
+        'positions': positions,
+        'portfolio': valuation,
+        'open_orders': open_orders,
+        'live_stocks': [stock.symbol for stock in stocks],
+    }
+
+    return await _render(request, 'game/stock_market.html', context)
+
+
+@login_required
+async def live_updates(request):
+    """
+    Server-sent events stream of the player's stats, status timers and stock prices.
+
+    The first event is a full ``stats`` snapshot; later ``stats`` events only carry
+    the fields that changed. ``price`` events are sent for the symbols listed in
+    ``?stocks=``, or for the player's own holdings when none are given.
+    """
+    profile = await _get_profile(request)
+
+    symbols = [symbol for symbol in request.GET.get('stocks', '').split(',') if symbol]
+    if not symbols:
+        symbols = [
+            symbol async for symbol in StockPosition.objects.filter(profile=profile, shares__gt=0)
+            .values_list('stock__symbol', flat=True)
+        ]
+
+    subscription = bus.subscribe([profile_topic(profile.pk)] + [stock_topic(symbol) for symbol in symbols])
+
+    async def stream():
+        try:
+            # Relayed events arrive as JSON values, so the snapshot is compared in the same form.
+            sent = from_json(to_json(profile_payload(profile)))
+            yield encode_event('stats', sent)
+            while True:
+                try:
+                    event, frame, data = await asyncio.wait_for(subscription.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b': keepalive\n\n'
+                    continue
+                if frame is not None:
+                    yield frame
+                    continue
+                delta = {field: value for field, value in data.items() if sent.get(field) != value}
+                if delta:
+                    sent = data
+                    yield encode_event(event, delta)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
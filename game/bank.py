@@ -0,0 +1,162 @@
+"""
+Bank accounts with lazily accrued interest.
+
+``Profile.bank_money`` earns interest compounded daily at ``ANNUAL_RATE``. Nothing
+runs on a schedule: the interest owed since ``Profile.bank_accrued_at`` is
+computed from the elapsed time when the balance is shown, deposited into or
+withdrawn from, and settled with a conditional update that only applies if
+nobody else touched the account in between.
+
+Interest is credited in whole cents. The sub-cent part is kept in
+``Profile.bank_interest_carry`` and added to the next settlement, so settling
+often loses nothing. A display read only settles once at least a cent is owed,
+so reads of small balances do not write; deposits and withdrawals always settle.
+"""
+import operator
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal, localcontext
+from functools import reduce
+
+from django.db.models import Case, DecimalField, Q, Value, When
+from django.utils import timezone
+
+from accounts.models import Profile
+from . import profiles
+from .player import invalidate_players
+
+ANNUAL_RATE = Decimal('0.05')
+PERIODS_PER_YEAR = 365
+PERIOD = timedelta(days=1)
+CENT = Decimal('0.01')
+# Precision of Profile.bank_interest_carry.
+CARRY = Decimal('1e-10')
+# Attempts at a deposit or withdrawal that keeps losing the race to other writes.
+RETRIES = 5
+
+
+class BankError(Exception):
+    """Raised when a deposit or withdrawal cannot be made."""
+
+
+def accrued_interest(balance, accrued_at, now, carry=Decimal(0)):
+    """
+    ``(interest, carry)`` owed on ``balance`` between ``accrued_at`` and ``now``:
+    the whole cents to credit and the sub-cent part to carry over, with the
+    previous ``carry`` included.
+    """
+    if accrued_at is None or balance <= 0 or now <= accrued_at:
+        return Decimal('0.00'), carry
+    with localcontext() as context:
+        context.prec = 34
+        periods = Decimal((now - accrued_at) // timedelta(microseconds=1)) / (PERIOD // timedelta(microseconds=1))
+        growth = (1 + ANNUAL_RATE / PERIODS_PER_YEAR) ** periods
+        owed = balance * growth - balance + carry
+        interest = owed.quantize(CENT, rounding=ROUND_DOWN)
+        return interest, (owed - interest).quantize(CARRY, rounding=ROUND_DOWN)
+
+
+def settle(profile, now=None):
+    """
+    Credit the interest ``profile`` is owed before its balance is shown.
+
+    Returns the interest credited. Accounts that never accrued start accruing now.
+    """
+    now = now or timezone.now()
+    interest, carry = accrued_interest(
+        profile.bank_money, profile.bank_accrued_at, now, profile.bank_interest_carry,
+    )
+    if profile.bank_accrued_at is not None and not interest:
+        return interest
+    # The new balance is stored rather than added in SQL, where SQLite would sum it as a float.
+    updated = profiles.apply(
+        profile,
+        values={'bank_money': profile.bank_money + interest, 'bank_accrued_at': now, 'bank_interest_carry': carry},
+        where={'bank_money': profile.bank_money, 'bank_accrued_at': profile.bank_accrued_at},
+    )
+    if not updated:
+        # Settled or moved concurrently; show the stored balance.
+        profile.refresh_from_db(fields=['bank_money', 'bank_accrued_at', 'bank_interest_carry'])
+    return interest
+
+
+def _transfer(profile, amount):
+    """Move ``amount`` from the wallet to the bank (negative to withdraw), settling interest first."""
+    for attempt in range(RETRIES):
+        balance, accrued_at, carry = Profile.objects.filter(pk=profile.pk).values_list(
+            'bank_money', 'bank_accrued_at', 'bank_interest_carry',
+        ).get()
+        now = timezone.now()
+        interest, carry = accrued_interest(balance, accrued_at, now, carry)
+        if balance + interest + amount < 0:
+            raise BankError("You don't have that much in the bank.")
+        updated = profiles.apply(
+            profile,
+            deltas={'money': -amount},
+            values={'bank_money': balance + interest + amount, 'bank_accrued_at': now, 'bank_interest_carry': carry},
+            where={'bank_money': balance, 'bank_accrued_at': accrued_at, 'money__gte': max(amount, 0)},
+        )
+        if updated:
+            return interest
+        if not Profile.objects.filter(pk=profile.pk, money__gte=max(amount, 0)).exists():
+            raise BankError("You don't have that much money.")
+    raise BankError("The bank is busy, please try again.")
+
+
+def deposit(profile, amount):
+    """Deposit ``amount`` from the wallet; returns the interest settled on the way."""
+    if amount <= 0:
+        raise BankError("Enter a positive amount.")
+    return _transfer(profile, amount)
+
+
+def withdraw(profile, amount):
+    """Withdraw ``amount`` to the wallet; returns the interest settled on the way."""
+    if amount <= 0:
+        raise BankError("Enter a positive amount.")
+    return _transfer(profile, -amount)
+
+
+def settle_dormant(idle_for=timedelta(days=28), chunk_size=1000, now=None):
+    """
+    Settle the accounts nobody has looked at for ``idle_for``, e.g. at month end.
+
+    Walks the idle accounts in primary-key chunks and credits each chunk with one
+    UPDATE. A row is only updated if its balance and accrual time are unchanged,
+    so an account settled concurrently is skipped rather than paid twice. Returns
+    the number of accounts settled.
+    """
+    now = now or timezone.now()
+    accounts = Profile.objects.filter(bank_money__gt=0, bank_accrued_at__lt=now - idle_for).order_by('pk')
+    settled = 0
+    last = 0
+    while True:
+        chunk = list(accounts.filter(pk__gt=last).values_list(
+            'pk', 'user_id', 'bank_money', 'bank_accrued_at', 'bank_interest_carry',
+        )[:chunk_size])
+        if not chunk:
+            return settled
+        last = chunk[-1][0]
+        owed = [
+            (pk, user_id, accrued_at, balance, *accrued_interest(balance, accrued_at, now, carry))
+            for pk, user_id, balance, accrued_at, carry in chunk
+        ]
+        # Sub-cent interest stays owed until it adds up.
+        owed = [account for account in owed if account[4]]
+        if not owed:
+            continue
+        unchanged = reduce(operator.or_, (
+            Q(pk=pk, bank_accrued_at=accrued_at, bank_money=balance) for pk, _, accrued_at, balance, *_ in owed
+        ))
+        # New balances are stored rather than added in SQL, where SQLite would sum them as floats.
+        settled += Profile.objects.filter(unchanged).update(**profiles.changes(values={
+            'bank_money': Case(
+                *(When(pk=pk, then=Value(balance + interest)) for pk, _, _, balance, interest, _ in owed),
+                output_field=DecimalField(max_digits=15, decimal_places=2),
+            ),
+            'bank_accrued_at': now,
+            'bank_interest_carry': Case(
+                *(When(pk=pk, then=Value(carry)) for pk, *_, carry in owed),
+                output_field=DecimalField(max_digits=12, decimal_places=10),
+            ),
+        }))
+        invalidate_players(user_id for _, user_id, *_ in owed)
@@ -0,0 +1,68 @@
+"""
+Mission and crime boards.
+
+Each board holds the entries whose level and stat requirements the player meets
+(and, for missions, that are at the player's location), picked from the design
+registry: the level requirement is a bisected prefix of the entries sorted by
+``required_level`` and the stats are checked in memory. The only query is the
+one for the player's running cooldowns.
+"""
+from typing import NamedTuple
+
+from django.db.models import Max
+from django.utils import timezone
+
+from . import registry
+from .models import CommittedCrime, CompletedMission
+
+
+class Board(NamedTuple):
+    """Entries of a board and ``{id: available_at}`` of those cooling down."""
+
+    entries: tuple
+    cooldowns: dict
+
+
+def _qualifies(entry, profile):
+    return (
+        entry.required_strength <= profile.strength
+        and entry.required_speed <= profile.speed
+        and entry.required_dexterity <= profile.dexterity
+        and entry.required_defense <= profile.defense
+    )
+
+
+def _running_cooldowns(history, field, profile, now):
+    """
+    ``{entry id: end of the latest running cooldown}``, served by the
+    ``(profile, <entry>, next_available_time)`` index on the history table.
+    """
+    return dict(
+        history.objects.filter(profile=profile, next_available_time__gt=now)
+        .values_list(f'{field}_id')
+        .annotate(until=Max('next_available_time'))
+        .order_by()
+    )
+
+
+def _board(index, history, field, profile, runnable, now):
+    entries = [entry for entry in index.up_to(profile.level) if _qualifies(entry, profile)]
+    running = _running_cooldowns(history, field, profile, now or timezone.now())
+    if runnable:
+        return Board(tuple(entry for entry in entries if entry.id not in running), {})
+    return Board(tuple(entries), {entry.id: running[entry.id] for entry in entries if entry.id in running})
+
+
+def mission_board(profile, runnable=True, now=None):
+    """
+    Missions ``profile`` qualifies for at their location, each with its item rewards.
+
+    With ``runnable`` only the missions that are not cooling down are returned.
+    """
+    index = registry.get().missions_at(profile.current_location_id)
+    return _board(index, CompletedMission, 'mission', profile, runnable, now)
+
+
+def crime_board(profile, runnable=True, now=None):
+    """Crimes ``profile`` qualifies for; with ``runnable`` only those not cooling down."""
+    return _board(registry.get().crimes, CommittedCrime, 'crime', profile, runnable, now)
@@ -0,0 +1,165 @@
+"""
+Two-level cache of game data, invalidated per model.
+
+Entries live in each process's local-memory cache (L1, the ``default`` alias) in
+front of a cache shared by every process on the host (L2, the ``shared`` alias).
+Keys are namespaced by model (``game.item``) and carry the namespace's current
+generation, a timestamp kept in L2. Saving or deleting a row of a cached model
+(``signals.CACHED_MODELS``) starts a new generation for the model once the
+transaction commits, one per model however many rows the transaction wrote, so
+entries built under the old one are never read again and simply expire; nothing
+is deleted key by key. A process re-reads generations from L2 at most every
+``CACHE_GENERATION_TTL`` seconds, so another process's writes show up within that.
+Other models have no receivers, so their writes, and Django's fast bulk deletes
+of them, cost nothing here.
+
+Writes that skip the model signals (``QuerySet.update()``, ``bulk_create()``) must
+call ``bump_on_commit()`` for the models they touch if those are cached.
+
+Hits and misses are counted per namespace and process (``stats()``).
+"""
+import hashlib
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+# Outcomes of lookups per namespace: 'l1' and 'l2' hits and misses.
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+_MISSING = object()
+
+# Sent with ``models`` after ``bump()`` started new generations for them.
+bumped = Signal()
+
+
+def namespace(model):
+    return model._meta.label_lower
+
+
+def shared_key(key):
+    """``key`` for the ``shared`` cache, which other databases on the host, such as test ones, use too."""
+    return f"{connection.settings_dict['NAME']}:{key}"
+
+
+def _generation_key(name):
+    return shared_key(f'generation:{name}')
+
+
+def _generation(name):
+    local = caches['default']
+    generation = local.get(_generation_key(name))
+    if generation is None:
+        generation = caches['shared'].get_or_set(_generation_key(name), time.time_ns, None)
+        local.set(_generation_key(name), generation, settings.CACHE_GENERATION_TTL)
+    return generation
+
+
+def generations(*models):
+    """Current generations of ``models``; any change means one of them was written."""
+    return tuple(_generation(namespace(model)) for model in models)
+
+
+def bump(*models):
+    """Start new generations for ``models``, invalidating everything cached under them."""
+    shared = caches['shared']
+    # A namespace gets its first generation when it is first read; until then
+    # there is nothing to invalidate, which keeps writes to uncached tables cheap.
+    keys = [_generation_key(namespace(model)) for model in models]
+    keys = [key for key in keys if shared.has_key(key)]
+    if keys:
+        generation = time.time_ns()
+        generations = dict.fromkeys(keys, generation)
+        shared.set_many(generations, None)
+        caches['default'].set_many(generations, settings.CACHE_GENERATION_TTL)
+    bumped.send(sender=None, models=models)
+
+
+class _PendingBumps(set):
+    """The models a transaction wrote, bumped together once it commits."""
+
+    def __call__(self):
+        connection.pending_cache_bumps = None
+        bump(*self)
+
+
+def bump_on_commit(*models):
+    """
+    ``bump()`` ``models`` once the current transaction commits, at most once per
+    model and transaction however often this is called.
+    """
+    if not connection.in_atomic_block:
+        bump(*models)
+        return
+    pending = getattr(connection, 'pending_cache_bumps', None)
+    # Rolling back drops the pending callback, and with it what was collected so far.
+    if pending is None or not any(func is pending for _, func, _ in connection.run_on_commit):
+        pending = connection.pending_cache_bumps = _PendingBumps()
+        transaction.on_commit(pending)
+    pending.update(models)
+
+
+def _count(names, outcome):
+    with _stats_lock:
+        for name in names:
+            _stats[name][outcome] += 1
+
+
+def stats():
+    """``{namespace: {'l1': hits, 'l2': hits, 'misses': misses}}`` of lookups in this process."""
+    with _stats_lock:
+        return {
+            name: {'l1': counts['l1'], 'l2': counts['l2'], 'misses': counts['miss']}
+            for name, counts in sorted(_stats.items())
+        }
+
+
+def get_or_set(models, key, compute, timeout):
+    """
+    Return the value cached under ``key`` for the current generations of
+    ``models``, calling ``compute()`` and caching its result on a miss.
+    """
+    names = [namespace(model) for model in models]
+    versioned = ':'.join([*(f'{name}.{_generation(name)}' for name in names), key])
+    full_key = f'{names[0]}:{hashlib.md5(versioned.encode()).hexdigest()}'
+
+    local, shared = caches['default'], caches['shared']
+    value = local.get(full_key, _MISSING)
+    if value is not _MISSING:
+        _count(names, 'l1')
+        return value
+    value = shared.get(full_key, _MISSING)
+    if value is _MISSING:
+        _count(names, 'miss')
+        value = compute()
+        shared.set(full_key, value, timeout)
+    else:
+        _count(names, 'l2')
+    local.set(full_key, value, min(timeout, settings.CACHE_L1_TIMEOUT))
+    return value
+
+
+def cached_queryset(*models, timeout=300):
+    """
+    Cache the rows the decorated function's queryset returns, as a list, until
+    one of ``models`` changes.
+
+    The function's arguments are part of the key, so they must be plain values
+    with a stable ``repr`` (ids and levels, not model instances). ``models`` must
+    be among ``signals.CACHED_MODELS``, whose writes start new generations.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = f'{name}{args!r}{sorted(kwargs.items())!r}'
+            return get_or_set(models, key, lambda: list(func(*args, **kwargs)), timeout)
+        return wrapper
+    return decorator
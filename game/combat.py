@@ -0,0 +1,145 @@
+"""
+Per-profile combat sheets.
+
+A CombatSheet holds a profile's effective attack, defense, speed and dexterity
+with equipped weapons, armor and temporary items applied. Gear bonuses are
+recomputed when equipment changes; changes to the ``BASE_STATS`` only re-add the
+stored bonuses. Opponent listings read sheets in bulk with ``combat_sheets()``
+instead of joining the inventory tables. A resolved fight is saved with
+``record_battle()``, which stores its rounds as a replay (game/replays.py).
+
+    attack    = strength + weapon attack_power + 'attack' temporary items
+    defense   = defense  + armor defense_power + 'defense' temporary items
+"""
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+
+from accounts.models import Profile
+from .models import Battle, CombatSheet, InventoryItem
+from .replays import Replay, encode
+
+# Profile fields a sheet is built from; writes touching none of them leave it alone.
+BASE_STATS = frozenset(('strength', 'defense', 'speed', 'dexterity'))
+
+
+def _bonus_aggregates():
+    return {
+        'weapons': Sum('item__weapon__attack_power', default=0),
+        'armor': Sum('item__armor__defense_power', default=0),
+        'attack_items': Sum(
+            'item__temporary_item__effect_amount',
+            filter=Q(item__temporary_item__effect_type='attack'),
+            default=0,
+        ),
+        'defense_items': Sum(
+            'item__temporary_item__effect_amount',
+            filter=Q(item__temporary_item__effect_type='defense'),
+            default=0,
+        ),
+    }
+
+
+def gear_bonuses(profile_id):
+    """Attack and defense added by the profile's equipped items, in one aggregate query."""
+    return InventoryItem.objects.filter(inventory__profile_id=profile_id, equipped=True).aggregate(
+        **_bonus_aggregates()
+    )
+
+
+def _attack_bonus(bonuses):
+    return bonuses['weapons'] + bonuses['attack_items']
+
+
+def _defense_bonus(bonuses):
+    return bonuses['armor'] + bonuses['defense_items']
+
+
+def build_sheet(profile, attack_bonus=0, defense_bonus=0):
+    return CombatSheet(
+        profile_id=profile.pk,
+        attack=profile.strength + attack_bonus,
+        defense=profile.defense + defense_bonus,
+        speed=profile.speed,
+        dexterity=profile.dexterity,
+        attack_bonus=attack_bonus,
+        defense_bonus=defense_bonus,
+    )
+
+
+def refresh_gear(profile_id):
+    """Recompute the profile's sheet after its equipment changed."""
+    profile = Profile.objects.only('strength', 'defense', 'speed', 'dexterity').get(pk=profile_id)
+    bonuses = gear_bonuses(profile_id)
+    sheet = build_sheet(
+        profile,
+        attack_bonus=_attack_bonus(bonuses),
+        defense_bonus=_defense_bonus(bonuses),
+    )
+    sheet.save()
+    return sheet
+
+
+def sync_base_stats(profile):
+    """
+    Re-apply the stored gear bonuses to ``profile``'s base stats.
+
+    The stats are read from the profile's row by the UPDATE itself, so a sheet
+    synced after a later change has been committed never goes back to the values
+    ``profile`` was loaded with.
+    """
+    stats = {
+        field: Subquery(Profile.objects.filter(pk=OuterRef('profile_id')).values(field))
+        for field in BASE_STATS
+    }
+    sheet = {
+        'attack': stats['strength'] + F('attack_bonus'),
+        'defense': stats['defense'] + F('defense_bonus'),
+        'speed': stats['speed'],
+        'dexterity': stats['dexterity'],
+    }
+    CombatSheet.objects.filter(profile_id=profile.pk).exclude(**sheet).update(**sheet)
+
+
+def combat_sheets(profile_ids):
+    """
+    Return ``{profile_id: CombatSheet}`` for many profiles, building any that are
+    missing with one query for their stats, one for their gear and one insert.
+    """
+    sheets = CombatSheet.objects.in_bulk(profile_ids)
+    missing = [profile_id for profile_id in profile_ids if profile_id not in sheets]
+    if not missing:
+        return sheets
+    bonuses = {
+        row.pop('inventory__profile_id'): row
+        for row in InventoryItem.objects.filter(inventory__profile_id__in=missing, equipped=True)
+        .values('inventory__profile_id')
+        .annotate(**_bonus_aggregates())
+        .order_by()
+    }
+    built = [
+        build_sheet(
+            profile,
+            attack_bonus=_attack_bonus(bonuses[profile.pk]) if profile.pk in bonuses else 0,
+            defense_bonus=_defense_bonus(bonuses[profile.pk]) if profile.pk in bonuses else 0,
+        )
+        for profile in Profile.objects.filter(pk__in=missing).only(*BASE_STATS)
+    ]
+    # A sheet built concurrently in the meantime holds the same values; keep that one.
+    CombatSheet.objects.bulk_create(built, ignore_conflicts=True)
+    sheets.update((sheet.profile_id, sheet) for sheet in built)
+    return sheets
+
+
+def record_battle(attacker, defender, rounds, attacker_won, money_stolen=0, experience_gained=0):
+    """Save a resolved battle with its rounds packed as a replay; damage totals are summed from the replay."""
+    replay = encode(rounds)
+    attacker_damage, defender_damage = Replay(replay).totals()
+    return Battle.objects.create(
+        attacker=attacker,
+        defender=defender,
+        attacker_won=attacker_won,
+        money_stolen=money_stolen,
+        experience_gained=experience_gained,
+        attacker_damage_dealt=attacker_damage,
+        defender_damage_dealt=defender_damage,
+        replay=replay,
+    )
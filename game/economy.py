@@ -0,0 +1,128 @@
+"""
+Economy snapshots.
+
+A snapshot totals the money held in wallets, banks, property safes and gang
+treasuries plus the market value of all shares, with one query per table. The
+profile table is streamed once: the same pass sums wallets and banks and feeds
+each player's cash into a quantile sketch, so the percentiles need no sort.
+"""
+import math
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from accounts.models import Profile
+from .models import EconomySnapshot, Gang, GangLedgerEntry, OwnedProperty, StockPosition
+
+CHUNK_SIZE = 5000
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch with relative error guarantees (as in DDSketch).
+
+    Positive values are counted in logarithmic buckets whose bounds grow by
+    ``gamma``, so any quantile is reported within ``relative_accuracy`` of the
+    true value using memory proportional to the log of the value range.
+    Values at or below zero share a single bucket reported as their minimum.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        value = float(value)
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        """Add the values counted by ``other``, a sketch of the same accuracy, to this one."""
+        if other.gamma != self.gamma:
+            raise ValueError("Only sketches of the same relative accuracy can be merged.")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        for bound, pick in (('min', min), ('max', max)):
+            values = [value for value in (getattr(self, bound), getattr(other, bound)) if value is not None]
+            setattr(self, bound, pick(values) if values else None)
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile (0 <= q <= 1), or None if nothing was added."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return self.min
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma**(index-1), gamma**index], clamped to the observed range.
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+
+def _total(queryset, expression):
+    return queryset.aggregate(total=Sum(expression))['total'] or Decimal('0')
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def take_snapshot():
+    """Compute the current money supply and cash distribution and store them as a snapshot."""
+    sketch = QuantileSketch()
+    wallet_money = bank_money = Decimal('0')
+    for money, bank in Profile.objects.values_list('money', 'bank_money').iterator(chunk_size=CHUNK_SIZE):
+        wallet_money += money
+        bank_money += bank
+        sketch.add(money + bank)
+
+    stock_value = ExpressionWrapper(
+        F('shares') * F('stock__current_price'),
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
+    return EconomySnapshot.objects.create(
+        players=sketch.count,
+        wallet_money=wallet_money,
+        bank_money=bank_money,
+        property_money=_total(OwnedProperty.objects.all(), 'stored_money'),
+        gang_money=_total(Gang.objects.all(), 'money') + _total(
+            GangLedgerEntry.objects.filter(compacted=False), 'amount',
+        ),
+        stock_value=_total(StockPosition.objects.all(), stock_value),
+        cash_p50=_money(sketch.quantile(0.5)),
+        cash_p90=_money(sketch.quantile(0.9)),
+        cash_p99=_money(sketch.quantile(0.99)),
+        cash_max=_money(sketch.max),
+    )
+
+
+def history(limit=30):
+    """
+    The latest ``limit`` snapshots, oldest first.
+
+    Each one carries ``growth``, the change of the money supply since the snapshot
+    before it in percent (None for the first one on record).
+    """
+    snapshots = list(EconomySnapshot.objects.order_by('-taken_at')[:limit + 1])[::-1]
+    for previous, snapshot in zip([None] + snapshots, snapshots):
+        snapshot.growth = None
+        if previous is not None and previous.money_supply:
+            snapshot.growth = (snapshot.money_supply - previous.money_supply) * 100 / previous.money_supply
+    return snapshots[-limit:]
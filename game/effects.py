@@ -0,0 +1,133 @@
+"""
+Active effects of boosters and training enhancers.
+
+Each profile's running effects are folded into a ``Modifiers`` vector that is
+cached until the earliest of them expires, so the code applying them reads it in
+O(1); training applies the mood and training amounts. The energy and cooldown
+amounts are recorded for the crime and regeneration code the game does not have
+yet. The vector is kept in the ``shared`` cache,
+so an effect started through one process is seen by all of them. It is
+recomputed (one indexed query on ``(profile, expires_at)``) only when an effect
+starts or the cached one reaches its expiry; expired rows are deleted in bulk by
+``purge_effects``.
+"""
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Min, Sum
+from django.utils import timezone
+
+from . import caching
+from .models import ActiveEffect, Booster, InventoryItem, TrainingEnhancer
+
+
+class Modifiers(NamedTuple):
+    """Combined amounts of a profile's active effects."""
+
+    energy: int = 0
+    mood: int = 0
+    cooldown: int = 0
+    training: int = 0
+    # Earliest expiry among the active effects; the vector is stale from then on.
+    expires_at: object = None
+
+
+NO_MODIFIERS = Modifiers()
+
+
+class EffectError(Exception):
+    """Raised when an item cannot be used."""
+
+
+def _cache_key(profile_id):
+    return caching.shared_key(f'effects:{profile_id}')
+
+
+def compute_modifiers(profile_id, now=None):
+    """Fold the profile's unexpired effects into a Modifiers vector."""
+    now = now or timezone.now()
+    rows = (
+        ActiveEffect.objects.filter(profile_id=profile_id, expires_at__gt=now)
+        .values('effect_type')
+        .annotate(total=Sum('amount'), expires_at=Min('expires_at'))
+        .order_by()
+    )
+    totals = {}
+    expires_at = None
+    for row in rows:
+        totals[row['effect_type']] = row['total']
+        if expires_at is None or row['expires_at'] < expires_at:
+            expires_at = row['expires_at']
+    if not totals:
+        return NO_MODIFIERS
+    return Modifiers(expires_at=expires_at, **totals)
+
+
+def refresh_modifiers(profile_id):
+    """Recompute and cache the profile's modifiers, until the first of the effects ends."""
+    now = timezone.now()
+    modifiers = compute_modifiers(profile_id, now)
+    # Without effects the entry only changes when one starts, which refreshes it.
+    timeout = None if modifiers.expires_at is None else max((modifiers.expires_at - now).total_seconds(), 1)
+    caches['shared'].set(_cache_key(profile_id), modifiers, timeout)
+    return modifiers
+
+
+def get_modifiers(profile_id):
+    """Return the profile's modifiers, recomputing them once an effect has ended."""
+    modifiers = caches['shared'].get(_cache_key(profile_id))
+    if modifiers is None or (modifiers.expires_at is not None and modifiers.expires_at <= timezone.now()):
+        modifiers = refresh_modifiers(profile_id)
+    return modifiers
+
+
+def effect_of(item):
+    """Return ``(effect_type, amount, duration_minutes)`` for a usable item."""
+    try:
+        if item.item_type == 'booster':
+            booster = item.booster
+            return booster.booster_type, booster.boost_amount, booster.duration
+        if item.item_type == 'training':
+            enhancer = item.training_enhancer
+            return 'training', enhancer.enhancement_percentage, enhancer.duration
+    except (Booster.DoesNotExist, TrainingEnhancer.DoesNotExist):
+        pass
+    raise EffectError(f"{item.name} cannot be used.")
+
+
+def use_item(profile, inventory, item):
+    """Consume one ``item`` from ``inventory`` and start its effect on ``profile``."""
+    effect_type, amount, duration = effect_of(item)
+    with transaction.atomic():
+        used = InventoryItem.objects.filter(inventory=inventory, item=item, quantity__gte=1).update(
+            quantity=F('quantity') - 1,
+        )
+        if not used:
+            raise EffectError(f"You don't have any {item.name}.")
+        effect = ActiveEffect.objects.create(
+            profile=profile,
+            item=item,
+            effect_type=effect_type,
+            amount=amount,
+            expires_at=timezone.now() + timedelta(minutes=duration),
+        )
+        transaction.on_commit(lambda: refresh_modifiers(profile.pk))
+    return effect
+
+
+def purge_expired(before=None, batch_size=10000):
+    """Delete expired effects in batches; returns the number deleted."""
+    before = before or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(ActiveEffect.objects.filter(expires_at__lte=before).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += ActiveEffect.objects.filter(pk__in=ids).delete()[0]
+
+
+def effective_mood(profile, modifiers):
+    """The profile's mood including mood boosters, capped at ``max_mood``."""
+    return min(profile.mood + modifiers.mood, profile.max_mood)
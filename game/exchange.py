@@ -0,0 +1,413 @@
+"""
+Stock exchange: limit orders matched in memory.
+
+Players place limit orders, which are stored as StockOrder rows with the buyer's
+money or the seller's shares reserved up front. A single engine process (the
+``run_exchange`` command) keeps an order book per stock in memory, with
+price-time priority, and works through new orders in batches. Two engines
+would fill the same orders twice, so the command holds ``engine_lock()``. Alongside the
+players' asks, each book holds the company's offer of its unissued shares
+(``StockMarket.available_shares``) at the current price. Orders of the same
+player never fill each other: the resting one is cancelled instead.
+
+Everything a batch does is written at the end in one transaction: the trades,
+the orders' remaining sizes, the buyers' new lots and positions, the sellers'
+sold or released lots, the money paid out or refunded and the stocks'
+``available_shares`` and ``current_price``, each with bulk statements. Once it
+commits, the new prices are published to the live relay, which carries them to
+the streams held by the web workers. After a restart the books are rebuilt from
+the open orders.
+"""
+import hashlib
+import heapq
+import os
+import tempfile
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Value, When
+
+from accounts.models import Profile
+from . import portfolio, profiles
+from .models import StockMarket, StockOrder, StockTrade
+from .player import invalidate_players
+from .signals import stock_price_changed
+
+# Rows per bulk statement when a batch is persisted.
+WRITE_CHUNK = 500
+
+
+class ExchangeError(Exception):
+    """Raised when an order cannot be placed."""
+
+
+class EngineRunning(Exception):
+    """Raised when another matching engine already runs against the database."""
+
+
+def _lock_path():
+    # One lock per database, so engines of other databases on the host, such as test ones, run alongside.
+    name = hashlib.md5(str(connection.settings_dict['NAME']).encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'lafraud-exchange-{name}.lock')
+
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    import msvcrt
+
+    def _acquire(lock):
+        lock.seek(0)
+        msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+else:
+    def _acquire(lock):
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+@contextmanager
+def engine_lock():
+    """
+    Hold the host's exchange lock while the block runs; raises EngineRunning if
+    another process holds it. The lock is released when its holder exits, even if
+    it crashes, so there is nothing stale to clean up.
+    """
+    lock = open(_lock_path(), 'a')
+    try:
+        try:
+            _acquire(lock)
+        except OSError:
+            raise EngineRunning("Another matching engine is running.") from None
+        yield
+    finally:
+        lock.close()
+
+
+def place_order(profile, stock, side, price, quantity):
+    """
+    Place a limit order, reserving the money (buy) or shares (sell) it needs.
+
+    The order is matched by the engine's next batch.
+    """
+    if quantity <= 0:
+        raise ExchangeError("Enter a positive number of shares.")
+    if price <= 0:
+        raise ExchangeError("Enter a positive price.")
+
+    if side not in ('buy', 'sell'):
+        raise ExchangeError("Unknown order side.")
+
+    with transaction.atomic():
+        order = StockOrder.objects.create(
+            profile=profile, stock=stock, side=side, price=price, quantity=quantity, remaining=quantity,
+        )
+        if side == 'buy':
+            cost = price * quantity
+            if not profiles.apply(profile, deltas={'money': -cost}, where={'money__gte': cost}):
+                raise ExchangeError("You don't have enough money for this order.")
+        elif portfolio.take_shares(profile, stock, quantity, order=order) is None:
+            raise ExchangeError(f"You don't own {quantity} shares of {stock.symbol}.")
+    return order
+
+
+def cancel_order(profile, order_id):
+    """Ask the engine to cancel an open order; its reservation is returned by the next batch."""
+    return bool(
+        StockOrder.objects.filter(pk=order_id, profile=profile, status='open').update(cancel_requested=True)
+    )
+
+
+class BookOrder:
+    """An open order resting in a book."""
+
+    __slots__ = ('id', 'profile_id', 'stock_id', 'side', 'price', 'quantity', 'remaining')
+
+    def __init__(self, id, profile_id, stock_id, side, price, quantity, remaining):
+        self.id = id
+        self.profile_id = profile_id
+        self.stock_id = stock_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.remaining = remaining
+
+
+# The company's offer of unissued shares, ahead of every player's ask at the same price.
+HOUSE = None
+
+
+class OrderBook:
+    """
+    Bids and asks of one stock with price-time priority.
+
+    Each side is a heap keyed on price (negated for bids) and then on arrival,
+    so the best order is always at the top. ``orders`` holds the live orders by
+    id; entries of cancelled or filled ones are dropped when they reach the top.
+    A player never trades with themselves: a resting order met by an order of
+    the same player leaves the book and waits in ``expired`` to be cancelled.
+    """
+
+    def __init__(self, house_price=Decimal('0'), house_shares=0):
+        self.bids = []
+        self.asks = []
+        self.orders = {}
+        self.expired = []
+        self.house_price = house_price
+        self.house_shares = house_shares
+
+    def add(self, order, sequence):
+        self.orders[order.id] = order
+        if order.side == 'buy':
+            heapq.heappush(self.bids, (-order.price, sequence, order))
+        else:
+            heapq.heappush(self.asks, (order.price, sequence, order))
+
+    def remove(self, order_id):
+        """Take an order out of the book; returns it, or None if it is not resting here."""
+        # Its heap entry is skipped once it reaches the top.
+        return self.orders.pop(order_id, None)
+
+    def _top(self, heap):
+        while heap and heap[0][2].id not in self.orders:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def best_ask(self):
+        """Best resting ask, or HOUSE when the company's offer comes first."""
+        ask = self._top(self.asks)
+        if self.house_shares > 0 and (ask is None or self.house_price <= ask.price):
+            return HOUSE, self.house_price
+        return (ask, ask.price) if ask is not None else (None, None)
+
+    def best_bid(self):
+        bid = self._top(self.bids)
+        return (bid, bid.price) if bid is not None else (None, None)
+
+    def match(self, order):
+        """
+        Match an incoming order against the book.
+
+        Returns ``[(maker, price, shares)]``; the maker is HOUSE for shares bought
+        from the company. Makers are updated in place and filled ones leave the book.
+        """
+        fills = []
+        while order.remaining > 0:
+            if order.side == 'buy':
+                maker, price = self.best_ask()
+                if price is None or price > order.price:
+                    break
+            else:
+                maker, price = self.best_bid()
+                if price is None or price < order.price:
+                    break
+            if maker is not HOUSE and maker.profile_id == order.profile_id:
+                self.expired.append(self.orders.pop(maker.id))
+                continue
+            available = self.house_shares if maker is HOUSE else maker.remaining
+            shares = min(order.remaining, available)
+            order.remaining -= shares
+            if maker is HOUSE:
+                self.house_shares -= shares
+            else:
+                maker.remaining -= shares
+                if maker.remaining == 0:
+                    del self.orders[maker.id]
+            fills.append((maker, price, shares))
+        return fills
+
+
+class Batch:
+    """What one batch changed, accumulated in memory until it is written."""
+
+    def __init__(self):
+        self.trades = []
+        self.orders = {}
+        self.cancelled = set()
+        # Cancel requests of orders that had already left the book
+        self.stale_cancels = []
+        # {cancelled sell order id: shares it sold}
+        self.released = {}
+        self.credits = defaultdict(Decimal)
+        self.bought = defaultdict(int)
+        self.issued = defaultdict(int)
+        self.last_price = {}
+
+    def fill(self, stock_id, taker, maker, price, shares):
+        buy, sell = (taker, maker) if taker.side == 'buy' else (maker, taker)
+        self.trades.append(StockTrade(
+            stock_id=stock_id,
+            buy_order_id=buy.id,
+            sell_order_id=None if sell is HOUSE else sell.id,
+            price=price,
+            shares=shares,
+        ))
+        self.orders[taker.id] = taker
+        if maker is not HOUSE:
+            self.orders[maker.id] = maker
+        # The buyer reserved its limit price; the difference is refunded.
+        self.credits[buy.profile_id] += (buy.price - price) * shares
+        self.bought[buy.profile_id, stock_id, price] += shares
+        if sell is HOUSE:
+            self.issued[stock_id] += shares
+        else:
+            self.credits[sell.profile_id] += price * shares
+        self.last_price[stock_id] = price
+
+    def order_states(self):
+        """``{(remaining, status): [order ids]}`` of the orders this batch changed."""
+        states = defaultdict(list)
+        for order in self.orders.values():
+            if order.id in self.cancelled:
+                state = (0, 'cancelled')
+            else:
+                state = (order.remaining, 'filled' if order.remaining == 0 else 'open')
+            states[state].append(order.id)
+        return states
+
+    def cancel(self, order):
+        self.orders[order.id] = order
+        self.cancelled.add(order.id)
+        if order.side == 'buy':
+            self.credits[order.profile_id] += order.price * order.remaining
+        else:
+            # Unsold shares go back to the seller in the lots the order reserved.
+            self.released[order.id] = order.quantity - order.remaining
+
+    def sold_out(self):
+        """Ids of the sell orders this batch filled completely."""
+        return [
+            order.id for order in self.orders.values()
+            if order.side == 'sell' and order.remaining == 0 and order.id not in self.cancelled
+        ]
+
+
+def _chunks(items, size=WRITE_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class MatchingEngine:
+    """Order books of every stock, fed from the StockOrder table in batches."""
+
+    def __init__(self):
+        self.books = {}
+        self.last_order_id = 0
+        self.sequence = 0
+
+    def _book(self, stock_id):
+        if stock_id not in self.books:
+            self.books[stock_id] = OrderBook()
+        return self.books[stock_id]
+
+    def _refresh_house(self):
+        for stock_id, price, available in StockMarket.objects.values_list('pk', 'current_price', 'available_shares'):
+            book = self._book(stock_id)
+            book.house_price = price
+            book.house_shares = available
+
+    def load(self):
+        """
+        Rebuild the books from the persisted open orders, e.g. after a restart.
+
+        The orders are replayed in arrival order, so those placed while the engine
+        was down are matched as they would have been, and the result is persisted.
+        """
+        self.books = {}
+        self._refresh_house()
+        open_orders = StockOrder.objects.filter(status='open').order_by('pk').values_list(
+            'pk', 'profile_id', 'stock_id', 'side', 'price', 'quantity', 'remaining',
+        )
+        batch = Batch()
+        for row in open_orders.iterator(chunk_size=5000):
+            order = BookOrder(*row)
+            self.process(order, batch)
+            self.last_order_id = order.id
+        self.persist(batch)
+
+    def run_batch(self, batch_size=1000):
+        """Match the next ``batch_size`` new orders and the pending cancellations; returns the batch."""
+        self._refresh_house()
+        incoming = [
+            BookOrder(*row)
+            for row in StockOrder.objects.filter(status='open', pk__gt=self.last_order_id).order_by('pk')
+            .values_list('pk', 'profile_id', 'stock_id', 'side', 'price', 'quantity', 'remaining')[:batch_size]
+        ]
+        if incoming:
+            self.last_order_id = incoming[-1].id
+
+        batch = Batch()
+        for order in incoming:
+            self.process(order, batch)
+
+        cancel_requests = StockOrder.objects.filter(
+            status='open', cancel_requested=True, pk__lte=self.last_order_id,
+        ).values_list('pk', 'stock_id')
+        for order_id, stock_id in cancel_requests:
+            order = self._book(stock_id).remove(order_id)
+            if order is not None:
+                batch.cancel(order)
+            else:
+                batch.stale_cancels.append(order_id)
+
+        self.persist(batch)
+        return batch
+
+    def process(self, order, batch):
+        """Match one order in memory, resting whatever is left in its book."""
+        book = self._book(order.stock_id)
+        for maker, price, shares in book.match(order):
+            batch.fill(order.stock_id, order, maker, price, shares)
+        while book.expired:
+            batch.cancel(book.expired.pop())
+        if order.remaining > 0:
+            self.sequence += 1
+            book.add(order, self.sequence)
+
+    def persist(self, batch):
+        """Write a batch's effects with bulk statements in one transaction."""
+        if not batch.orders and not batch.stale_cancels:
+            return
+        with transaction.atomic():
+            StockTrade.objects.bulk_create(batch.trades, batch_size=WRITE_CHUNK)
+            # Orders are grouped by their new state, so each group is one plain UPDATE per chunk.
+            for (remaining, status), order_ids in batch.order_states().items():
+                for chunk in _chunks(order_ids):
+                    StockOrder.objects.filter(pk__in=chunk).update(remaining=remaining, status=status)
+            for chunk in _chunks([*batch.cancelled, *batch.stale_cancels]):
+                StockOrder.objects.filter(pk__in=chunk).update(cancel_requested=False)
+            portfolio.add_lots(batch.bought)
+            portfolio.settle_sold_lots(batch.sold_out())
+            portfolio.release_lots(batch.released)
+            credits = {profile_id: amount for profile_id, amount in batch.credits.items() if amount}
+            for chunk in _chunks(credits.items()):
+                Profile.objects.filter(pk__in=[profile_id for profile_id, _ in chunk]).update(**profiles.changes({
+                    'money': Case(
+                        *(When(pk=profile_id, then=Value(amount)) for profile_id, amount in chunk),
+                        output_field=DecimalField(max_digits=15, decimal_places=2),
+                    ),
+                }))
+            if batch.issued:
+                StockMarket.objects.filter(pk__in=batch.issued).update(available_shares=F('available_shares') - Case(
+                    *(When(pk=stock_id, then=Value(shares)) for stock_id, shares in batch.issued.items()),
+                    output_field=IntegerField(),
+                ))
+            if batch.last_price:
+                StockMarket.objects.filter(pk__in=batch.last_price).update(
+                    previous_price=F('current_price'),
+                    current_price=Case(
+                        *(When(pk=stock_id, then=Value(price)) for stock_id, price in batch.last_price.items()),
+                        output_field=DecimalField(max_digits=15, decimal_places=2),
+                    ),
+                )
+            transaction.on_commit(lambda: self._announce(batch, credits))
+
+    def _announce(self, batch, credits):
+        if credits:
+            invalidate_players(Profile.objects.filter(pk__in=list(credits)).values_list('user_id', flat=True))
+        if batch.last_price:
+            for symbol, price, previous in StockMarket.objects.filter(pk__in=batch.last_price).values_list(
+                'symbol', 'current_price', 'previous_price',
+            ):
+                stock_price_changed(symbol, price, previous)
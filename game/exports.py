@@ -0,0 +1,165 @@
+"""
+Streaming exports of game history for analytics.
+
+Rows are read in primary-key order with a chunked database iterator and encoded
+batch by batch, so memory use stays flat however large the table is. Each export
+can start after a given id, which the ``export_history`` command keeps as a
+per-export watermark to make incremental runs.
+
+Formats:
+
+* ``csv``: a header line, then one line per row.
+* ``jsonl``: one JSON object per row.
+* ``column_batches``: one JSON object per batch of ``BATCH_SIZE`` rows mapping
+  each field to its list of values, always gzip-compressed. Each batch stands
+  alone; this is not a columnar file format such as Parquet, whose column
+  chunks a reader can scan without decoding the other columns.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import NamedTuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from accounts.models import Profile
+from .models import Battle, CommittedCrime, GymSession, StockOwnership
+
+# Rows fetched from the database per round trip.
+CHUNK_SIZE = 2000
+# Rows encoded per output batch.
+BATCH_SIZE = 1000
+
+
+class Export(NamedTuple):
+    model: type
+    fields: tuple
+    # Snapshots (incremental=False) always export the whole table.
+    incremental: bool = True
+
+
+EXPORTS = {
+    'crimes': Export(CommittedCrime, (
+        'id', 'profile_id', 'crime_id', 'success', 'money_earned', 'experience_earned', 'date',
+        'next_available_time',
+    )),
+    'battles': Export(Battle, (
+        'id', 'attacker_id', 'defender_id', 'attacker_won', 'money_stolen', 'experience_gained',
+        'attacker_damage_dealt', 'defender_damage_dealt', 'date',
+    )),
+    'gym_sessions': Export(GymSession, (
+        'id', 'profile_id', 'gym_id', 'stat_trained', 'energy_used', 'stat_gain', 'date',
+    )),
+    'stock_ownership': Export(StockOwnership, (
+        'id', 'profile_id', 'stock_id', 'shares', 'purchase_price', 'purchase_date',
+    )),
+    'profiles': Export(Profile, (
+        'id', 'user_id', 'character_type', 'level', 'experience', 'strength', 'defense', 'speed',
+        'dexterity', 'money', 'bank_money', 'current_location_id', 'is_in_jail', 'is_in_hospital',
+    ), incremental=False),
+}
+
+FORMATS = ('csv', 'jsonl', 'column_batches')
+
+EXTENSIONS = {'csv': 'csv', 'jsonl': 'jsonl', 'column_batches': 'columns.jsonl.gz'}
+
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson', 'column_batches': 'application/gzip'}
+
+
+class Progress:
+    """Rows streamed so far and the id of the last one, updated as the export is consumed."""
+
+    def __init__(self, after):
+        self.last_id = after
+        self.rows = 0
+
+
+def _to_json(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def _batches(rows, progress):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            progress.last_id = batch[-1][0]
+            progress.rows += len(batch)
+            batch = []
+    if batch:
+        yield batch
+        progress.last_id = batch[-1][0]
+        progress.rows += len(batch)
+
+
+def _csv(fields, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header of an empty export.
+        yield buffer.getvalue().encode()
+
+
+def _jsonl(fields, batches):
+    for batch in batches:
+        yield ''.join(_to_json(dict(zip(fields, row))) + '\n' for row in batch).encode()
+
+
+def _column_batches(fields, batches):
+    for batch in batches:
+        yield (_to_json(dict(zip(fields, map(list, zip(*batch))))) + '\n').encode()
+
+
+ENCODERS = {'csv': _csv, 'jsonl': _jsonl, 'column_batches': _column_batches}
+
+
+def gzipped(chunks):
+    """Gzip a stream of byte chunks on the fly."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def rows(name, after=0):
+    """Iterate ``(field values)`` tuples of export ``name`` with ids above ``after``."""
+    export = EXPORTS[name]
+    queryset = export.model.objects.order_by('pk')
+    if after and export.incremental:
+        queryset = queryset.filter(pk__gt=after)
+    return queryset.values_list(*export.fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def stream(name, fmt='csv', after=0, compress=False):
+    """
+    Return ``(chunks, progress)``: an iterator of encoded byte chunks for export
+    ``name``, and a Progress that tracks how far the iterator has been consumed.
+    """
+    if fmt not in ENCODERS:
+        raise ValueError(f"Unknown export format {fmt!r}.")
+    progress = Progress(after if EXPORTS[name].incremental else 0)
+    chunks = ENCODERS[fmt](EXPORTS[name].fields, _batches(rows(name, after), progress))
+    if compress or fmt == 'column_batches':
+        chunks = gzipped(chunks)
+    return chunks, progress
+
+
+def filename(name, fmt, compress=False, suffix=''):
+    extension = EXTENSIONS[fmt]
+    if compress and not extension.endswith('.gz'):
+        extension += '.gz'
+    return f'{name}{suffix}.{extension}'
+
+
+def content_type(fmt, compress=False):
+    return 'application/gzip' if compress else CONTENT_TYPES[fmt]
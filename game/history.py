@@ -0,0 +1,112 @@
+"""
+Players' own histories of crimes, missions, gym sessions and battles, a page at
+a time.
+
+Pages are cut by keyset rather than OFFSET: a page is the rows strictly older
+than a ``(date, id)`` cursor, newest first, read as one range of the
+``(profile, date)`` index of the history table (``(attacker, date)`` and
+``(defender, date)`` for battles). SQLite stores the rowid at the end of every
+index entry, so the range is already in ``(date, id)`` order and no sort is
+needed; reaching any page costs the same as the first. The names of the crime,
+mission, gym or opponents are joined in the same query.
+
+Battles are read from both indexes, ``size + 1`` rows each, and merged.
+"""
+import datetime
+from heapq import merge
+from typing import NamedTuple
+
+from django.db.models import Q
+
+from .models import Battle, CommittedCrime, CompletedMission, GymSession
+
+PAGE_SIZE = 25
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Page(NamedTuple):
+    """Rows of one page and the cursor of the next (None on the last page)."""
+
+    entries: list
+    next_cursor: str
+
+
+class History(NamedTuple):
+    """A history table: its date column, the relations shown with it and the columns naming its player."""
+
+    model: type
+    date_field: str
+    related: tuple
+    owners: tuple
+
+
+HISTORIES = {
+    'crimes': History(CommittedCrime, 'date', ('crime',), ('profile',)),
+    'missions': History(CompletedMission, 'completion_date', ('mission__location',), ('profile',)),
+    'gym': History(GymSession, 'date', ('gym',), ('profile',)),
+    'battles': History(Battle, 'date', ('attacker__user', 'defender__user'), ('attacker', 'defender')),
+}
+
+
+class HistoryError(Exception):
+    """Raised for a cursor that ``encode_cursor`` did not make."""
+
+
+def encode_cursor(date, pk):
+    """An opaque cursor for the rows older than ``(date, pk)``."""
+    delta = date - _EPOCH
+    return f'{(delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds}.{pk}'
+
+
+def decode_cursor(cursor):
+    """``(date, pk)`` of a cursor made by ``encode_cursor``."""
+    try:
+        micros, pk = (int(part) for part in cursor.split('.'))
+        return _EPOCH + datetime.timedelta(microseconds=micros), pk
+    except (ValueError, OverflowError):
+        raise HistoryError("That page of your history does not exist.")
+
+
+def _older(history, owner, profile, after, limit):
+    date_field = history.date_field
+    rows = history.model.objects.filter(**{owner: profile}).select_related(*history.related)
+    if after is not None:
+        date, pk = after
+        # The inclusive bound keeps the index range; the OR only breaks ties on the boundary date.
+        rows = rows.filter(**{f'{date_field}__lte': date}).filter(
+            Q(**{f'{date_field}__lt': date}) | Q(pk__lt=pk)
+        )
+    return rows.order_by(f'-{date_field}', '-pk')[:limit]
+
+
+def page(name, profile, cursor=None, size=PAGE_SIZE):
+    """
+    The page of ``profile``'s ``name`` history (a key of ``HISTORIES``) after
+    ``cursor``, or the first page without one.
+
+    Raises HistoryError for a malformed cursor.
+    """
+    history = HISTORIES[name]
+    after = decode_cursor(cursor) if cursor else None
+
+    def key(row):
+        return getattr(row, history.date_field), row.pk
+
+    if len(history.owners) == 1:
+        rows = list(_older(history, history.owners[0], profile, after, size + 1))
+    else:
+        sides = [_older(history, owner, profile, after, size + 1) for owner in history.owners]
+        rows, seen = [], set()
+        for row in merge(*sides, key=key, reverse=True):
+            # A row matching more than one owner appears once.
+            if row.pk not in seen:
+                seen.add(row.pk)
+                rows.append(row)
+                if len(rows) > size:
+                    break
+
+    if len(rows) <= size:
+        return Page(rows, None)
+    entries = rows[:size]
+    return Page(entries, encode_cursor(*key(entries[-1])))
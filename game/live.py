@@ -0,0 +1,265 @@
+"""
+Pub/sub bus behind the server-sent events endpoint.
+
+Publishers (model signals in any thread of any process on the host, including
+the ``run_exchange`` engine) append events to a small SQLite relay next to the
+shared cache. Every process holding open streams runs one thread that polls the
+relay and fans the new events out to its own subscribers; each event is encoded
+into its SSE frame once per process and the same bytes are handed to every
+subscriber of the topic.
+
+Processes record the topics they watch in the relay, so publishers skip the
+write when no stream anywhere on the host is interested. A process that dies
+stops refreshing its watches and they expire after ``WATCH_TTL`` seconds.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+# Seconds between two reads of the relay by a process with open streams.
+POLL_INTERVAL = 0.25
+
+# Seconds a watch stays valid without being refreshed by its process.
+WATCH_TTL = 30
+
+# Seconds relayed events are kept for processes catching up.
+RETENTION = 60
+
+# Seconds a write waits for another process's write to finish.
+BUSY_TIMEOUT = 5
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS event (id INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL,'
+    ' event TEXT NOT NULL, data TEXT NOT NULL, frame INTEGER NOT NULL, created_at REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS watch (topic TEXT NOT NULL, process INTEGER NOT NULL, expires_at REAL NOT NULL,'
+    ' PRIMARY KEY (topic, process)) WITHOUT ROWID',
+)
+
+# Profile fields pushed to the player's own stream.
+PROFILE_FIELDS = (
+    'level', 'experience', 'life', 'max_life', 'energy', 'max_energy', 'endurance', 'max_endurance',
+    'mood', 'max_mood', 'knowledge_points', 'money', 'bank_money', 'current_location_id',
+    'travel_destination_id', 'arrival_time', 'is_in_jail', 'jail_release_time', 'is_in_hospital',
+    'hospital_release_time',
+)
+
+
+def profile_topic(profile_id):
+    return f'profile:{profile_id}'
+
+
+def stock_topic(symbol):
+    return f'stock:{symbol}'
+
+
+def to_json(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def from_json(text):
+    return json.loads(text)
+
+
+def encode_event(event, data):
+    """Encode one server-sent event frame."""
+    return f'event: {event}\ndata: {to_json(data)}\n\n'.encode()
+
+
+def profile_payload(profile):
+    """Plain, JSON-friendly snapshot of the live profile fields."""
+    return {field: getattr(profile, field) for field in PROFILE_FIELDS}
+
+
+class Subscription:
+    """A single stream's queue of events, fed from any thread."""
+
+    def __init__(self, bus, topics, maxsize=100):
+        self.bus = bus
+        self.topics = tuple(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client misses this tick; the next one carries the latest values.
+            pass
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class Relay:
+    """The host-wide event log and watch list, one SQLite file per game database."""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._local = threading.local()
+
+    def path(self):
+        if self._path is not None:
+            return self._path
+        # One relay per game database, so test databases on the host do not share events.
+        name = hashlib.md5(str(connection.settings_dict['NAME']).encode()).hexdigest()[:12]
+        return os.path.join(tempfile.gettempdir(), f'lafraud-live-{name}.sqlite3')
+
+    def store(self):
+        """This thread's connection to the relay, reopened after a fork or a database switch."""
+        path = self.path()
+        store = getattr(self._local, 'store', None)
+        if store is None or self._local.key != (path, os.getpid()):
+            store = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+            # Events are transient: losing the last ones in a crash only skips a tick.
+            store.execute('PRAGMA journal_mode=WAL')
+            store.execute('PRAGMA synchronous=OFF')
+            for statement in _SCHEMA:
+                store.execute(statement)
+            self._local.store, self._local.key = store, (path, os.getpid())
+        return store
+
+    def watched(self, topic):
+        """Whether a stream of any process on the host watches ``topic``."""
+        return self.store().execute(
+            'SELECT 1 FROM watch WHERE topic = ? AND expires_at > ? LIMIT 1', (topic, time.time()),
+        ).fetchone() is not None
+
+    def append(self, topic, event, data, frame):
+        self.store().execute(
+            'INSERT INTO event (topic, event, data, frame, created_at) VALUES (?, ?, ?, ?, ?)',
+            (topic, event, to_json(data), frame, time.time()),
+        )
+
+    def watch(self, topics, process):
+        expires_at = time.time() + WATCH_TTL
+        self.store().executemany(
+            'INSERT INTO watch VALUES (?, ?, ?)'
+            ' ON CONFLICT (topic, process) DO UPDATE SET expires_at = excluded.expires_at',
+            [(topic, process, expires_at) for topic in topics],
+        )
+
+    def unwatch(self, topics, process):
+        self.store().executemany(
+            'DELETE FROM watch WHERE topic = ? AND process = ?', [(topic, process) for topic in topics],
+        )
+
+    def last_id(self):
+        return self.store().execute('SELECT COALESCE(MAX(id), 0) FROM event').fetchone()[0]
+
+    def since(self, last_id):
+        """``[(id, topic, event, data, frame)]`` appended after ``last_id``."""
+        return self.store().execute(
+            'SELECT id, topic, event, data, frame FROM event WHERE id > ? ORDER BY id', (last_id,),
+        ).fetchall()
+
+    def purge(self):
+        now = time.time()
+        store = self.store()
+        store.execute('DELETE FROM event WHERE created_at < ?', (now - RETENTION,))
+        store.execute('DELETE FROM watch WHERE expires_at < ?', (now,))
+
+
+class EventBus:
+    """Topic-based fan-out to the streams open in this process, fed from the relay."""
+
+    def __init__(self, relay):
+        self.relay = relay
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._poller = None
+
+    def subscribe(self, topics):
+        subscription = Subscription(self, topics)
+        with self._lock:
+            new = [topic for topic in subscription.topics if topic not in self._subscribers]
+            for topic in subscription.topics:
+                self._subscribers[topic].add(subscription)
+            self._start_polling()
+        if new:
+            self.relay.watch(new, os.getpid())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        gone = []
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+                        gone.append(topic)
+        if gone:
+            self.relay.unwatch(gone, os.getpid())
+
+    def has_subscribers(self, topic):
+        """Whether any process on the host has a stream open on ``topic``."""
+        return self.relay.watched(topic)
+
+    def publish(self, topic, event, data, frame=True):
+        """
+        Publish ``data`` on ``topic`` to the streams of every process on the host.
+
+        With ``frame`` the event is encoded once per process and every subscriber
+        receives the same bytes; otherwise subscribers get the data to build their
+        own delta. Either way the data goes through JSON, so subscribers see the
+        values as ``to_json`` writes them.
+        """
+        if self.relay.watched(topic):
+            self.relay.append(topic, event, data, frame)
+
+    def deliver(self, topic, event, data, frame):
+        """Hand an event to this process's subscribers of ``topic``."""
+        with self._lock:
+            subscribers = tuple(self._subscribers.get(topic, ()))
+        if not subscribers:
+            return
+        message = (event, encode_event(event, data) if frame else None, data)
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def _start_polling(self):
+        # Called with the lock held; one polling thread per process, started with the first stream.
+        if self._poller is None or self._poller[0] != os.getpid():
+            thread = threading.Thread(target=self._poll, args=(self.relay.last_id(),), name='live-relay', daemon=True)
+            self._poller = (os.getpid(), thread)
+            thread.start()
+
+    def _poll(self, last_id):
+        refreshed = time.monotonic()
+        while True:
+            time.sleep(POLL_INTERVAL)
+            with self._lock:
+                topics = list(self._subscribers)
+                if not topics:
+                    # The last stream closed; the next one starts a new thread.
+                    self._poller = None
+                    return
+            try:
+                if time.monotonic() - refreshed > WATCH_TTL / 3:
+                    refreshed = time.monotonic()
+                    self.relay.watch(topics, os.getpid())
+                    self.relay.purge()
+                for last_id, topic, event, data, frame in self.relay.since(last_id):
+                    self.deliver(topic, event, from_json(data), bool(frame))
+            except sqlite3.OperationalError:
+                # The relay is busy; the events wait for the next round.
+                continue
+
+
+bus = EventBus(Relay())
@@ -0,0 +1,148 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, AsyncRequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from accounts.models import User, Profile
+from game import views, async_views
+from game.middleware import PlayerContextMiddleware
+from game.models import Crime, CommittedCrime, Location, Mission, CompletedMission, Battle
+
+VIEWS = {
+    'home': ('/game/', views.game_home, async_views.game_home),
+    'properties': ('/game/properties/', views.properties, async_views.properties),
+    'stock_market': ('/game/stock-market/', views.stock_market, async_views.stock_market),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark WSGI (thread pool) against ASGI (event loop) latency and throughput '
+        'for the read-heavy game views under many idle-heavy connections.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', choices=VIEWS, default='home')
+        parser.add_argument('--connections', type=int, default=200,
+                            help='Number of concurrent client connections.')
+        parser.add_argument('--requests', type=int, default=5,
+                            help='Requests made by each connection.')
+        parser.add_argument('--idle-ms', type=float, default=50,
+                            help='Idle time each connection holds after every request.')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='WSGI worker threads.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            user = self._seed()
+            path, sync_view, async_view = VIEWS[options['view']]
+            for label, runner in (('WSGI', self._run_wsgi), ('ASGI', self._run_asgi)):
+                latencies, elapsed = runner(user, path, sync_view, async_view, options)
+                self._report(label, latencies, elapsed)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _seed(self):
+        user = User.objects.create_user('bench@example.com', 'bench', username_display='bench')
+        opponent_user = User.objects.create_user('rival@example.com', 'bench', username_display='rival')
+        profile = Profile.objects.create(user=user)
+        opponent = Profile.objects.create(user=opponent_user)
+        location = Location.objects.create(name='Home City', description='', travel_cost=0, travel_time=0)
+        crime = Crime.objects.create(
+            name='Pickpocket', description='', energy_cost=5, experience_reward=5,
+            money_reward_min=Decimal('10'), money_reward_max=Decimal('50'),
+            jail_risk=10, jail_time=5, cooldown=1,
+        )
+        mission = Mission.objects.create(
+            name='Delivery', description='', location=location, experience_reward=10,
+            money_reward=Decimal('100'), mission_type='delivery', difficulty='easy', cooldown=10,
+        )
+        now = timezone.now()
+        for _ in range(50):
+            CommittedCrime.objects.create(profile=profile, crime=crime, success=True, next_available_time=now)
+            CompletedMission.objects.create(profile=profile, mission=mission, next_available_time=now)
+            Battle.objects.create(
+                attacker=profile, defender=opponent, attacker_won=True, experience_gained=5,
+                attacker_damage_dealt=10, defender_damage_dealt=5,
+            )
+        return user
+
+    def _run_wsgi(self, user, path, sync_view, async_view, options):
+        factory = RequestFactory()
+
+        def serve():
+            request = factory.get(path)
+            self._authenticate(request, user)
+            sync_view(request)
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            async def call():
+                # The request waits for a free worker thread, as behind a WSGI server.
+                await asyncio.get_running_loop().run_in_executor(pool, serve)
+
+            return self._drive(call, options)
+
+    def _run_asgi(self, user, path, sync_view, async_view, options):
+        factory = AsyncRequestFactory()
+
+        async def call():
+            request = factory.get(path)
+            self._authenticate(request, user)
+            await async_view(request)
+
+        return self._drive(call, options)
+
+    def _drive(self, call, options):
+        """
+        Run the simulated connections against ``call`` and time every request.
+
+        Both servers are measured the same way: a request's latency runs from the
+        moment the client sends it until its response, including any wait for the
+        server, and the client idles between requests without holding a worker.
+        """
+        idle = options['idle_ms'] / 1000
+
+        async def connection_loop():
+            latencies = []
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                await call()
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(idle)
+            return latencies
+
+        async def run():
+            results = await asyncio.gather(*(connection_loop() for _ in range(options['connections'])))
+            return [latency for result in results for latency in result]
+
+        start = time.perf_counter()
+        latencies = asyncio.run(run())
+        return latencies, time.perf_counter() - start
+
+    def _authenticate(self, request, user):
+        # Stand-in for the session and auth middleware; the player context still loads per request.
+        async def auser():
+            return user
+
+        request.user = request._cached_user = user
+        request.auser = auser
+        PlayerContextMiddleware(lambda request: None).process_request(request)
+
+    def _report(self, label, latencies, elapsed):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f'{label}: {len(latencies)} requests in {elapsed:.2f}s '
+            f'({len(latencies) / elapsed:.1f} req/s), '
+            f'p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms'
+        )
@@ -0,0 +1,92 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from accounts.models import User, Profile
+from game.exchange import Batch, BookOrder, MatchingEngine
+from game.models import StockMarket, StockOrder
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the exchange matching engine: orders matched per second in memory and end to end.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--stocks', type=int, default=5)
+        parser.add_argument('--players', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            rng = random.Random(options['seed'])
+            stocks = [
+                StockMarket.objects.create(
+                    name=f'Bench {i}', symbol=f'B{i}', description='', current_price=Decimal('100.00'),
+                    previous_price=Decimal('100.00'), total_shares=10 ** 6, available_shares=options['orders'],
+                    next_dividend_date=timezone.now(),
+                )
+                for i in range(options['stocks'])
+            ]
+            profiles = [
+                Profile.objects.create(
+                    user=User.objects.create_user(f'trader-{i}@example.com', 'bench', username_display=f'trader-{i}'),
+                    money=Decimal('1000000.00'),
+                )
+                for i in range(options['players'])
+            ]
+            orders = [
+                (rng.choice(profiles).pk, rng.choice(stocks).pk, rng.choice(('buy', 'sell')),
+                 Decimal(rng.randint(9000, 11000)) / 100, rng.randint(1, 50))
+                for _ in range(options['orders'])
+            ]
+
+            # Matching alone, on in-memory orders.
+            engine = MatchingEngine()
+            engine._refresh_house()
+            batch = Batch()
+            start = time.perf_counter()
+            for i, (profile_id, stock_id, side, price, quantity) in enumerate(orders, 1):
+                engine.process(BookOrder(i, profile_id, stock_id, side, price, quantity, quantity), batch)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'in memory: {len(orders)} orders in {elapsed * 1000:.1f} ms '
+                f'({len(orders) / elapsed:.0f} orders/s), {len(batch.trades)} trades'
+            )
+
+            # End to end: read the orders, match and persist each batch.
+            StockOrder.objects.bulk_create(
+                [
+                    StockOrder(profile_id=profile_id, stock_id=stock_id, side=side, price=price,
+                               quantity=quantity, remaining=quantity)
+                    for profile_id, stock_id, side, price, quantity in orders
+                ],
+                batch_size=1000,
+            )
+            engine = MatchingEngine()
+            trades = batches = 0
+            queries = []
+            with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+                start = time.perf_counter()
+                while True:
+                    batch = engine.run_batch(options['batch_size'])
+                    if not batch.orders:
+                        break
+                    batches += 1
+                    trades += len(batch.trades)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'end to end: {len(orders)} orders in {elapsed * 1000:.1f} ms '
+                f'({len(orders) / elapsed:.0f} orders/s), {trades} trades, '
+                f'{batches} batches, {len(queries)} queries'
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
@@ -0,0 +1,62 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from accounts.models import User, Profile
+from game import training
+from game.models import Gym
+
+
+class Command(BaseCommand):
+    help = 'Benchmark training N gym sessions one at a time against one closed-form batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=200,
+                            help='Sessions trained per player.')
+        parser.add_argument('--players', type=int, default=20)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            sessions = options['sessions']
+            gym = Gym.objects.create(
+                name='Bench Gym', description='', effectiveness=1.5, cost_per_session=Decimal('1.00'),
+            )
+            for label, batch in (('single-session', False), ('batch', True)):
+                profiles = self._profiles(label, options['players'], sessions)
+                queries = []
+                with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+                    start = time.perf_counter()
+                    for profile in profiles:
+                        if batch:
+                            training.train(profile, gym, 'strength', sessions)
+                        else:
+                            for _ in range(sessions):
+                                training.train(profile, gym, 'strength', 1)
+                    elapsed = time.perf_counter() - start
+                total = len(profiles) * sessions
+                gained = sum(profile.strength - 10 for profile in profiles)
+                self.stdout.write(
+                    f'{label}: {total} sessions in {elapsed * 1000:.1f} ms '
+                    f'({total / elapsed:.0f} sessions/s), {len(queries)} queries, '
+                    f'{gained} strength gained'
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _profiles(self, label, players, sessions):
+        profiles = []
+        for i in range(players):
+            user = User.objects.create_user(f'{label}-{i}@example.com', 'bench', username_display=f'{label}-{i}')
+            profiles.append(Profile.objects.create(
+                user=user,
+                energy=sessions * training.ENERGY_PER_SESSION,
+                max_energy=sessions * training.ENERGY_PER_SESSION,
+                money=Decimal(sessions),
+            ))
+        return profiles
@@ -0,0 +1,96 @@
+from argparse import ArgumentTypeError
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Profile
+from game import operations
+from game.models import GangMember, Item
+
+OPERATIONS = ('release-jail', 'release-hospital', 'reset-cooldowns', 'refund', 'grant-item')
+
+
+def amount(value):
+    """A positive amount of money in whole cents."""
+    try:
+        money = Decimal(value)
+    except InvalidOperation:
+        raise ArgumentTypeError(f'{value!r} is not an amount of money.')
+    if not money.is_finite() or money <= 0 or money != money.quantize(Decimal('0.01')):
+        raise ArgumentTypeError(f'{value!r} is not a positive amount of whole cents.')
+    return money
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply a set-based operation to every player matching the filters, e.g. '
+        '"bulk_players refund --gang 3 --amount 500". Use --dry-run to only count the rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('operation', choices=OPERATIONS)
+        parser.add_argument('--ids', type=int, nargs='+', help='Only these profile ids.')
+        parser.add_argument('--gang', type=int, help='Only members of this gang.')
+        parser.add_argument('--character-type', help='Only this character type.')
+        parser.add_argument('--in-jail', action='store_true', help='Only players in jail.')
+        parser.add_argument('--amount', type=amount, help='Money to refund.')
+        parser.add_argument('--item-id', type=int, help='Item to grant.')
+        parser.add_argument('--quantity', type=int, default=1, help='Quantity of the item to grant.')
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--operator', help='Email of the staff user recorded in the admin log.')
+        parser.add_argument('--chunk-size', type=int, default=operations.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.all()
+        if options['ids']:
+            profiles = profiles.filter(pk__in=options['ids'])
+        if options['gang'] is not None:
+            profiles = profiles.filter(
+                pk__in=GangMember.objects.filter(gang_id=options['gang']).values('profile_id')
+            )
+        if options['character_type']:
+            profiles = profiles.filter(character_type=options['character_type'])
+        if options['in_jail']:
+            profiles = profiles.filter(is_in_jail=True)
+
+        operator = None
+        if options['operator']:
+            try:
+                operator = get_user_model().objects.get(email=options['operator'], is_staff=True)
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No staff user with email {options['operator']}.")
+        elif not options['dry_run']:
+            raise CommandError('--operator is required unless --dry-run is given.')
+
+        operation = options['operation']
+        kwargs = {'dry_run': options['dry_run'], 'chunk_size': options['chunk_size']}
+        if operation == 'release-jail':
+            description = 'Release from jail'
+            count = operations.release_from_jail(profiles, **kwargs)
+        elif operation == 'release-hospital':
+            description = 'Release from hospital'
+            count = operations.release_from_hospital(profiles, **kwargs)
+        elif operation == 'reset-cooldowns':
+            description = 'Reset cooldowns'
+            count = operations.reset_cooldowns(profiles, **kwargs)
+        elif operation == 'refund':
+            if options['amount'] is None:
+                raise CommandError('refund needs --amount.')
+            description = f"Refund ${options['amount']}"
+            count = operations.refund(profiles, options['amount'], **kwargs)
+        else:
+            try:
+                item = Item.objects.get(pk=options['item_id'])
+            except Item.DoesNotExist:
+                raise CommandError('grant-item needs a valid --item-id.')
+            if options['quantity'] < 1:
+                raise CommandError('--quantity must be at least 1.')
+            description = f"Grant {options['quantity']} x {item.name}"
+            count = operations.grant_item(profiles, item, options['quantity'], **kwargs)
+
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: {description} would affect {count} rows.')
+            return
+        operations.log_operation(operator, f'{description}: {count} rows')
+        self.stdout.write(self.style.SUCCESS(f'{description}: {count} rows updated.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from game.treasury import compact_all
+
+
+class Command(BaseCommand):
+    help = 'Fold recent gang ledger entries into the gangs\' running totals. Run periodically, e.g. from cron.'
+
+    def handle(self, *args, **options):
+        compacted = compact_all()
+        self.stdout.write(f'Compacted the ledgers of {compacted} gangs.')
@@ -0,0 +1,51 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from game import exports
+from game.models import ExportWatermark
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream game history tables to files for analytics with constant memory use. '
+        'With --incremental only the rows added since the previous incremental run are exported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('exports', nargs='+', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output.')
+        parser.add_argument('--output-dir', default='.')
+        parser.add_argument('--incremental', action='store_true', help='Start after the stored watermark.')
+        parser.add_argument('--after', type=int, help='Start after this id instead of the watermark.')
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['output_dir']):
+            raise CommandError(f"{options['output_dir']} is not a directory.")
+        suffix = timezone.now().strftime('-%Y%m%d%H%M%S')
+        for name in options['exports']:
+            incremental = options['incremental'] and exports.EXPORTS[name].incremental
+            watermark = None
+            after = options['after'] or 0
+            if incremental:
+                watermark, _ = ExportWatermark.objects.get_or_create(name=name)
+                if options['after'] is None:
+                    after = watermark.last_id
+
+            path = os.path.join(
+                options['output_dir'],
+                exports.filename(name, options['format'], options['gzip'], suffix),
+            )
+            chunks, progress = exports.stream(name, options['format'], after, options['gzip'])
+            with open(path, 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+
+            if watermark is not None and progress.rows:
+                # Only advanced once the file is completely written.
+                watermark.last_id = progress.last_id
+                watermark.rows_exported += progress.rows
+                watermark.save(update_fields=['last_id', 'rows_exported', 'updated_at'])
+            self.stdout.write(f'{name}: {progress.rows} rows after #{after} written to {path}')
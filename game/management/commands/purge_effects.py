@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from game.effects import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired booster and training enhancer effects. Run periodically, e.g. from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(f'Deleted {deleted} expired effects.')
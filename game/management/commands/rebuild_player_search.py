@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from game import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the player search index from every user\'s display name, e.g. after a bulk import.'
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild()
+        self.stdout.write(f'Indexed the names of {indexed} players.')
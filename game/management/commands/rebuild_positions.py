@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from game.models import StockPosition
+from game.portfolio import rebuild_positions
+
+
+class Command(BaseCommand):
+    help = 'Recompute every stock position from its lots. Run once after upgrading, or after editing lots by hand.'
+
+    def handle(self, *args, **options):
+        rebuild_positions()
+        self.stdout.write(f'Rebuilt {StockPosition.objects.count()} positions.')
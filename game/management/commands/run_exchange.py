@@ -0,0 +1,48 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.exchange import EngineRunning, MatchingEngine, engine_lock
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the stock exchange matching engine. Only one engine may run at a time, as it keeps '
+        'the order books in memory; a second one exits with an error.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait when there are no new orders.')
+        parser.add_argument('--once', action='store_true', help='Run a single batch and exit.')
+
+    def handle(self, *args, **options):
+        try:
+            with engine_lock():
+                self.run(options)
+        except EngineRunning as e:
+            raise CommandError(str(e))
+
+    def run(self, options):
+        engine = MatchingEngine()
+        engine.load()
+        self.stdout.write(f'Loaded {sum(len(book.orders) for book in engine.books.values())} open orders.')
+        while True:
+            try:
+                batch = engine.run_batch(options['batch_size'])
+            except Exception:
+                # The books may no longer match the database; start again from the open orders.
+                logger.exception('Exchange batch failed, reloading the order books')
+                engine = MatchingEngine()
+                engine.load()
+                batch = None
+            if options['once']:
+                if batch is not None:
+                    self.stdout.write(f'Matched {len(batch.trades)} trades.')
+                return
+            if batch is None or len(batch.orders) == 0:
+                time.sleep(options['interval'])
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from game.bank import settle_dormant
+
+
+class Command(BaseCommand):
+    help = (
+        'Settle bank interest on accounts nobody has looked at for a while. Optional: interest is '
+        'settled lazily anyway; run it at month end if statements should show it, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-days', type=int, default=28)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        settled = settle_dormant(timedelta(days=options['idle_days']), options['chunk_size'])
+        self.stdout.write(f'Settled interest on {settled} accounts.')
@@ -0,0 +1,89 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game import registry
+
+try:
+    from game import simulation
+except ImportError:  # NumPy is only needed for this command.
+    simulation = None
+
+
+class Command(BaseCommand):
+    help = 'Simulate synthetic players against the current design tables and report the balance.'
+
+    def add_arguments(self, parser):
+        defaults = simulation.Params() if simulation else None
+        parser.add_argument('--players', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: one per CPU).')
+        parser.add_argument('--shard-size', type=int, default=10000,
+                            help='Players per shard; each shard has its own seed.')
+        parser.add_argument('--energy-per-day', type=float, default=defaults and defaults.energy_per_day,
+                            help='Energy the most active players spend per day.')
+        parser.add_argument('--active-minutes', type=float, default=defaults and defaults.active_minutes,
+                            help='Minutes per day players spend acting, which caps repeats by cooldown.')
+        parser.add_argument('--missions-per-day', type=int, default=defaults and defaults.missions_per_day)
+        parser.add_argument('--shop-chance', type=float, default=defaults and defaults.shop_chance,
+                            help='Chance per day that a player buys the dearest item they can afford.')
+        parser.add_argument('--level-base', type=float, default=defaults and defaults.level_base,
+                            help='Assumed level curve: level = 1 + floor(sqrt(experience / level base)).')
+
+    def handle(self, *args, **options):
+        if simulation is None:
+            raise CommandError('The balance simulator needs NumPy; install it with `pip install numpy`.')
+        players, days = options['players'], options['days']
+        if players < 1 or days < 1 or options['shard_size'] < 1:
+            raise CommandError('--players, --days and --shard-size must be positive.')
+        params = simulation.Params(
+            energy_per_day=options['energy_per_day'],
+            active_minutes=options['active_minutes'],
+            missions_per_day=options['missions_per_day'],
+            shop_chance=options['shop_chance'],
+            level_base=options['level_base'],
+        )
+        design = simulation.design_from(registry.get())
+
+        start = time.perf_counter()
+        result = simulation.run(
+            design, players, days, seed=options['seed'], workers=options['workers'],
+            shard_size=options['shard_size'], params=params,
+        )
+        elapsed = time.perf_counter() - start
+        summary = simulation.summarize(design, result, days)
+
+        self.stdout.write(
+            f"{summary['player_days']:,} player-days ({players:,} players x {days} days) "
+            f"in {elapsed:.1f} s, seed {options['seed']}"
+        )
+        self.stdout.write(
+            f"Design: {len(design.crime_levels)} crimes, {len(design.mission_levels)} missions, "
+            f"{len(design.gym_levels)} gyms, {len(design.item_prices)} items for sale"
+        )
+        self.stdout.write('Level: ' + ', '.join(
+            f'p{key} {value:.0f}' if key != 'max' else f'max {value:.0f}' for key, value in summary['level'].items()
+        ))
+        self.stdout.write(
+            f"Money supply: ${summary['money_supply']:,.0f}; per player "
+            + ', '.join(f'p{key} ${value:,.0f}' for key, value in summary['money'].items())
+            + f"; spent on items ${summary['item_spending']:,.0f}"
+        )
+        self.stdout.write(
+            f"Jail: {summary['jail_rate']:.1%} of player-days, {summary['ever_jailed']:.1%} of players ever, "
+            f"{summary['jail_minutes_per_day']:.0f} min per player-day"
+        )
+        self.stdout.write('Achievements:')
+        for achievement in summary['achievements']:
+            if not achievement['tracked']:
+                line = 'not simulated'
+            elif achievement['median_day'] is None:
+                line = 'never reached'
+            else:
+                line = (
+                    f"{achievement['reached']:.1%} reached, median day {achievement['median_day']:.0f}, "
+                    f"p90 day {achievement['p90_day']:.0f}"
+                )
+            self.stdout.write(f"  {achievement['name']}: {line}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from game.economy import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Record a snapshot of the money supply and cash distribution. Run periodically, e.g. hourly from cron.'
+
+    def handle(self, *args, **options):
+        snapshot = take_snapshot()
+        self.stdout.write(
+            f'{snapshot}: money supply ${snapshot.money_supply} across {snapshot.players} players, '
+            f'median cash ${snapshot.cash_p50}.'
+        )
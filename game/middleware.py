@@ -0,0 +1,36 @@
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.middleware import get_user as get_session_user
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .player import aget_player, get_player
+
+
+def get_user(request):
+    # The player context loads the user in the same query as the profile.
+    player = get_player(request)
+    if player is not None:
+        return player.user
+    return get_session_user(request)
+
+
+async def auser(request):
+    return await sync_to_async(get_user)(request)
+
+
+class PlayerContextMiddleware(MiddlewareMixin):
+    """
+    Attach the logged-in player's context to the request as ``request.player``.
+
+    Async views should use ``await request.aplayer()`` instead. Must come after
+    ``AuthenticationMiddleware``, whose ``request.user`` it takes over so that the
+    user is not queried separately from the profile.
+    """
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(auser, request)
+        request.player = SimpleLazyObject(lambda: get_player(request))
+        request.aplayer = partial(aget_player, request)
@@ -0,0 +1,509 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Achievement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('requirement_type', models.CharField(choices=[('crimes', 'Crimes Committed'), ('battles', 'Battles Won'), ('missions', 'Missions Completed'), ('level', 'Level Reached'), ('money', 'Money Earned'), ('properties', 'Properties Owned')], max_length=20)),
+                ('requirement_value', models.IntegerField()),
+                ('knowledge_points_reward', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CombatSheet',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='combat_sheet', serialize=False, to='accounts.profile')),
+                ('attack', models.IntegerField()),
+                ('defense', models.IntegerField()),
+                ('speed', models.IntegerField()),
+                ('dexterity', models.IntegerField()),
+                ('attack_bonus', models.IntegerField(default=0)),
+                ('defense_bonus', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Crime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('required_level', models.IntegerField(default=1)),
+                ('required_strength', models.IntegerField(default=0)),
+                ('required_speed', models.IntegerField(default=0)),
+                ('required_dexterity', models.IntegerField(default=0)),
+                ('required_defense', models.IntegerField(default=0)),
+                ('energy_cost', models.IntegerField()),
+                ('experience_reward', models.IntegerField()),
+                ('money_reward_min', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('money_reward_max', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('jail_risk', models.IntegerField(help_text='Percentage chance of going to jail')),
+                ('jail_time', models.IntegerField(help_text='Jail time in minutes if caught')),
+                ('cooldown', models.IntegerField(help_text='Cooldown time in minutes')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExportWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('rows_exported', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Gang',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField()),
+                ('image', models.CharField(blank=True, max_length=255, null=True)),
+                ('gang_type', models.CharField(choices=[('criminal', 'Criminal Gang'), ('police', 'Police Task Force')], max_length=10)),
+                ('level', models.IntegerField(default=1)),
+                ('experience', models.IntegerField(default=0)),
+                ('money', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Gym',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('image', models.CharField(blank=True, max_length=255, null=True)),
+                ('required_level', models.IntegerField(default=1)),
+                ('effectiveness', models.FloatField(help_text='Multiplier for stat gains')),
+                ('cost_per_session', models.DecimalField(decimal_places=2, max_digits=15)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Item',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('image', models.CharField(blank=True, max_length=255, null=True)),
+                ('is_available', models.BooleanField(default=True)),
+                ('item_type', models.CharField(choices=[('weapon', 'Weapon'), ('armor', 'Armor'), ('medical', 'Medical Supply'), ('booster', 'Booster'), ('training', 'Training Enhancer'), ('temporary', 'Temporary Item')], max_length=20)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('image', models.CharField(blank=True, max_length=255, null=True)),
+                ('travel_cost', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('travel_time', models.IntegerField(help_text='Travel time in minutes')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlayerName',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('name', models.CharField(db_index=True, help_text='Case-folded, for prefix matches', max_length=30)),
+                ('display', models.CharField(max_length=30)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Property',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('image', models.CharField(blank=True, max_length=255, null=True)),
+                ('happiness_bonus', models.IntegerField(default=0)),
+                ('income_per_day', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('property_type', models.CharField(choices=[('home', 'Home'), ('business', 'Business'), ('vault', 'Vault')], max_length=10)),
+                ('storage_capacity', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMarket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('symbol', models.CharField(max_length=10, unique=True)),
+                ('description', models.TextField()),
+                ('current_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('previous_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('total_shares', models.IntegerField()),
+                ('available_shares', models.IntegerField()),
+                ('dividend_percentage', models.FloatField(default=0)),
+                ('next_dividend_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Bounty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('placed_date', models.DateTimeField(auto_now_add=True)),
+                ('claimed_date', models.DateTimeField(blank=True, null=True)),
+                ('claimed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bounties_claimed', to='accounts.profile')),
+                ('placer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bounties_placed', to='accounts.profile')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bounties_on_me', to='accounts.profile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EconomySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+                ('players', models.IntegerField()),
+                ('wallet_money', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('bank_money', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('property_money', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('gang_money', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('stock_value', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('cash_p50', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('cash_p90', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('cash_p99', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('cash_max', models.DecimalField(decimal_places=2, max_digits=15)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['taken_at'], name='game_econom_taken_a_e0ac39_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GangMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('leader', 'Leader'), ('officer', 'Officer'), ('member', 'Member')], default='member', max_length=10)),
+                ('join_date', models.DateTimeField(auto_now_add=True)),
+                ('gang', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='game.gang')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gang_memberships', to='accounts.profile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Inventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='accounts.profile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InventoryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=1)),
+                ('equipped', models.BooleanField(default=False)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.inventory')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.item')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='items',
+            field=models.ManyToManyField(through='game.InventoryItem', to='game.item'),
+        ),
+        migrations.CreateModel(
+            name='Booster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booster_type', models.CharField(choices=[('energy', 'Energy'), ('mood', 'Mood'), ('cooldown', 'Cooldown Reduction')], max_length=10)),
+                ('boost_amount', models.IntegerField()),
+                ('duration', models.IntegerField(help_text='Duration in minutes')),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='booster', to='game.item')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Armor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('defense_power', models.IntegerField()),
+                ('durability', models.IntegerField()),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='armor', to='game.item')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MedicalSupply',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('healing_amount', models.IntegerField()),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='medical_supply', to='game.item')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Mission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('required_level', models.IntegerField(default=1)),
+                ('required_strength', models.IntegerField(default=0)),
+                ('required_speed', models.IntegerField(default=0)),
+                ('required_dexterity', models.IntegerField(default=0)),
+                ('required_defense', models.IntegerField(default=0)),
+                ('experience_reward', models.IntegerField()),
+                ('money_reward', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('mission_type', models.CharField(choices=[('combat', 'Combat'), ('delivery', 'Delivery'), ('crime', 'Crime'), ('police', 'Police')], max_length=10)),
+                ('difficulty', models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard'), ('extreme', 'Extreme')], max_length=10)),
+                ('cooldown', models.IntegerField(help_text='Cooldown time in minutes')),
+                ('item_rewards', models.ManyToManyField(blank=True, to='game.item')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='missions', to='game.location')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OwnedProperty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purchase_date', models.DateTimeField(auto_now_add=True)),
+                ('stored_money', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owned_properties', to='accounts.profile')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.property')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('buy', 'Buy'), ('sell', 'Sell')], max_length=4)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('quantity', models.IntegerField()),
+                ('remaining', models.IntegerField()),
+                ('status', models.CharField(choices=[('open', 'Open'), ('filled', 'Filled'), ('cancelled', 'Cancelled')], default='open', max_length=10)),
+                ('cancel_requested', models.BooleanField(default=False)),
+                ('placed_date', models.DateTimeField(auto_now_add=True)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_orders', to='accounts.profile')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='game.stockmarket')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockOwnership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shares', models.IntegerField()),
+                ('purchase_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('purchase_date', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reserved_lots', to='game.stockorder')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owned_stocks', to='accounts.profile')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.stockmarket')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shares', models.IntegerField(default=0)),
+                ('cost_basis', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_positions', to='accounts.profile')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='game.stockmarket')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockTrade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('shares', models.IntegerField()),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('buy_order', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='game.stockorder')),
+                ('sell_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='game.stockorder')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trades', to='game.stockmarket')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TemporaryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effect_type', models.CharField(choices=[('attack', 'Attack Boost'), ('defense', 'Defense Boost'), ('damage', 'Direct Damage')], max_length=10)),
+                ('effect_amount', models.IntegerField()),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='temporary_item', to='game.item')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrainingEnhancer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enhancement_percentage', models.IntegerField(help_text='Percentage increase in gym gains')),
+                ('duration', models.IntegerField(help_text='Duration in minutes')),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='training_enhancer', to='game.item')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Weapon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attack_power', models.IntegerField()),
+                ('durability', models.IntegerField()),
+                ('weapon_type', models.CharField(choices=[('firearm', 'Firearm'), ('melee', 'Melee')], max_length=10)),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='weapon', to='game.item')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Battle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attacker_won', models.BooleanField()),
+                ('money_stolen', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('experience_gained', models.IntegerField()),
+                ('attacker_damage_dealt', models.IntegerField()),
+                ('defender_damage_dealt', models.IntegerField()),
+                ('replay', models.BinaryField(blank=True, null=True)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('attacker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='battles_as_attacker', to='accounts.profile')),
+                ('defender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='battles_as_defender', to='accounts.profile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['attacker', 'date'], name='game_battle_attacke_bc5f2f_idx'), models.Index(fields=['defender', 'date'], name='game_battle_defende_1ee986_idx'), models.Index(fields=['date'], name='game_battle_date_b990f2_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CommittedCrime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('success', models.BooleanField()),
+                ('money_earned', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('experience_earned', models.IntegerField(default=0)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('next_available_time', models.DateTimeField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='committed_crimes', to='accounts.profile')),
+                ('crime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.crime')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['profile', 'crime', 'next_available_time'], name='game_commit_profile_77e2cc_idx'), models.Index(fields=['profile', 'date'], name='game_commit_profile_a720ce_idx'), models.Index(fields=['date'], name='game_commit_date_1d988e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='EarnedAchievement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('earned_date', models.DateTimeField(auto_now_add=True)),
+                ('achievement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.achievement')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='earned_achievements', to='accounts.profile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['earned_date'], name='game_earned_earned__ea6eee_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GangLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('contribution', 'Contribution'), ('withdrawal', 'Withdrawal'), ('adjustment', 'Adjustment')], max_length=12)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('experience', models.IntegerField(default=0)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('compacted', models.BooleanField(default=False)),
+                ('gang', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to='game.gang')),
+                ('profile', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.profile')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('compacted', False)), fields=['gang'], name='gang_ledger_pending'), models.Index(fields=['gang', 'profile', 'date'], name='game_gangle_gang_id_35feba_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GymSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stat_trained', models.CharField(choices=[('strength', 'Strength'), ('speed', 'Speed'), ('dexterity', 'Dexterity'), ('defense', 'Defense')], max_length=10)),
+                ('energy_used', models.IntegerField()),
+                ('stat_gain', models.IntegerField()),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('gym', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.gym')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gym_sessions', to='accounts.profile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['profile', 'date'], name='game_gymses_profile_a56747_idx'), models.Index(fields=['date'], name='game_gymses_date_46e107_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ActiveEffect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effect_type', models.CharField(choices=[('energy', 'Energy Regeneration'), ('mood', 'Mood'), ('cooldown', 'Cooldown Reduction'), ('training', 'Training Enhancement')], max_length=10)),
+                ('amount', models.IntegerField()),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='active_effects', to='accounts.profile')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['profile', 'expires_at'], name='game_active_profile_6bc7a9_idx'), models.Index(fields=['expires_at'], name='game_active_expires_be175f_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CompletedMission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completion_date', models.DateTimeField(auto_now_add=True)),
+                ('next_available_time', models.DateTimeField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completed_missions', to='accounts.profile')),
+                ('mission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.mission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['profile', 'mission', 'next_available_time'], name='game_comple_profile_ce8f44_idx'), models.Index(fields=['profile', 'completion_date'], name='game_comple_profile_9ddc61_idx'), models.Index(fields=['completion_date'], name='game_comple_complet_1aa32c_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerNameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='game.playername')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trigram', 'player'), name='unique_player_trigram')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Route',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cost', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('travel_time', models.IntegerField(help_text='Travel time in minutes')),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='game.location')),
+                ('origin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='routes', to='game.location')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('origin', 'destination'), name='unique_route')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockorder',
+            index=models.Index(fields=['status', 'stock'], name='game_stocko_status_cd2270_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockorder',
+            index=models.Index(fields=['profile', 'status'], name='game_stocko_profile_243545_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockownership',
+            index=models.Index(fields=['profile', 'stock', 'purchase_date'], name='game_stocko_profile_346f2c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockownership',
+            index=models.Index(fields=['purchase_date'], name='game_stocko_purchas_8b12d1_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockposition',
+            constraint=models.UniqueConstraint(fields=('profile', 'stock'), name='unique_stock_position'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktrade',
+            index=models.Index(fields=['stock', 'date'], name='game_stockt_stock_i_801ddd_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
+from decimal import Decimal
+
 from django.db import models
 from accounts.models import User, Profile
+from .replays import Replay
 
 
 class Item(models.Model):
@@ -113,6 +116,36 @@ class TemporaryItem(models.Model):
         return f"{self.item.name} - {self.get_effect_type_display()}"
 
 
+class ActiveEffect(models.Model):
+    """Timed effects of used boosters and training enhancers."""
+    
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='active_effects')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    
+    # Effect types
+    EFFECT_TYPES = [
+        ('energy', 'Energy Regeneration'),
+        ('mood', 'Mood'),
+        ('cooldown', 'Cooldown Reduction'),
+        ('training', 'Training Enhancement'),
+    ]
+    effect_type = models.CharField(max_length=10, choices=EFFECT_TYPES)
+    amount = models.IntegerField()
+    
+    # Effect duration
+    started_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['profile', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.profile.user.username_display} - {self.item.name} until {self.expires_at}"
+
+
 class Inventory(models.Model):
     """Player's inventory of items."""
     
@@ -135,6 +168,25 @@ class InventoryItem(models.Model):
         return f"{self.inventory.profile.user.username_display} - {self.item.name} x{self.quantity}"
 
 
+class CombatSheet(models.Model):
+    """Combat stats of a profile with equipped gear applied, kept in sync by game.combat."""
+    
+    profile = models.OneToOneField(Profile, on_delete=models.CASCADE, primary_key=True, related_name='combat_sheet')
+    
+    # Effective stats
+    attack = models.IntegerField()
+    defense = models.IntegerField()
+    speed = models.IntegerField()
+    dexterity = models.IntegerField()
+    
+    # Contribution of equipped weapons, armor and temporary items
+    attack_bonus = models.IntegerField(default=0)
+    defense_bonus = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.profile.user.username_display} - ATK {self.attack} / DEF {self.defense}"
+
+
 class Property(models.Model):
     """Real estate properties that players can own."""
     
@@ -191,6 +243,23 @@ class Location(models.Model):
         return self.name
 
 
+class Route(models.Model):
+    """Precomputed travel cost and time between two locations, rebuilt by game.travel."""
+    
+    origin = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='routes')
+    destination = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='+')
+    cost = models.DecimalField(max_digits=15, decimal_places=2)
+    travel_time = models.IntegerField(help_text="Travel time in minutes")
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['origin', 'destination'], name='unique_route'),
+        ]
+    
+    def __str__(self):
+        return f"{self.origin.name} -> {self.destination.name}"
+
+
 class Mission(models.Model):
     """Missions that players can complete."""
     
@@ -243,6 +312,13 @@ class CompletedMission(models.Model):
     completion_date = models.DateTimeField(auto_now_add=True)
     next_available_time = models.DateTimeField()
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['profile', 'mission', 'next_available_time']),
+            models.Index(fields=['profile', 'completion_date']),
+            models.Index(fields=['completion_date']),
+        ]
+    
     def __str__(self):
         return f"{self.profile.user.username_display} - {self.mission.name}"
 
@@ -261,7 +337,7 @@ class Gang(models.Model):
     ]
     gang_type = models.CharField(max_length=10, choices=GANG_TYPES)
     
-    # Gang stats
+    # Gang stats; money and experience are running totals of the compacted ledger entries
     level = models.IntegerField(default=1)
     experience = models.IntegerField(default=0)
     money = models.DecimalField(max_digits=15, decimal_places=2, default=0)
@@ -294,6 +370,39 @@ class GangMember(models.Model):
         return f"{self.profile.user.username_display} - {self.gang.name} - {self.get_role_display()}"
 
 
+class GangLedgerEntry(models.Model):
+    """Append-only record of money and experience moving in and out of a gang's treasury."""
+    
+    gang = models.ForeignKey(Gang, on_delete=models.CASCADE, related_name='ledger')
+    profile = models.ForeignKey(Profile, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    
+    # Entry kinds
+    KINDS = [
+        ('contribution', 'Contribution'),
+        ('withdrawal', 'Withdrawal'),
+        ('adjustment', 'Adjustment'),
+    ]
+    kind = models.CharField(max_length=12, choices=KINDS)
+    
+    # Signed changes to the treasury
+    amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    experience = models.IntegerField(default=0)
+    
+    date = models.DateTimeField(auto_now_add=True)
+    
+    # Set once the entry is folded into the gang's running totals
+    compacted = models.BooleanField(default=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['gang'], condition=models.Q(compacted=False), name='gang_ledger_pending'),
+            models.Index(fields=['gang', 'profile', 'date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.gang.name} - {self.get_kind_display()} - {self.amount}"
+
+
 class Crime(models.Model):
     """Crimes that players can commit."""
     
@@ -339,6 +448,13 @@ class CommittedCrime(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     next_available_time = models.DateTimeField()
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['profile', 'crime', 'next_available_time']),
+            models.Index(fields=['profile', 'date']),
+            models.Index(fields=['date']),
+        ]
+    
     def __str__(self):
         result = "Success" if self.success else "Failure"
         return f"{self.profile.user.username_display} - {self.crime.name} - {result}"
@@ -386,6 +502,12 @@ class GymSession(models.Model):
     # Session date
     date = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['profile', 'date']),
+            models.Index(fields=['date']),
+        ]
+    
     def __str__(self):
         return f"{self.profile.user.username_display} - {self.gym.name} - {self.get_stat_trained_display()}"
 
@@ -407,9 +529,24 @@ class Battle(models.Model):
     attacker_damage_dealt = models.IntegerField()
     defender_damage_dealt = models.IntegerField()
     
+    # Round-by-round log packed by game/replays.py
+    replay = models.BinaryField(null=True, blank=True, editable=False)
+    
     # Battle date
     date = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['attacker', 'date']),
+            models.Index(fields=['defender', 'date']),
+            models.Index(fields=['date']),
+        ]
+    
+    @property
+    def rounds(self):
+        """The battle's rounds, decoded as they are read."""
+        return Replay(self.replay)
+    
     def __str__(self):
         winner = self.attacker.user.username_display if self.attacker_won else self.defender.user.username_display
         return f"{self.attacker.user.username_display} vs {self.defender.user.username_display} - Winner: {winner}"
@@ -460,8 +597,40 @@ class StockMarket(models.Model):
         return f"{self.name} ({self.symbol})"
 
 
+class StockPosition(models.Model):
+    """A player's holding of one stock: total shares and what they cost."""
+    
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='stock_positions')
+    stock = models.ForeignKey(StockMarket, on_delete=models.CASCADE, related_name='positions')
+    shares = models.IntegerField(default=0)
+    
+    # Purchase cost of the shares still held (the sum of the position's lots)
+    cost_basis = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'stock'], name='unique_stock_position'),
+        ]
+    
+    @property
+    def average_cost(self):
+        return (self.cost_basis / self.shares).quantize(Decimal('0.01')) if self.shares else Decimal('0.00')
+    
+    @property
+    def market_value(self):
+        return self.shares * self.stock.current_price
+    
+    @property
+    def unrealized(self):
+        """Unrealized profit or loss at the current price."""
+        return self.market_value - self.cost_basis
+    
+    def __str__(self):
+        return f"{self.profile.user.username_display} - {self.stock.symbol} - {self.shares} shares"
+
+
 class StockOwnership(models.Model):
-    """Stocks owned by players."""
+    """Tax lots behind each StockPosition: shares bought together at one price, sold oldest first."""
     
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='owned_stocks')
     stock = models.ForeignKey(StockMarket, on_delete=models.CASCADE)
@@ -473,10 +642,79 @@ class StockOwnership(models.Model):
     # Purchase date
     purchase_date = models.DateTimeField(auto_now_add=True)
     
+    # The open sell order the shares are reserved for; reserved lots are not part of the position
+    order = models.ForeignKey(
+        'StockOrder', on_delete=models.SET_NULL, null=True, blank=True, related_name='reserved_lots',
+    )
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['profile', 'stock', 'purchase_date']),
+            models.Index(fields=['purchase_date']),
+        ]
+    
     def __str__(self):
         return f"{self.profile.user.username_display} - {self.stock.symbol} - {self.shares} shares"
 
 
+class StockOrder(models.Model):
+    """Limit orders on the stock market, matched by the exchange engine."""
+    
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='stock_orders')
+    stock = models.ForeignKey(StockMarket, on_delete=models.CASCADE, related_name='orders')
+    
+    # Order sides
+    SIDES = [
+        ('buy', 'Buy'),
+        ('sell', 'Sell'),
+    ]
+    side = models.CharField(max_length=4, choices=SIDES)
+    
+    # Limit price and size; buyers' money and sellers' shares are reserved when the order is placed
+    price = models.DecimalField(max_digits=15, decimal_places=2)
+    quantity = models.IntegerField()
+    remaining = models.IntegerField()
+    
+    # Order status
+    STATUSES = [
+        ('open', 'Open'),
+        ('filled', 'Filled'),
+        ('cancelled', 'Cancelled'),
+    ]
+    status = models.CharField(max_length=10, choices=STATUSES, default='open')
+    cancel_requested = models.BooleanField(default=False)
+    
+    placed_date = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'stock']),
+            models.Index(fields=['profile', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_side_display()} {self.remaining}/{self.quantity} {self.stock.symbol} @ {self.price}"
+
+
+class StockTrade(models.Model):
+    """Fills produced by the exchange engine; a null order is the company selling unissued shares."""
+    
+    stock = models.ForeignKey(StockMarket, on_delete=models.CASCADE, related_name='trades')
+    buy_order = models.ForeignKey(StockOrder, on_delete=models.SET_NULL, null=True, related_name='+')
+    sell_order = models.ForeignKey(StockOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    price = models.DecimalField(max_digits=15, decimal_places=2)
+    shares = models.IntegerField()
+    date = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['stock', 'date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.shares} {self.stock.symbol} @ {self.price}"
+
+
 class Achievement(models.Model):
     """Achievements that players can earn."""
     
@@ -511,5 +749,81 @@ class EarnedAchievement(models.Model):
     # Earned date
     earned_date = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['earned_date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.profile.user.username_display} - {self.achievement.name}"
+
+
+class PlayerName(models.Model):
+    """A player's display name as the player search (game.search) indexes it."""
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    name = models.CharField(max_length=30, db_index=True, help_text="Case-folded, for prefix matches")
+    display = models.CharField(max_length=30)
+    
+    def __str__(self):
+        return self.display
+
+
+class PlayerNameTrigram(models.Model):
+    """One trigram of a player's display name, for fuzzy matches."""
+    
+    player = models.ForeignKey(PlayerName, on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3)
+    
+    class Meta:
+        constraints = [
+            # Also the index fuzzy matches read: trigram to players, without touching the table.
+            models.UniqueConstraint(fields=['trigram', 'player'], name='unique_player_trigram'),
+        ]
+    
+    def __str__(self):
+        return f"{self.trigram!r} of {self.player_id}"
+
+
+class ExportWatermark(models.Model):
+    """Highest primary key exported so far by an incremental analytics export."""
+    
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    rows_exported = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} (up to #{self.last_id})"
+
+
+class EconomySnapshot(models.Model):
+    """Periodic totals of the money in the game, taken by the ``snapshot_economy`` command."""
+    
+    taken_at = models.DateTimeField(auto_now_add=True)
+    players = models.IntegerField()
+    
+    # Money supply by where it is held
+    wallet_money = models.DecimalField(max_digits=20, decimal_places=2)
+    bank_money = models.DecimalField(max_digits=20, decimal_places=2)
+    property_money = models.DecimalField(max_digits=20, decimal_places=2)
+    gang_money = models.DecimalField(max_digits=20, decimal_places=2)
+    stock_value = models.DecimalField(max_digits=20, decimal_places=2)
+    
+    # Distribution of players' cash (wallet + bank), from a quantile sketch
+    cash_p50 = models.DecimalField(max_digits=15, decimal_places=2)
+    cash_p90 = models.DecimalField(max_digits=15, decimal_places=2)
+    cash_p99 = models.DecimalField(max_digits=15, decimal_places=2)
+    cash_max = models.DecimalField(max_digits=15, decimal_places=2)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['taken_at']),
+        ]
+    
+    @property
+    def money_supply(self):
+        return self.wallet_money + self.bank_money + self.property_money + self.gang_money + self.stock_value
+    
     def __str__(self):
-        return f"{self.profile.user.username_display} - {self.achievement.name}"
\ No newline at end of file
+        return f"Economy at {self.taken_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,130 @@
+"""
+Set-based bulk operations on players for operators.
+
+Each operation works on a Profile queryset, walks it in primary-key chunks and
+applies one UPDATE (or bulk_create) per chunk, so no model instances are loaded
+or saved one by one. Every operation supports a dry run that only counts the
+rows it would touch, and records a single admin log entry when it runs.
+
+The updates bypass ``profiles.apply``, so ``profile_updated`` is not sent: the
+cached player contexts are dropped directly, no operation changes a base stat
+the combat sheets depend on, and open live streams show the new values with the
+player's next change.
+"""
+from decimal import Decimal
+
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Profile
+from .models import CommittedCrime, CompletedMission, Inventory, InventoryItem
+from .player import invalidate_players
+from .profiles import changes
+
+CHUNK_SIZE = 5000
+
+
+def chunks(queryset, chunk_size=CHUNK_SIZE, fields=('pk',)):
+    """Yield lists of ``fields`` tuples from ``queryset`` in primary-key order, one chunk at a time."""
+    rows = queryset.order_by('pk').values_list(*fields)
+    last = None
+    while True:
+        chunk = list((rows if last is None else rows.filter(pk__gt=last))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1][0]
+
+
+def _update_profiles(profiles, chunk_size, **values):
+    updated = 0
+    for chunk in chunks(profiles, chunk_size, fields=('pk', 'user_id')):
+        with transaction.atomic():
+            updated += Profile.objects.filter(pk__in=[pk for pk, user_id in chunk]).update(**changes(values=values))
+        invalidate_players(user_id for pk, user_id in chunk)
+    return updated
+
+
+def release_from_jail(profiles, dry_run=False, chunk_size=CHUNK_SIZE):
+    profiles = profiles.filter(is_in_jail=True)
+    if dry_run:
+        return profiles.count()
+    return _update_profiles(profiles, chunk_size, is_in_jail=False, jail_release_time=None)
+
+
+def release_from_hospital(profiles, dry_run=False, chunk_size=CHUNK_SIZE):
+    profiles = profiles.filter(is_in_hospital=True)
+    if dry_run:
+        return profiles.count()
+    return _update_profiles(profiles, chunk_size, is_in_hospital=False, hospital_release_time=None)
+
+
+def refund(profiles, amount, dry_run=False, chunk_size=CHUNK_SIZE):
+    """Credit ``amount`` of money, a positive number of whole cents, to every profile."""
+    amount = Decimal(amount)
+    if not amount.is_finite() or amount <= 0 or amount != amount.quantize(Decimal('0.01')):
+        raise ValueError(f'A refund must be a positive amount of whole cents, not {amount}.')
+    if dry_run:
+        return profiles.count()
+    return _update_profiles(profiles, chunk_size, money=F('money') + amount)
+
+
+def reset_cooldowns(profiles, dry_run=False, chunk_size=CHUNK_SIZE):
+    """End every running crime and mission cooldown; returns the number of cooldowns reset."""
+    now = timezone.now()
+    histories = (CommittedCrime, CompletedMission)
+    if dry_run:
+        return sum(
+            history.objects.filter(profile__in=profiles, next_available_time__gt=now).count()
+            for history in histories
+        )
+    reset = 0
+    for chunk in chunks(profiles, chunk_size):
+        profile_ids = [pk for pk, in chunk]
+        with transaction.atomic():
+            for history in histories:
+                reset += history.objects.filter(profile_id__in=profile_ids, next_available_time__gt=now).update(
+                    next_available_time=now,
+                )
+    return reset
+
+
+def grant_item(profiles, item, quantity=1, dry_run=False, chunk_size=CHUNK_SIZE):
+    """Add ``quantity`` of ``item`` to every profile's inventory; returns the number of profiles."""
+    if dry_run:
+        return profiles.count()
+    granted = 0
+    for chunk in chunks(profiles, chunk_size, fields=('pk', 'user_id')):
+        profile_ids = [pk for pk, user_id in chunk]
+        with transaction.atomic():
+            Inventory.objects.bulk_create(
+                [Inventory(profile_id=profile_id) for profile_id in profile_ids], ignore_conflicts=True,
+            )
+            inventories = dict(
+                Inventory.objects.filter(profile_id__in=profile_ids).values_list('pk', 'profile_id')
+            )
+            holders = InventoryItem.objects.filter(inventory_id__in=inventories, item=item)
+            holding = set(holders.values_list('inventory_id', flat=True))
+            holders.update(quantity=F('quantity') + quantity)
+            InventoryItem.objects.bulk_create([
+                InventoryItem(inventory_id=inventory_id, item=item, quantity=quantity)
+                for inventory_id in inventories
+                if inventory_id not in holding
+            ])
+        invalidate_players(user_id for pk, user_id in chunk)
+        granted += len(inventories)
+    return granted
+
+
+def log_operation(user, message):
+    """Record a bulk operation as one admin log entry against the Profile model."""
+    return LogEntry.objects.create(
+        user=user,
+        content_type=ContentType.objects.get_for_model(Profile),
+        object_repr='Bulk operation',
+        action_flag=CHANGE,
+        change_message=message,
+    )
@@ -0,0 +1,168 @@
+"""
+Request-scoped bundle of the logged-in player's rows.
+
+The user, profile, inventory id and gang membership are loaded together in one
+query and cached briefly in the process under a per-player version stamp, which
+the signals in ``game/signals.py`` bump whenever one of those rows changes. The
+stamps live in the ``shared`` cache, so a change made through any process
+reloads the context in all of them. Like the generations of ``game/caching.py``,
+a process re-reads a stamp from there at most every ``CACHE_GENERATION_TTL``
+seconds, so most requests touch only the process's own cache; its own changes
+show up at once and another process's within that time.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, load_backend
+from django.core.cache import cache, caches
+from django.db.models import OuterRef, Subquery
+from django.utils.crypto import constant_time_compare
+
+from accounts.models import Profile
+from . import caching
+from .models import GangMember, Inventory
+from .travel import resolve_arrival
+
+
+class PlayerContext:
+    """The logged-in player's user, profile, inventory id and gang membership."""
+
+    def __init__(self, profile, gang_id=None, gang_role=None):
+        self.profile = profile
+        self.user = profile.user
+        try:
+            self.inventory_id = profile.inventory.pk
+        except Inventory.DoesNotExist:
+            self.inventory_id = None
+        self.gang_id = gang_id
+        self.gang_role = gang_role
+
+
+def _version_key(user_id):
+    return caching.shared_key(f'player-version:{user_id}')
+
+
+def player_version(user_id):
+    """Current version stamp of the player's cached context."""
+    key = _version_key(user_id)
+    local = cache.get(key)
+    if local is None:
+        local = caches['shared'].get_or_set(key, time.time_ns, None)
+        cache.set(key, local, settings.CACHE_GENERATION_TTL)
+    return local
+
+
+def invalidate_player(user_id):
+    """Bump the version stamp so the next request, in any process, reloads the player's context."""
+    invalidate_players([user_id])
+
+
+def invalidate_players(user_ids):
+    """Bump the version stamps of many players at once."""
+    shared = caches['shared']
+    # A player gets a stamp when their context is first read; players without one
+    # have nothing cached, so they cost no write to the shared cache.
+    keys = [key for key in map(_version_key, user_ids) if shared.has_key(key)]
+    if keys:
+        stamps = dict.fromkeys(keys, time.time_ns())
+        shared.set_many(stamps, None)
+        cache.set_many(stamps, settings.CACHE_GENERATION_TTL)
+
+
+def load_player(user_id):
+    """Load the player's context with a single query, or None if there is no profile."""
+    membership = GangMember.objects.filter(profile=OuterRef('pk')).order_by('join_date')
+    profile = (
+        Profile.objects.select_related('user', 'inventory', 'current_location')
+        .annotate(
+            gang_id=Subquery(membership.values('gang_id')[:1]),
+            gang_role=Subquery(membership.values('role')[:1]),
+        )
+        .filter(user_id=user_id)
+        .first()
+    )
+    if profile is None:
+        return None
+    return PlayerContext(profile, profile.gang_id, profile.gang_role)
+
+
+def _session_user_id(request):
+    try:
+        return request.session[SESSION_KEY]
+    except (AttributeError, KeyError):
+        return None
+
+
+def _session_is_valid(request, user):
+    """
+    Verify the session for the cached ``user`` the way ``django.contrib.auth.get_user``
+    does, without querying the user again.
+
+    A session hashed with one of ``SECRET_KEY_FALLBACKS`` is upgraded to the current
+    key; any other mismatch flushes the session, logging the player out.
+    """
+    backend_path = request.session.get(BACKEND_SESSION_KEY)
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return False
+    backend = load_backend(backend_path)
+    if hasattr(backend, 'user_can_authenticate') and not backend.user_can_authenticate(user):
+        return False
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    session_auth_hash = user.get_session_auth_hash()
+    if session_hash and constant_time_compare(session_hash, session_auth_hash):
+        return True
+    if session_hash and any(
+        constant_time_compare(session_hash, fallback_auth_hash)
+        for fallback_auth_hash in user.get_session_auth_fallback_hash()
+    ):
+        request.session.cycle_key()
+        request.session[HASH_SESSION_KEY] = session_auth_hash
+        return True
+    request.session.flush()
+    return False
+
+
+def get_player(request):
+    """Return the request's PlayerContext, loading it from the cache or database once."""
+    if hasattr(request, '_cached_player'):
+        return request._cached_player
+
+    player = None
+    if hasattr(request, '_cached_user'):
+        # Authentication already ran; only the player rows are needed.
+        user_id = request._cached_user.pk if request._cached_user.is_authenticated else None
+    else:
+        user_id = _session_user_id(request)
+
+    if user_id is not None:
+        key = f'player:{user_id}:{player_version(user_id)}'
+        player = cache.get(key)
+        if player is None:
+            player = load_player(user_id)
+            if player is not None:
+                cache.set(key, player, settings.PLAYER_CONTEXT_TTL)
+
+    if player is not None and not hasattr(request, '_cached_user'):
+        if _session_is_valid(request, player.user):
+            # Hand the user to the auth middleware so it skips its own query.
+            request._cached_user = player.user
+        else:
+            player = None
+    elif player is not None and request._cached_user.pk != player.user.pk:
+        player = None
+
+    if (
+        player is not None
+        and player.profile.travel_destination_id is not None
+        and resolve_arrival(player.profile)
+    ):
+        # The trip finished since the context was cached.
+        invalidate_player(player.user.pk)
+
+    request._cached_player = player
+    return player
+
+
+async def aget_player(request):
+    return await sync_to_async(get_player)(request)
@@ -0,0 +1,204 @@
+"""
+Stock portfolios.
+
+A player's holding of a stock is one StockPosition row with the total shares
+and their cost basis. The lots behind it (StockOwnership rows, one per purchase
+price) are only read when shares are sold, oldest first. Positions and lots are
+always changed together, so a position's cost basis is the sum of its lots.
+Shares offered in an open sell order are reserved: their lots move to the order
+and out of the position, and go back to it unchanged if the order is cancelled.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Sum, Value, When
+
+from .models import StockOwnership, StockPosition
+
+# Rows per bulk statement.
+WRITE_CHUNK = 500
+
+MONEY = DecimalField(max_digits=20, decimal_places=2)
+CENT = Decimal('0.01')
+
+
+def _chunks(items, size=WRITE_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def add_lots(lots):
+    """
+    Add ``{(profile_id, stock_id, price): shares}`` to the players' holdings in bulk.
+
+    Creates one lot per entry and the missing positions, then bumps every
+    position with a single CASE update per chunk. Call inside a transaction.
+    """
+    lots = {key: shares for key, shares in lots.items() if shares}
+    if not lots:
+        return
+    StockOwnership.objects.bulk_create(
+        [
+            StockOwnership(profile_id=profile_id, stock_id=stock_id, shares=shares, purchase_price=price)
+            for (profile_id, stock_id, price), shares in lots.items()
+        ],
+        batch_size=WRITE_CHUNK,
+    )
+
+    added = defaultdict(lambda: [0, Decimal('0')])
+    for (profile_id, stock_id, price), shares in lots.items():
+        added[profile_id, stock_id][0] += shares
+        added[profile_id, stock_id][1] += price * shares
+    StockPosition.objects.bulk_create(
+        [StockPosition(profile_id=profile_id, stock_id=stock_id) for profile_id, stock_id in added],
+        batch_size=WRITE_CHUNK,
+        ignore_conflicts=True,
+    )
+    positions = StockPosition.objects.filter(
+        profile_id__in={profile_id for profile_id, _ in added},
+        stock_id__in={stock_id for _, stock_id in added},
+    ).values_list('pk', 'profile_id', 'stock_id')
+    changes = [
+        (pk, added[profile_id, stock_id]) for pk, profile_id, stock_id in positions if (profile_id, stock_id) in added
+    ]
+    for chunk in _chunks(changes):
+        StockPosition.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+            shares=F('shares') + Case(
+                *(When(pk=pk, then=Value(shares)) for pk, (shares, _) in chunk), output_field=IntegerField(),
+            ),
+            cost_basis=F('cost_basis') + Case(
+                *(When(pk=pk, then=Value(cost)) for pk, (_, cost) in chunk), output_field=MONEY,
+            ),
+        )
+
+
+def take_shares(profile, stock, quantity, order=None):
+    """
+    Remove ``quantity`` shares of ``stock`` from the player's holdings, oldest lots first.
+
+    With ``order``, a sell order, the lots are reserved for it instead of
+    deleted, keeping their prices and dates for ``release_lots``; a lot that is
+    only partly needed is split. Returns the cost basis of the shares removed,
+    or None if the player doesn't own that many.
+    """
+    with transaction.atomic():
+        taken = StockPosition.objects.filter(profile=profile, stock=stock, shares__gte=quantity).update(
+            shares=F('shares') - quantity,
+        )
+        if not taken:
+            return None
+        lots = (
+            StockOwnership.objects.select_for_update()
+            .filter(profile=profile, stock=stock, order__isnull=True)
+            .order_by('purchase_date', 'pk')
+            .values_list('pk', 'shares', 'purchase_price', 'purchase_date')
+        )
+        cost = Decimal('0')
+        remaining = quantity
+        emptied = []
+        for pk, shares, price, purchase_date in lots:
+            if remaining <= 0:
+                break
+            used = min(shares, remaining)
+            if used == shares:
+                emptied.append(pk)
+            else:
+                StockOwnership.objects.filter(pk=pk).update(shares=F('shares') - used)
+                if order is not None:
+                    split = StockOwnership.objects.create(
+                        profile=profile, stock=stock, shares=used, purchase_price=price, order=order,
+                    )
+                    # purchase_date is set on creation; the reserved part keeps the lot's.
+                    StockOwnership.objects.filter(pk=split.pk).update(purchase_date=purchase_date)
+            cost += price * used
+            remaining -= used
+        if order is not None:
+            StockOwnership.objects.filter(pk__in=emptied).update(order=order)
+        else:
+            StockOwnership.objects.filter(pk__in=emptied).delete()
+        StockPosition.objects.filter(profile=profile, stock=stock).update(cost_basis=F('cost_basis') - cost)
+    return cost
+
+
+def settle_sold_lots(order_ids):
+    """Delete the lots reserved by sell orders that have sold all their shares. Call inside a transaction."""
+    for chunk in _chunks(order_ids):
+        StockOwnership.objects.filter(order_id__in=chunk).delete()
+
+
+def release_lots(orders):
+    """
+    Return the unsold shares of cancelled sell orders to their sellers' positions.
+
+    ``orders`` maps order ids to the shares each one sold. Those came out of the
+    order's oldest lots; the remaining lots go back to the position as they
+    were, with their purchase prices and dates. Call inside a transaction.
+    """
+    if not orders:
+        return
+    lots = StockOwnership.objects.filter(order_id__in=list(orders)).order_by('order_id', 'purchase_date', 'pk')
+    sold = dict(orders)
+    emptied, released = [], []
+    returned = defaultdict(lambda: [0, Decimal('0')])
+    for pk, order_id, profile_id, stock_id, shares, price in lots.values_list(
+        'pk', 'order_id', 'profile_id', 'stock_id', 'shares', 'purchase_price',
+    ):
+        used = min(shares, sold[order_id])
+        sold[order_id] -= used
+        if used == shares:
+            emptied.append(pk)
+            continue
+        if used:
+            StockOwnership.objects.filter(pk=pk).update(shares=F('shares') - used)
+        released.append(pk)
+        returned[profile_id, stock_id][0] += shares - used
+        returned[profile_id, stock_id][1] += price * (shares - used)
+    for chunk in _chunks(emptied):
+        StockOwnership.objects.filter(pk__in=chunk).delete()
+    for chunk in _chunks(released):
+        StockOwnership.objects.filter(pk__in=chunk).update(order=None)
+    for (profile_id, stock_id), (shares, cost) in returned.items():
+        StockPosition.objects.filter(profile_id=profile_id, stock_id=stock_id).update(
+            shares=F('shares') + shares, cost_basis=F('cost_basis') + cost,
+        )
+
+
+def positions(profile):
+    """The player's open positions with their stock, for ``market_value`` and ``unrealized``."""
+    return StockPosition.objects.filter(profile=profile, shares__gt=0).select_related('stock').order_by('stock__symbol')
+
+
+def valuation(profile):
+    """``{'value', 'cost', 'unrealized'}`` of the player's whole portfolio, from one aggregate query."""
+    totals = StockPosition.objects.filter(profile=profile).aggregate(
+        value=Sum(F('shares') * F('stock__current_price'), output_field=MONEY),
+        cost=Sum('cost_basis'),
+    )
+    value = (totals['value'] or Decimal('0')).quantize(CENT)
+    cost = (totals['cost'] or Decimal('0')).quantize(CENT)
+    return {'value': value, 'cost': cost, 'unrealized': value - cost}
+
+
+def rebuild_positions():
+    """Recompute every position from its lots, e.g. after importing holdings."""
+    totals = (
+        StockOwnership.objects.filter(order__isnull=True).values('profile_id', 'stock_id')
+        .annotate(total_shares=Sum('shares'), total_cost=Sum(F('shares') * F('purchase_price'), output_field=MONEY))
+        .order_by()
+    )
+    with transaction.atomic():
+        StockPosition.objects.all().delete()
+        StockPosition.objects.bulk_create(
+            (
+                StockPosition(
+                    profile_id=row['profile_id'],
+                    stock_id=row['stock_id'],
+                    shares=row['total_shares'],
+                    cost_basis=row['total_cost'],
+                )
+                for row in totals.iterator(chunk_size=5000)
+            ),
+            batch_size=WRITE_CHUNK,
+        )
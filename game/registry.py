@@ -0,0 +1,186 @@
+"""
+In-memory registry of the game's design data.
+
+Items, crimes, missions, gyms, locations and their routes, properties and
+achievements are authored by designers and read on nearly every page. The
+registry holds all of them as immutable records (named tuples of the models'
+columns) together with the indexes the pages need: crimes and gyms sorted by
+``required_level`` so the ones a player qualifies for are a bisected prefix,
+missions grouped by location and sorted the same way, routes by origin, and
+lookups by id.
+
+A snapshot is loaded on first use and only ever replaced, never modified. Saving
+or deleting a design row marks this process's snapshot stale once the
+transaction commits; other processes notice the change through the models'
+cache generations (``game/caching.py``), which they compare at most every
+``CACHE_GENERATION_TTL`` seconds.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from operator import attrgetter
+from types import MappingProxyType
+
+from django.conf import settings
+
+from accounts.models import HOME_CITY
+from . import caching
+from .models import Achievement, Crime, Gym, Item, Location, Mission, Property, Route
+
+# The design tables; writing any of them reloads the registry.
+MODELS = (Item, Crime, Mission, Gym, Location, Route, Property, Achievement)
+
+
+def _display(attname, labels):
+    def get_display(self):
+        value = getattr(self, attname)
+        return labels.get(value, value)
+    return get_display
+
+
+def _record_type(model, *extra):
+    """
+    A named tuple of the model's columns and ``extra`` fields, which templates can
+    use like an instance: it has ``pk``, the model's ``__str__`` and its
+    ``get_FOO_display()`` methods.
+    """
+    columns = [field.attname for field in model._meta.concrete_fields]
+    base = namedtuple(f'{model.__name__}Record', [*columns, *extra])
+    namespace = {
+        '__slots__': (),
+        'pk': property(attrgetter(model._meta.pk.attname)),
+        '__str__': model.__str__,
+    }
+    for field in model._meta.concrete_fields:
+        if field.choices:
+            namespace[f'get_{field.name}_display'] = _display(field.attname, dict(field.flatchoices))
+    return type(base.__name__, (base,), namespace)
+
+
+ItemRecord = _record_type(Item)
+CrimeRecord = _record_type(Crime)
+# The mission's Location record, as ``location``.
+MissionRecord = _record_type(Mission, 'item_rewards', 'location')
+GymRecord = _record_type(Gym)
+LocationRecord = _record_type(Location)
+PropertyRecord = _record_type(Property)
+AchievementRecord = _record_type(Achievement)
+
+
+def _load(record_type, model, **extra):
+    """Records of every row; ``extra`` maps the other fields to functions of the row's id, or None."""
+    columns = [name for name in record_type._fields if name not in extra]
+    return [
+        record_type(
+            **dict(zip(columns, row)),
+            **{name: values and values(row[0]) for name, values in extra.items()},
+        )
+        for row in model.objects.order_by('pk').values_list(*columns)
+    ]
+
+
+class LevelIndex:
+    """Records sorted by ``required_level`` (then id)."""
+
+    __slots__ = ('records', 'levels')
+
+    def __init__(self, records):
+        self.records = tuple(sorted(records, key=lambda record: (record.required_level, record.id)))
+        self.levels = tuple(record.required_level for record in self.records)
+
+    def up_to(self, level):
+        """The records requiring at most ``level``, by bisection."""
+        return self.records[:bisect_right(self.levels, level)]
+
+
+EMPTY_INDEX = LevelIndex(())
+
+
+class Registry:
+    """One snapshot of the design tables and their indexes."""
+
+    def __init__(self, generations):
+        # The cache generations of MODELS this snapshot was loaded under.
+        self.generations = generations
+
+        items = _load(ItemRecord, Item)
+        self.items = MappingProxyType({item.id: item for item in items})
+        self.available_items = tuple(item for item in items if item.is_available)
+
+        locations = _load(LocationRecord, Location)
+        self.locations = MappingProxyType({location.id: location for location in locations})
+        self.home_city_id = next((location.id for location in locations if location.name == HOME_CITY), None)
+
+        rewards = defaultdict(list)
+        for mission_id, item_id in Mission.item_rewards.through.objects.values_list('mission_id', 'item_id'):
+            rewards[mission_id].append(self.items[item_id])
+        missions = _load(MissionRecord, Mission, item_rewards=lambda pk: tuple(rewards.get(pk, ())), location=None)
+        missions = [mission._replace(location=self.locations.get(mission.location_id)) for mission in missions]
+        by_location = defaultdict(list)
+        for mission in missions:
+            by_location[mission.location_id].append(mission)
+        self.missions = MappingProxyType({mission.id: mission for mission in missions})
+        self.missions_by_location = MappingProxyType({
+            location_id: LevelIndex(entries) for location_id, entries in by_location.items()
+        })
+
+        self.crimes = LevelIndex(_load(CrimeRecord, Crime))
+        self.gyms = LevelIndex(_load(GymRecord, Gym))
+
+        routes = defaultdict(list)
+        for origin_id, destination_id, cost, travel_time in Route.objects.order_by('pk').values_list(
+            'origin_id', 'destination_id', 'cost', 'travel_time',
+        ):
+            routes[origin_id].append((self.locations[destination_id], cost, travel_time))
+        # From the Home City a trip costs the destination's own cost and time.
+        routes[None] = [(location, location.travel_cost, location.travel_time) for location in locations]
+        self.routes = MappingProxyType({origin_id: tuple(entries) for origin_id, entries in routes.items()})
+
+        self.properties = tuple(_load(PropertyRecord, Property))
+        self.achievements = tuple(_load(AchievementRecord, Achievement))
+
+    def missions_at(self, location_id):
+        """Missions at ``location_id`` (None for the Home City) as a LevelIndex."""
+        if location_id is None:
+            location_id = self.home_city_id
+        return self.missions_by_location.get(location_id, EMPTY_INDEX)
+
+    def routes_from(self, origin_id):
+        return self.routes.get(origin_id, ())
+
+
+_registry = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get():
+    """The current registry, loading it first if it is missing or stale."""
+    global _checked_at
+    registry = _registry
+    if registry is not None and time.monotonic() - _checked_at < settings.CACHE_GENERATION_TTL:
+        return registry
+    generations = caching.generations(*MODELS)
+    if registry is not None and registry.generations == generations:
+        _checked_at = time.monotonic()
+        return registry
+    return reload(generations)
+
+
+def reload(generations=None):
+    """Load a new snapshot and make it current."""
+    global _registry, _checked_at
+    with _lock:
+        # Generations are read before the tables, so a write during the load triggers another one.
+        generations = generations or caching.generations(*MODELS)
+        if _registry is None or _registry.generations != generations:
+            _registry = Registry(generations)
+        _checked_at = time.monotonic()
+        return _registry
+
+
+def invalidate():
+    """Have the next ``get()`` compare generations, after a design row was written in this process."""
+    global _checked_at
+    _checked_at = 0.0
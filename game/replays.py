@@ -0,0 +1,117 @@
+"""
+Round-by-round battle replays, packed into one blob per battle.
+
+A replay is a 4-byte header (format version, flags, round count) followed by one
+fixed-width 9-byte record per round: the damage each side dealt, both sides'
+life after the round and a bit set of hits and critical hits. Logs longer than
+``COMPRESS_FROM`` rounds are zlib-compressed when that makes them smaller, so a
+typical fight takes a few dozen bytes and a 30-round one stays under ~300.
+
+``Replay`` decodes lazily: it reads the header and unpacks a round only when it
+is accessed. An uncompressed log is read in place, through a memoryview of the
+stored bytes; a compressed one is inflated into a buffer of its own, once, on
+construction. Battles are saved with their replays by ``combat.record_battle()``.
+"""
+import struct
+import zlib
+from typing import NamedTuple
+
+HEADER = struct.Struct('<BBH')
+ROUND = struct.Struct('<HHHHB')
+VERSION = 1
+
+# Header flags
+COMPRESSED = 1
+
+# Round flags
+ATTACKER_HIT = 1
+ATTACKER_CRITICAL = 2
+DEFENDER_HIT = 4
+DEFENDER_CRITICAL = 8
+
+# Shorter logs are stored as they are; zlib's own overhead would eat the savings.
+COMPRESS_FROM = 8
+
+MAX_VALUE = 0xFFFF
+
+
+class Round(NamedTuple):
+    """One exchange of blows."""
+
+    attacker_damage: int
+    defender_damage: int
+    attacker_life: int
+    defender_life: int
+    flags: int = 0
+
+
+def _clamp(value):
+    return min(max(value, 0), MAX_VALUE)
+
+
+def encode(rounds, compress=True):
+    """
+    Pack a sequence of rounds (``Round`` or plain tuples) into a replay blob.
+
+    Damage and life are stored clamped to 0..65535.
+    """
+    count = len(rounds)
+    if count > MAX_VALUE:
+        raise ValueError("A replay holds at most 65535 rounds.")
+    blob = bytearray(HEADER.size + ROUND.size * count)
+    offset = HEADER.size
+    for attacker_damage, defender_damage, attacker_life, defender_life, flags in rounds:
+        ROUND.pack_into(
+            blob, offset,
+            _clamp(attacker_damage), _clamp(defender_damage), _clamp(attacker_life), _clamp(defender_life),
+            flags,
+        )
+        offset += ROUND.size
+    if compress and count >= COMPRESS_FROM:
+        packed = zlib.compress(memoryview(blob)[HEADER.size:], 1)
+        if len(packed) < len(blob) - HEADER.size:
+            return HEADER.pack(VERSION, COMPRESSED, count) + packed
+    HEADER.pack_into(blob, 0, VERSION, 0, count)
+    return bytes(blob)
+
+
+class Replay:
+    """The rounds of a replay blob, unpacked on access."""
+
+    __slots__ = ('_records', '_count')
+
+    def __init__(self, blob):
+        if not blob:
+            self._records, self._count = memoryview(b''), 0
+            return
+        view = memoryview(blob)
+        version, flags, count = HEADER.unpack_from(view)
+        if version != VERSION:
+            raise ValueError(f"Unknown replay format {version}.")
+        records = view[HEADER.size:]
+        if flags & COMPRESSED:
+            records = memoryview(zlib.decompress(records))
+        if len(records) != count * ROUND.size:
+            raise ValueError("Truncated replay.")
+        self._records, self._count = records, count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("Round out of range.")
+        return Round._make(ROUND.unpack_from(self._records, index * ROUND.size))
+
+    def __iter__(self):
+        return map(Round._make, ROUND.iter_unpack(self._records))
+
+    def totals(self):
+        """``(attacker damage, defender damage)`` summed over the rounds."""
+        attacker = defender = 0
+        for attacker_damage, defender_damage, *_ in ROUND.iter_unpack(self._records):
+            attacker += attacker_damage
+            defender += defender_damage
+        return attacker, defender
@@ -0,0 +1,196 @@
+"""
+Player search on display names.
+
+Every user's display name is indexed twice. ``PlayerName`` holds it case-folded
+under an index, so the names starting with a query are one range of that index,
+read in name order. ``PlayerNameTrigram`` holds the name's trigrams (padded with
+two spaces in front and one behind, as in PostgreSQL's pg_trgm), so names that
+merely resemble the query are the players sharing the most trigrams with it,
+found through the ``(trigram, player)`` index without reading any name. The
+candidates are then ranked by trigram similarity: shared trigrams over the
+distinct trigrams of both.
+
+Results come exact match first, then prefix matches, then fuzzy ones, each by
+similarity. Neither lookup scans the users table; with a million players a
+search takes a few milliseconds, a little more for long queries whose fuzzy
+matches share common trigrams.
+
+Signals keep the index in step with ``User`` (``game/signals.py``); code that
+writes display names without them (``bulk_create()``, ``QuerySet.update()``)
+calls ``index_users()``, and ``manage.py rebuild_player_search`` rebuilds it.
+"""
+import math
+from typing import NamedTuple
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from accounts.models import User
+from .models import PlayerName, PlayerNameTrigram
+
+LIMIT = 20
+
+# The field of User the search indexes.
+NAME_FIELD = 'username_display'
+
+# Lowest similarity of a fuzzy match.
+SIMILARITY = 0.3
+
+# Fuzzy candidates ranked per search, the players sharing the most trigrams with the query.
+CANDIDATES = 200
+
+# Queries shorter than this, a trigram, are matched by prefix only.
+FUZZY_FROM = 3
+
+BATCH_SIZE = 2000
+
+_PREFIX_END = '\U0010ffff'
+
+
+class Match(NamedTuple):
+    """A player found by a search."""
+
+    user_id: int
+    name: str
+    similarity: float
+    prefix: bool
+
+
+def normalize(name):
+    """The form names are compared in: case-folded, with runs of spaces collapsed."""
+    return ' '.join(name.casefold().split())
+
+
+def trigrams(name):
+    """The trigrams of a normalized name."""
+    padded = f'  {name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    """Share of trigrams two normalized names have in common."""
+    a, b = trigrams(a), trigrams(b)
+    return len(a & b) / len(a | b)
+
+
+def index_users(users):
+    """Index (or re-index) the display names of ``users``."""
+    users = list(users)
+    names = [
+        PlayerName(user_id=user.pk, name=normalize(user.username_display), display=user.username_display)
+        for user in users
+    ]
+    with transaction.atomic():
+        PlayerName.objects.filter(pk__in=[user.pk for user in users]).delete()
+        PlayerName.objects.bulk_create(names, batch_size=BATCH_SIZE)
+        PlayerNameTrigram.objects.bulk_create(
+            (
+                PlayerNameTrigram(player_id=name.user_id, trigram=trigram)
+                for name in names
+                for trigram in trigrams(name.name)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def index_user(user):
+    """Index ``user``'s display name unless it is indexed as it is already."""
+    indexed = PlayerName.objects.filter(pk=user.pk).values_list('display', flat=True).first()
+    if indexed != user.username_display:
+        index_users([user])
+
+
+def rebuild():
+    """Re-index every user; returns the number of names indexed."""
+    count = 0
+    with transaction.atomic():
+        # Plain DELETEs: nothing depends on the index rows, so there is nothing to collect.
+        with connection.cursor() as cursor:
+            for model in (PlayerNameTrigram, PlayerName):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        users = User.objects.only('username_display').order_by('pk')
+        last = 0
+        while True:
+            batch = list(users.filter(pk__gt=last)[:BATCH_SIZE])
+            if not batch:
+                return count
+            index_users(batch)
+            count += len(batch)
+            last = batch[-1].pk
+
+
+def _starting_with(query):
+    """PlayerName rows whose names start with the normalized ``query``, one range of the name index."""
+    return PlayerName.objects.filter(name__gte=query, name__lt=query + _PREFIX_END)
+
+
+def containing(text):
+    """
+    The PlayerName rows whose names contain ``text``, as a queryset.
+
+    A name containing the text has all of the text's trigrams, so the trigram
+    index narrows the candidates down before their names are compared. Texts
+    shorter than ``FUZZY_FROM`` have no trigram to narrow by and would be
+    compared with every name, so they only match the start of a name.
+    """
+    text = normalize(text)
+    if len(text) < FUZZY_FROM:
+        return _starting_with(text)
+    inner = {text[i:i + 3] for i in range(len(text) - 2)}
+    candidates = (
+        PlayerNameTrigram.objects.filter(trigram__in=inner)
+        .values('player_id')
+        .annotate(shared=Count('*'))
+        .filter(shared=len(inner))
+        .values('player_id')
+    )
+    return PlayerName.objects.filter(pk__in=candidates, name__contains=text)
+
+
+def _prefix_matches(query, limit):
+    return _starting_with(query).order_by('name').values_list('user_id', 'name', 'display')[:limit]
+
+
+def _fuzzy_matches(query):
+    query_trigrams = trigrams(query)
+    # Every name's first trigram is two spaces and its first letter, far too common to
+    # narrow anything down. Leaving it out can cost a match one shared trigram.
+    probes = [trigram for trigram in query_trigrams if not trigram.startswith('  ')]
+    # similarity >= SIMILARITY needs at least that share of the query's trigrams in common.
+    shared = max(math.ceil(SIMILARITY * len(query_trigrams)) - 1, 1)
+    candidates = (
+        PlayerNameTrigram.objects.filter(trigram__in=probes)
+        .values('player_id')
+        .annotate(shared=Count('*'))
+        .filter(shared__gte=shared)
+        .order_by('-shared')
+        .values_list('player_id', flat=True)[:CANDIDATES]
+    )
+    return PlayerName.objects.filter(pk__in=list(candidates)).values_list('user_id', 'name', 'display')
+
+
+def search(query, limit=LIMIT):
+    """The players whose display names best match ``query``, as ``Match``es."""
+    query = normalize(query)
+    if not query:
+        return []
+    matches = {
+        user_id: Match(user_id, display, similarity(query, name), True)
+        for user_id, name, display in _prefix_matches(query, limit)
+    }
+    # Fuzzy matches rank below every prefix match, so a full page of those is the answer.
+    if len(query) >= FUZZY_FROM and len(matches) < limit:
+        for user_id, name, display in _fuzzy_matches(query):
+            if user_id not in matches:
+                score = similarity(query, name)
+                if score >= SIMILARITY:
+                    matches[user_id] = Match(user_id, display, score, False)
+    ranked = sorted(matches.values(), key=lambda match: (
+        match.similarity < 1, not match.prefix, -match.similarity, match.name.casefold(),
+    ))
+    return ranked[:limit]
+
+
+def user_ids(query, limit=LIMIT):
+    """Ids of the users ``search(query)`` finds."""
+    return [match.user_id for match in search(query, limit)]
@@ -0,0 +1,137 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import User, Profile
+from . import caching, registry, search
+from .combat import BASE_STATS, refresh_gear, sync_base_stats
+from .live import bus, profile_payload, profile_topic, stock_topic
+from .models import (
+    Armor, Gang, GangMember, Inventory, InventoryItem, Location, Mission, StockMarket, TemporaryItem, Weapon,
+)
+from .player import invalidate_player
+from .profiles import profile_updated
+from .travel import rebuild_routes
+
+
+def profile_changed(profile, fields=None):
+    """
+    Propagate a change to ``fields`` of ``profile`` (None for all of them): drop the
+    cached player context, update the combat sheet and push the stats to the
+    player's live streams.
+
+    Runs on every ``save()`` and ``profiles.apply()``; code that changes profiles
+    with ``QuerySet.update()`` calls it directly once ``profile`` holds the new values.
+    """
+    invalidate_player(profile.user_id)
+    if fields is None or not BASE_STATS.isdisjoint(fields):
+        sync_base_stats(profile)
+    topic = profile_topic(profile.pk)
+    if bus.has_subscribers(topic):
+        # Each stream diffs against what it last sent, so the raw values are published.
+        bus.publish(topic, 'stats', profile_payload(profile), frame=False)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(profile_updated, sender=Profile)
+def publish_profile_update(sender, instance, fields=None, update_fields=None, **kwargs):
+    profile_changed(instance, fields if fields is not None else update_fields)
+
+
+def stock_price_changed(symbol, price, previous):
+    """Push a price tick to every stream watching the stock."""
+    bus.publish(stock_topic(symbol), 'price', {
+        'symbol': symbol,
+        'price': price,
+        'previous': previous,
+    })
+
+
+@receiver(post_save, sender=StockMarket)
+def publish_stock_price(sender, instance, **kwargs):
+    stock_price_changed(instance.symbol, instance.current_price, instance.previous_price)
+
+
+# The models whose rows are cached: the design registry's and those of the views'
+# cached querysets. Only these get receivers, so every other model keeps Django's
+# fast path for bulk deletes.
+CACHED_MODELS = (*registry.MODELS, Gang)
+
+
+def invalidate_cached_model(sender, **kwargs):
+    caching.bump_on_commit(sender)
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_cached_model, sender=model)
+    post_delete.connect(invalidate_cached_model, sender=model)
+
+
+@receiver(m2m_changed, sender=Mission.item_rewards.through)
+def invalidate_mission_rewards(sender, **kwargs):
+    caching.bump_on_commit(Mission)
+
+
+@receiver(caching.bumped)
+def invalidate_registry(sender, models, **kwargs):
+    """Have this process reload the design registry once design data was written."""
+    if any(model in registry.MODELS for model in models):
+        registry.invalidate()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_player(sender, instance, **kwargs):
+    invalidate_player(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def index_player_name(sender, instance, update_fields=None, **kwargs):
+    # Logins save only last_login; the player's index rows are removed with the user.
+    if update_fields is None or 'username_display' in update_fields:
+        search.index_user(instance)
+
+
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_player(sender, instance, **kwargs):
+    invalidate_player(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Inventory)
+@receiver([post_save, post_delete], sender=GangMember)
+def invalidate_member_player(sender, instance, **kwargs):
+    user_id = Profile.objects.filter(pk=instance.profile_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_player(user_id)
+
+
+@receiver(post_save, sender=InventoryItem)
+def refresh_gear_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'equipped' not in update_fields:
+        return
+    profile_id = Inventory.objects.filter(pk=instance.inventory_id).values_list('profile_id', flat=True).first()
+    if profile_id is not None:
+        refresh_gear(profile_id)
+
+
+@receiver(post_delete, sender=InventoryItem)
+def refresh_gear_on_delete(sender, instance, **kwargs):
+    if instance.equipped:
+        profile_id = Inventory.objects.filter(pk=instance.inventory_id).values_list('profile_id', flat=True).first()
+        if profile_id is not None:
+            refresh_gear(profile_id)
+
+
+@receiver(post_save, sender=Weapon)
+@receiver(post_save, sender=Armor)
+@receiver(post_save, sender=TemporaryItem)
+def refresh_gear_of_holders(sender, instance, **kwargs):
+    """Rebuild the sheets of everyone with the edited item equipped."""
+    profile_ids = InventoryItem.objects.filter(item_id=instance.item_id, equipped=True).values_list(
+        'inventory__profile_id', flat=True,
+    )
+    for profile_id in set(profile_ids):
+        refresh_gear(profile_id)
+
+
+@receiver([post_save, post_delete], sender=Location)
+def rebuild_routes_on_change(sender, instance, **kwargs):
+    rebuild_routes()
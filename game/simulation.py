@@ -0,0 +1,299 @@
+"""
+Offline game-balance simulator.
+
+Synthetic players are simulated a day at a time against the current design
+tables (from the registry), with the whole population held in NumPy arrays so
+each day is a handful of vectorized steps rather than a loop over players. Each
+simulated day a player:
+
+- commits their best qualifying crime as often as their energy share and its
+  cooldown allow; every attempt fails (and jails them) with ``jail_risk``,
+- runs their best qualifying mission up to ``missions_per_day`` times,
+- trains their remaining energy at the most effective gym they can enter and
+  afford, using the same closed-form gain as ``game.training``,
+- sometimes buys the most expensive item they can afford.
+
+Crimes, missions and jail share the player's ``active_minutes``: each crime
+takes its cooldown, each arrest its jail time, and missions use what is left.
+A sentence that runs past the day's active time carries over to the next day,
+and a player still in jail does no missions or training.
+
+The game has no levelling rule yet, so the simulator assumes
+``level = 1 + floor(sqrt(experience / level_base))``.
+
+Players are split into fixed-size shards, each with its own child of the seed's
+``SeedSequence``, and the shards run in a process pool; results depend on the
+seed and shard size but not on the number of workers.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError("The balance simulator needs NumPy; install it with `pip install numpy`.") from error
+
+from .training import BASE_GAIN, ENERGY_PER_SESSION, MOOD_PER_SESSION
+
+STATS = ('strength', 'speed', 'dexterity', 'defense')
+
+# Achievement requirements the simulation tracks; the others are never reached.
+TRACKED_REQUIREMENTS = ('crimes', 'missions', 'level', 'money')
+
+
+class Params(NamedTuple):
+    """Behaviour of the synthetic players and the assumptions of the model."""
+
+    energy_per_day: float = 300
+    active_minutes: float = 180
+    missions_per_day: int = 3
+    shop_chance: float = 0.1
+    level_base: float = 100
+    starting_money: float = 1000
+    starting_stat: float = 10
+    mood: float = 100
+
+
+class Design(NamedTuple):
+    """The design tables as arrays, sorted by required level where that matters."""
+
+    crime_levels: np.ndarray
+    crime_stats: np.ndarray
+    crime_energy: np.ndarray
+    crime_experience: np.ndarray
+    crime_money_min: np.ndarray
+    crime_money_max: np.ndarray
+    crime_jail_risk: np.ndarray
+    crime_jail_time: np.ndarray
+    crime_cooldown: np.ndarray
+    mission_levels: np.ndarray
+    mission_stats: np.ndarray
+    mission_experience: np.ndarray
+    mission_money: np.ndarray
+    mission_cooldown: np.ndarray
+    gym_levels: np.ndarray
+    gym_effectiveness: np.ndarray
+    gym_cost: np.ndarray
+    item_prices: np.ndarray
+    achievement_names: tuple
+    achievement_types: tuple
+    achievement_values: np.ndarray
+
+
+def _requirements(records):
+    return np.array(
+        [[getattr(record, f'required_{stat}') for stat in STATS] for record in records], dtype=np.float64,
+    ).reshape(len(records), len(STATS))
+
+
+def _column(records, field, dtype=np.float64):
+    return np.array([float(getattr(record, field)) for record in records], dtype=dtype)
+
+
+def design_from(registry):
+    """Build the simulator's arrays from a design registry snapshot."""
+    crimes = registry.crimes.records
+    missions = sorted(registry.missions.values(), key=lambda mission: (mission.required_level, mission.id))
+    gyms = registry.gyms.records
+    achievements = registry.achievements
+    return Design(
+        crime_levels=_column(crimes, 'required_level'),
+        crime_stats=_requirements(crimes),
+        crime_energy=np.maximum(_column(crimes, 'energy_cost'), 1),
+        crime_experience=_column(crimes, 'experience_reward'),
+        crime_money_min=_column(crimes, 'money_reward_min'),
+        crime_money_max=_column(crimes, 'money_reward_max'),
+        crime_jail_risk=np.clip(_column(crimes, 'jail_risk') / 100, 0, 1),
+        crime_jail_time=_column(crimes, 'jail_time'),
+        crime_cooldown=np.maximum(_column(crimes, 'cooldown'), 1),
+        mission_levels=_column(missions, 'required_level'),
+        mission_stats=_requirements(missions),
+        mission_experience=_column(missions, 'experience_reward'),
+        mission_money=_column(missions, 'money_reward'),
+        mission_cooldown=np.maximum(_column(missions, 'cooldown'), 1),
+        gym_levels=_column(gyms, 'required_level'),
+        gym_effectiveness=_column(gyms, 'effectiveness'),
+        gym_cost=_column(gyms, 'cost_per_session'),
+        item_prices=np.sort(_column(registry.available_items, 'price')),
+        achievement_names=tuple(achievement.name for achievement in achievements),
+        achievement_types=tuple(achievement.requirement_type for achievement in achievements),
+        achievement_values=_column(achievements, 'requirement_value'),
+    )
+
+
+def _best(levels, requirements, level, stats):
+    """Index of each player's highest-level qualifying entry, and whether they have one."""
+    if not len(levels):
+        return np.zeros(len(level), dtype=np.intp), np.zeros(len(level), dtype=bool)
+    qualifies = (levels[None, :] <= level[:, None]) & (requirements[None, :, :] <= stats[:, None, :]).all(axis=2)
+    has = qualifies.any(axis=1)
+    best = len(levels) - 1 - qualifies[:, ::-1].argmax(axis=1)
+    return best, has
+
+
+def _training_gain(sessions, effectiveness, mood, max_mood):
+    """``game.training.training_gain`` over arrays, without enhancers."""
+    productive = np.minimum(sessions, max(math.ceil(mood / MOOD_PER_SESSION), 0))
+    mood_sum = productive * mood - MOOD_PER_SESSION * productive * (productive - 1) / 2
+    return BASE_GAIN * effectiveness * (mood_sum / max_mood)
+
+
+def simulate_shard(design, players, days, seed, params=Params()):
+    """
+    Simulate ``players`` players for ``days`` days.
+
+    Returns the final ``level``, ``money``, ``experience``, ``spent``,
+    ``jail_days`` and ``jail_minutes`` per player and ``achieved``, the day
+    each achievement was reached (-1 if never).
+    """
+    rng = np.random.default_rng(seed)
+    crime_share = rng.beta(2, 2, players)
+    activity = rng.uniform(0.3, 1.0, players)
+
+    level = np.ones(players)
+    experience = np.zeros(players)
+    money = np.full(players, float(params.starting_money))
+    stats = np.full((players, len(STATS)), float(params.starting_stat))
+    crimes_done = np.zeros(players)
+    missions_done = np.zeros(players)
+    earned = np.zeros(players)
+    spent = np.zeros(players)
+    jail_days = np.zeros(players, dtype=np.int64)
+    jail_minutes = np.zeros(players)
+    achieved = np.full((players, len(design.achievement_names)), -1, dtype=np.int64)
+    everyone = np.arange(players)
+    # Jail minutes still to serve when the day starts
+    sentence = np.zeros(players)
+
+    for day in range(days):
+        energy = params.energy_per_day * activity
+        minutes = np.maximum(params.active_minutes - sentence, 0)
+        sentence = np.maximum(sentence - params.active_minutes, 0)
+
+        crime, has_crime = _best(design.crime_levels, design.crime_stats, level, stats)
+        # Players with no crime to commit train with all of their energy.
+        share = crime_share * has_crime
+        if has_crime.any():
+            # An attempt takes the crime's cooldown plus, on average, its share of jail time;
+            # players keep trying while they have time left, so the last arrest may run past the day.
+            expected_minutes = (
+                design.crime_cooldown[crime] + design.crime_jail_risk[crime] * design.crime_jail_time[crime]
+            )
+            attempts = np.minimum(
+                np.floor(energy * share / design.crime_energy[crime]),
+                np.ceil(minutes / expected_minutes),
+            ).astype(np.int64) * has_crime
+            successes = rng.binomial(attempts, 1 - design.crime_jail_risk[crime])
+            low, high = design.crime_money_min[crime], design.crime_money_max[crime]
+            # The sum of `successes` uniform rewards, by its normal approximation.
+            loot = successes * (low + high) / 2 + np.sqrt(successes) * (high - low) / math.sqrt(12) * (
+                rng.standard_normal(players)
+            )
+            loot = np.maximum(loot, 0)
+            money += loot
+            earned += loot
+            experience += successes * design.crime_experience[crime]
+            crimes_done += attempts
+            caught = attempts - successes
+            jail_days += caught > 0
+            jail_minutes += caught * design.crime_jail_time[crime]
+            used = attempts * design.crime_cooldown[crime] + caught * design.crime_jail_time[crime]
+            sentence += np.maximum(used - minutes, 0)
+            minutes = np.maximum(minutes - used, 0)
+        free = sentence == 0
+
+        mission, has_mission = _best(design.mission_levels, design.mission_stats, level, stats)
+        if has_mission.any():
+            runs = np.minimum(
+                params.missions_per_day, np.floor(minutes / design.mission_cooldown[mission]),
+            ) * has_mission * free
+            money += runs * design.mission_money[mission]
+            earned += runs * design.mission_money[mission]
+            experience += runs * design.mission_experience[mission]
+            missions_done += runs
+
+        if len(design.gym_levels):
+            # The most effective gym each player may enter and pay at least one session at
+            usable = (design.gym_levels[None, :] <= level[:, None]) & (design.gym_cost[None, :] <= money[:, None])
+            has_gym = usable.any(axis=1) & free
+            gym = np.where(usable, design.gym_effectiveness[None, :], -np.inf).argmax(axis=1)
+            sessions = np.floor(energy * (1 - share) / ENERGY_PER_SESSION) * has_gym
+            cost = design.gym_cost[gym]
+            affordable = np.where(cost > 0, np.floor(money / np.where(cost > 0, cost, 1)), sessions)
+            sessions = np.minimum(sessions, affordable)
+            money -= sessions * cost
+            gain = _training_gain(sessions, design.gym_effectiveness[gym], params.mood, params.mood)
+            stats[everyone, rng.integers(0, len(STATS), players)] += np.floor(gain + rng.random(players))
+
+        if len(design.item_prices):
+            item = np.searchsorted(design.item_prices, money, side='right') - 1
+            buys = (item >= 0) & (rng.random(players) < params.shop_chance)
+            price = design.item_prices[np.maximum(item, 0)] * buys
+            money -= price
+            spent += price
+
+        level = 1 + np.floor(np.sqrt(experience / params.level_base))
+
+        metrics = {'crimes': crimes_done, 'missions': missions_done, 'level': level, 'money': earned}
+        for index, (kind, value) in enumerate(zip(design.achievement_types, design.achievement_values)):
+            if kind in metrics:
+                reached = (metrics[kind] >= value) & (achieved[:, index] < 0)
+                achieved[reached, index] = day
+
+    return {
+        'level': level,
+        'money': money,
+        'experience': experience,
+        'spent': spent,
+        'jail_days': jail_days,
+        'jail_minutes': jail_minutes,
+        'achieved': achieved,
+    }
+
+
+def _run_shard(args):
+    return simulate_shard(*args)
+
+
+def run(design, players, days, seed=0, workers=None, shard_size=10000, params=Params()):
+    """Simulate ``players`` players for ``days`` days across a process pool; returns the merged arrays."""
+    sizes = [min(shard_size, players - start) for start in range(0, players, shard_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(design, size, days, shard_seed, params) for size, shard_seed in zip(sizes, seeds)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        shards = [_run_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_run_shard, tasks))
+    return {key: np.concatenate([shard[key] for shard in shards]) for key in shards[0]}
+
+
+def summarize(design, result, days):
+    """Distributions of a run: levels, money supply, jail rates and time to each achievement."""
+    level, money, achieved = result['level'], result['money'], result['achieved']
+    percentiles = (10, 50, 90, 99)
+    achievements = []
+    for index, name in enumerate(design.achievement_names):
+        reached = achieved[:, index][achieved[:, index] >= 0]
+        achievements.append({
+            'name': name,
+            'tracked': design.achievement_types[index] in TRACKED_REQUIREMENTS,
+            'reached': len(reached) / len(level),
+            'median_day': float(np.median(reached)) + 1 if len(reached) else None,
+            'p90_day': float(np.percentile(reached, 90)) + 1 if len(reached) else None,
+        })
+    return {
+        'players': len(level),
+        'player_days': len(level) * days,
+        'level': dict(zip(percentiles, np.percentile(level, percentiles))) | {'max': level.max()},
+        'money_supply': money.sum(),
+        'money': dict(zip(percentiles, np.percentile(money, percentiles))),
+        'item_spending': result['spent'].sum(),
+        'jail_rate': result['jail_days'].sum() / (len(level) * days),
+        'ever_jailed': (result['jail_days'] > 0).mean(),
+        'jail_minutes_per_day': result['jail_minutes'].sum() / (len(level) * days),
+        'achievements': achievements,
+    }
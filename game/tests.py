@@ -1,3 +1,1409 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User, Profile
+from . import (
+    async_views, bank, boards, caching, combat, economy, effects, exchange, exports, history, live, operations,
+    player, portfolio, profiles, registry, replays, search, throttle, training, travel, treasury, vaults, views,
+)
+from .middleware import PlayerContextMiddleware
+try:
+    from . import simulation
+except ImportError:  # NumPy is only needed for the balance simulator.
+    simulation = None
+from .models import (
+    Battle, Booster, CombatSheet, CommittedCrime, CompletedMission, Crime, ExportWatermark, Gang, GangLedgerEntry,
+    GangMember, Gym, GymSession, Inventory, InventoryItem, Item, Location, Mission, OwnedProperty, PlayerName,
+    PlayerNameTrigram, Property, StockMarket, StockOrder, StockOwnership, StockPosition, StockTrade, Weapon,
+)
+
+
+def hammer(target, workers):
+    """Run ``target(i)`` from ``workers`` threads at once, each with its own connection."""
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def run(i):
+        try:
+            barrier.wait()
+            target(i)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close_old_connections()
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class VaultConcurrencyTest(TransactionTestCase):
+    """Many players' requests hitting one vault at the same time."""
+
+    workers = 16
+
+    def setUp(self):
+        user = User.objects.create_user('owner@example.com', 'password', username_display='owner')
+        self.profile = Profile.objects.create(user=user, money=Decimal('1000.00'))
+        vault = Property.objects.create(
+            name='Safe', description='', price=0, property_type='vault', storage_capacity=Decimal('100.00'),
+        )
+        self.vault = OwnedProperty.objects.create(profile=self.profile, property=vault)
+
+    def test_concurrent_deposits_never_overfill(self):
+        def deposit(i):
+            profile = Profile.objects.get(pk=self.profile.pk)
+            for _ in range(5):
+                try:
+                    vaults.deposit(profile, self.vault.pk, Decimal('3.00'))
+                except vaults.VaultError:
+                    pass
+
+        errors = hammer(deposit, self.workers)
+        self.assertEqual(errors, [])
+
+        self.vault.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.vault.stored_money, Decimal('99.00'))
+        self.assertEqual(self.profile.money + self.vault.stored_money, Decimal('1000.00'))
+
+    def test_concurrent_deposits_and_withdrawals_conserve_money(self):
+        OwnedProperty.objects.filter(pk=self.vault.pk).update(stored_money=Decimal('50.00'))
+        Profile.objects.filter(pk=self.profile.pk).update(money=Decimal('950.00'))
+
+        def move(i):
+            profile = Profile.objects.get(pk=self.profile.pk)
+            operation = vaults.deposit if i % 2 else vaults.withdraw
+            for _ in range(5):
+                try:
+                    operation(profile, self.vault.pk, Decimal('7.00'))
+                except vaults.VaultError:
+                    pass
+
+        errors = hammer(move, self.workers)
+        self.assertEqual(errors, [])
+
+        self.vault.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.assertGreaterEqual(self.vault.stored_money, 0)
+        self.assertLessEqual(self.vault.stored_money, Decimal('100.00'))
+        self.assertEqual(self.profile.money + self.vault.stored_money, Decimal('1000.00'))
+
+
+    def test_sweep_fills_the_roomiest_vaults_first(self):
+        small = Property.objects.create(
+            name='Drawer', description='', price=0, property_type='vault', storage_capacity=Decimal('30.00'),
+        )
+        drawer = OwnedProperty.objects.create(profile=self.profile, property=small)
+        OwnedProperty.objects.filter(pk=self.vault.pk).update(stored_money=Decimal('20.00'))
+
+        stored = vaults.sweep(self.profile, Decimal('100.00'))
+        self.assertEqual(stored, {self.vault.pk: Decimal('80.00'), drawer.pk: Decimal('20.00')})
+        stored = vaults.sweep(self.profile)
+        self.assertEqual(stored, {drawer.pk: Decimal('10.00')})
+        with self.assertRaises(vaults.VaultError):
+            vaults.sweep(self.profile)
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.money, Decimal('890.00'))
+
+    def test_concurrent_sweeps_never_overfill(self):
+        def sweep(i):
+            profile = Profile.objects.get(pk=self.profile.pk)
+            for _ in range(3):
+                try:
+                    vaults.sweep(profile, Decimal('4.00'))
+                except vaults.VaultError:
+                    pass
+
+        errors = hammer(sweep, self.workers)
+        self.assertEqual(errors, [])
+
+        self.vault.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.assertLessEqual(self.vault.stored_money, Decimal('100.00'))
+        self.assertEqual(self.profile.money + self.vault.stored_money, Decimal('1000.00'))
+
+class ProfileConcurrencyTest(TransactionTestCase):
+    """Requests spending energy and crediting money on one profile at the same time."""
+
+    workers = 16
+
+    def setUp(self):
+        user = User.objects.create_user('player@example.com', 'password', username_display='player')
+        self.profile = Profile.objects.create(user=user, energy=100, money=Decimal('0.00'))
+
+    def test_concurrent_spends_and_credits_are_never_lost(self):
+        spent = []
+
+        def act(i):
+            profile = Profile.objects.get(pk=self.profile.pk)
+            for _ in range(5):
+                if i % 2:
+                    profiles.apply(profile, deltas={'money': Decimal('10.00')})
+                elif profiles.apply(profile, deltas={'energy': -3}, where={'energy__gte': 3}):
+                    spent.append(3)
+
+        errors = hammer(act, self.workers)
+        self.assertEqual(errors, [])
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.money, Decimal('400.00'))
+        self.assertEqual(self.profile.energy, 100 - sum(spent))
+        self.assertGreaterEqual(self.profile.energy, 0)
+        self.assertEqual(self.profile.version, 1 + self.workers // 2 * 5 + len(spent))
+
+    def test_stale_version_is_refused(self):
+        stale = Profile.objects.get(pk=self.profile.pk)
+        profiles.apply(self.profile, deltas={'energy': -10})
+
+        self.assertFalse(profiles.apply(stale, values={'character_type': 'police'}, check_version=True))
+        stale.refresh_from_db()
+        self.assertTrue(profiles.apply(stale, values={'character_type': 'police'}, check_version=True))
+        self.assertEqual(stale.energy, 90)
+
+    def test_saving_a_stale_copy_still_moves_the_version_on(self):
+        # An admin edits a copy loaded before the player's action.
+        stale = Profile.objects.get(pk=self.profile.pk)
+        profiles.apply(self.profile, deltas={'energy': -10})
+        stale.knowledge_points = 5
+        stale.save(update_fields=['knowledge_points'])
+
+        self.assertEqual(stale.version, self.profile.version + 1)
+        self.assertFalse(profiles.apply(self.profile, values={'character_type': 'police'}, check_version=True))
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.energy, self.profile.knowledge_points), (90, 5))
+
+        stale.save()
+        self.profile.refresh_from_db()
+        self.assertEqual(stale.version, self.profile.version)
+
+    def test_saves_read_the_version_back_only_when_it_is_used(self):
+        profile = Profile.objects.get(pk=self.profile.pk)
+        profile.knowledge_points = 3
+        with CaptureQueriesContext(connection) as queries:
+            profile.save(update_fields=['knowledge_points'])
+        self.assertFalse(any(query['sql'].startswith('SELECT') for query in queries))
+        with self.assertNumQueries(1):
+            self.assertEqual(profile.version, self.profile.version + 1)
+        with self.assertNumQueries(0):
+            profile.version
+
+
+class CacheInvalidationTest(TransactionTestCase):
+    """Writes to cached models starting new cache generations."""
+
+    def create_items(self, count):
+        for i in range(count):
+            Item.objects.create(name=f'Item {i}', description='', price=1, item_type='booster')
+
+    def test_one_bump_per_model_and_transaction(self):
+        with mock.patch.object(caching, 'bump') as bump:
+            with transaction.atomic():
+                self.create_items(50)
+                Item.objects.all().delete()
+                self.assertEqual(bump.call_count, 0)
+        bump.assert_called_once_with(Item)
+
+    def test_rolled_back_writes_do_not_bump(self):
+        with mock.patch.object(caching, 'bump') as bump:
+            with transaction.atomic():
+                self.create_items(1)
+                with self.assertRaises(ValueError), transaction.atomic():
+                    self.create_items(1)
+                    raise ValueError
+                transaction.set_rollback(True)
+            self.assertEqual(bump.call_count, 0)
+
+            with transaction.atomic():
+                with self.assertRaises(ValueError), transaction.atomic():
+                    self.create_items(1)
+                    raise ValueError
+                self.create_items(1)
+        bump.assert_called_once_with(Item)
+
+    def test_uncached_models_are_not_bumped(self):
+        with mock.patch.object(caching, 'bump') as bump:
+            User.objects.create_user('player@example.com', 'password', username_display='player')
+        self.assertEqual(bump.call_count, 0)
+
+
+class PlayerSearchTest(TransactionTestCase):
+    """The player search index and the admin searches built on it."""
+
+    def setUp(self):
+        self.profiles = {}
+        for name, email in [('Mike Ross', 'mike@firm.com'), ('Harvey', 'harvey@firm.com'), ('Jessica', 'j@x.org')]:
+            user = User.objects.create_user(email, 'password', username_display=name)
+            self.profiles[name] = Profile.objects.create(user=user)
+
+    def admin_search(self, model, term):
+        model_admin = admin.site._registry[model]
+        request = RequestFactory().get('/')
+        queryset, _ = model_admin.get_search_results(request, model.objects.all(), term)
+        return set(queryset)
+
+    def test_containing_matches_substrings(self):
+        self.assertEqual(set(search.containing('ike').values_list('display', flat=True)), {'Mike Ross'})
+        self.assertEqual(set(search.containing('ARVE').values_list('display', flat=True)), {'Harvey'})
+        self.assertEqual(set(search.containing('e r').values_list('display', flat=True)), {'Mike Ross'})
+        self.assertFalse(search.containing('harvey ross').exists())
+
+    def test_short_texts_only_match_name_starts(self):
+        self.assertEqual(set(search.containing('Mi').values_list('display', flat=True)), {'Mike Ross'})
+        self.assertFalse(search.containing('ik').exists())
+        self.assertNotIn('LIKE', str(search.containing('ik').query))
+
+    def test_admin_search_matches_each_word_in_any_field(self):
+        harvey, mike = self.profiles['Harvey'], self.profiles['Mike Ross']
+        self.assertEqual(self.admin_search(Profile, 'firm.com arv'), {harvey})
+        self.assertEqual(self.admin_search(Profile, 'ross mike@'), {mike})
+        self.assertEqual(self.admin_search(Profile, 'firm.com'), {harvey, mike})
+        self.assertEqual(self.admin_search(Profile, '"mike ross"'), {mike})
+        self.assertEqual(self.admin_search(User, 'je'), {self.profiles['Jessica'].user})
+        self.assertEqual(self.admin_search(User, 'ess'), {self.profiles['Jessica'].user})
+
+    def test_search_page_shows_combat_sheets(self):
+        mike = self.profiles['Mike Ross']
+        profiles.apply(mike, values={'strength': 25, 'defense': 7})
+        self.client.force_login(mike.user)
+        response = self.client.get(reverse('player_search'), {'q': 'mike'})
+        [(match, player, gang, sheet)] = response.context['results']
+        self.assertEqual((player, sheet.attack, sheet.defense), (mike, 25, 7))
+
+    def test_rebuild(self):
+        PlayerNameTrigram.objects.all().delete()
+        self.assertEqual(search.rebuild(), 3)
+        self.assertEqual(PlayerName.objects.count(), 3)
+        self.assertEqual(search.user_ids('harvy'), [self.profiles['Harvey'].user_id])
+
+
+class TravelTest(TransactionTestCase):
+    """Trips and what players cannot do during them."""
+
+    def setUp(self):
+        user = User.objects.create_user('player@example.com', 'password', username_display='player')
+        self.profile = Profile.objects.create(user=user, money=Decimal('500.00'))
+        self.destination = Location.objects.create(
+            name='Vegas', description='', travel_cost=Decimal('100.00'), travel_time=60,
+        )
+        self.gym = Gym.objects.create(name='Gym', description='', effectiveness=1.0, cost_per_session=0)
+
+    def test_cannot_train_while_travelling(self):
+        travel.start_travel(self.profile, self.destination)
+        with self.assertRaisesMessage(training.TrainingError, "travelling"):
+            training.train(self.profile, self.gym, 'strength')
+
+        self.client.force_login(self.profile.user)
+        self.client.post(reverse('train', args=[self.gym.pk]), {'stat': 'strength'})
+        self.assertFalse(GymSession.objects.exists())
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.energy, 100)
+
+    def test_failed_trips_report_the_reason(self):
+        travel.start_travel(self.profile, self.destination)
+        with self.assertRaisesMessage(travel.TravelError, "You are already travelling."):
+            travel.start_travel(self.profile, self.destination)
+
+        Profile.objects.filter(pk=self.profile.pk).update(travel_destination=None, is_in_hospital=True)
+        stale = Profile.objects.get(pk=self.profile.pk)
+        stale.is_in_hospital = False
+        with self.assertRaisesMessage(travel.TravelError, "You are in the hospital and cannot travel."):
+            travel.start_travel(stale, self.destination)
+
+        Profile.objects.filter(pk=self.profile.pk).update(is_in_hospital=False, money=Decimal('10.00'))
+        self.profile.refresh_from_db()
+        with self.assertRaisesMessage(travel.TravelError, "You can't afford the trip to Vegas."):
+            travel.start_travel(self.profile, self.destination)
+
+
+class StockPositionTest(TransactionTestCase):
+    """Lots and cost basis as shares are offered, sold and taken back."""
+
+    def setUp(self):
+        user = User.objects.create_user('seller@example.com', 'password', username_display='seller')
+        self.profile = Profile.objects.create(user=user)
+        self.stock = StockMarket.objects.create(
+            name='Acme', symbol='ACME', description='', current_price=Decimal('10.00'),
+            previous_price=Decimal('10.00'), total_shares=1000, available_shares=0,
+            next_dividend_date=timezone.now(),
+        )
+        with transaction.atomic():
+            portfolio.add_lots({(self.profile.pk, self.stock.pk, Decimal('5.00')): 10})
+        with transaction.atomic():
+            portfolio.add_lots({(self.profile.pk, self.stock.pk, Decimal('8.00')): 10})
+        self.dates = dict(StockOwnership.objects.values_list('purchase_price', 'purchase_date'))
+
+    def lots(self):
+        """``[(price, date, shares)]`` the seller holds; a lot split by an order may come back as two rows."""
+        lots = defaultdict(int)
+        for price, date, shares in StockOwnership.objects.filter(profile=self.profile, order__isnull=True).values_list(
+            'purchase_price', 'purchase_date', 'shares',
+        ):
+            lots[price, date] += shares
+        return sorted((price, date, shares) for (price, date), shares in lots.items())
+
+    def position(self):
+        return StockPosition.objects.filter(profile=self.profile).values_list('shares', 'cost_basis').get()
+
+    def test_market_page_streams_its_prices(self):
+        self.client.force_login(self.profile.user)
+        response = self.client.get(reverse('stock_market'))
+        self.assertEqual(response.context['live_stocks'], ['ACME'])
+        self.assertContains(response, 'data-live-price="ACME"')
+
+    def run_engine(self):
+        engine = exchange.MatchingEngine()
+        engine.load()
+        return engine
+
+    def test_own_orders_do_not_trade(self):
+        lots = self.lots()
+        sell = exchange.place_order(self.profile, self.stock, 'sell', Decimal('10.00'), 5)
+        buy = exchange.place_order(self.profile, self.stock, 'buy', Decimal('10.00'), 5)
+        self.run_engine()
+
+        self.assertFalse(StockTrade.objects.exists())
+        self.assertEqual(StockOrder.objects.get(pk=sell.pk).status, 'cancelled')
+        self.assertEqual(StockOrder.objects.get(pk=buy.pk).status, 'open')
+        self.assertEqual(self.lots(), lots)
+
+    def test_cancel_requests_are_cleared_once_handled(self):
+        buyer = Profile.objects.create(
+            user=User.objects.create_user('buyer@example.com', 'password', username_display='buyer'),
+            money=Decimal('1000.00'),
+        )
+        sell = exchange.place_order(self.profile, self.stock, 'sell', Decimal('10.00'), 5)
+        engine = self.run_engine()
+        exchange.place_order(buyer, self.stock, 'buy', Decimal('10.00'), 5)
+        exchange.cancel_order(self.profile, sell.pk)
+        engine.run_batch()
+
+        order = StockOrder.objects.get(pk=sell.pk)
+        self.assertEqual((order.status, order.cancel_requested), ('filled', False))
+
+    def test_engine_prices_reach_the_live_relay(self):
+        buyer = Profile.objects.create(
+            user=User.objects.create_user('buyer@example.com', 'password', username_display='buyer'),
+            money=Decimal('1000.00'),
+        )
+        topic = live.stock_topic(self.stock.symbol)
+        relay = live.bus.relay
+        relay.watch([topic], os.getpid())
+        self.addCleanup(relay.unwatch, [topic], os.getpid())
+        last_id = relay.last_id()
+        exchange.place_order(self.profile, self.stock, 'sell', Decimal('12.00'), 5)
+        exchange.place_order(buyer, self.stock, 'buy', Decimal('12.00'), 5)
+        self.run_engine()
+
+        ticks = [live.from_json(data) for _, event_topic, _, data, _ in relay.since(last_id) if event_topic == topic]
+        self.assertEqual(ticks, [{'symbol': 'ACME', 'price': '12.00', 'previous': '10.00'}])
+
+    def test_cancelled_sell_order_returns_the_original_lots(self):
+        lots = self.lots()
+        order = exchange.place_order(self.profile, self.stock, 'sell', Decimal('50.00'), 15)
+        self.assertEqual(self.position(), (5, Decimal('40.00')))
+
+        exchange.cancel_order(self.profile, order.pk)
+        engine = exchange.MatchingEngine()
+        engine.load()
+        engine.run_batch()
+
+        self.assertEqual(self.lots(), lots)
+        self.assertEqual(self.position(), (20, Decimal('130.00')))
+
+    def test_partly_filled_order_returns_its_newest_shares(self):
+        order = exchange.place_order(self.profile, self.stock, 'sell', Decimal('12.00'), 15)
+        buyer = Profile.objects.create(
+            user=User.objects.create_user('buyer@example.com', 'password', username_display='buyer'),
+        )
+        exchange.place_order(buyer, self.stock, 'buy', Decimal('12.00'), 12)
+        engine = exchange.MatchingEngine()
+        engine.load()
+        exchange.cancel_order(self.profile, order.pk)
+        engine.run_batch()
+
+        # The 12 shares sold were the 10 bought at 5.00 and 2 of those at 8.00.
+        self.assertEqual(self.lots(), [(Decimal('8.00'), self.dates[Decimal('8.00')], 8)])
+        self.assertEqual(self.position(), (8, Decimal('64.00')))
+        self.assertFalse(StockOwnership.objects.filter(order__isnull=False).exists())
+        self.assertEqual(StockOrder.objects.get(pk=order.pk).status, 'cancelled')
+
+
+class OrderBookTest(SimpleTestCase):
+    """Matching in the exchange's in-memory order books."""
+
+    def setUp(self):
+        self.book = exchange.OrderBook()
+        self.sequence = 0
+        self.ids = iter(range(1, 100))
+
+    def rest(self, side, price, quantity, profile_id=None):
+        order = self.order(side, price, quantity, profile_id)
+        self.sequence += 1
+        self.book.add(order, self.sequence)
+        return order
+
+    def order(self, side, price, quantity, profile_id=None):
+        order_id = next(self.ids)
+        return exchange.BookOrder(order_id, profile_id or order_id, 1, side, Decimal(price), quantity, quantity)
+
+    def test_best_price_then_earliest_order_fills_first(self):
+        first = self.rest('sell', '10.00', 5)
+        cheap = self.rest('sell', '9.00', 5)
+        second = self.rest('sell', '10.00', 5)
+        fills = self.book.match(self.order('buy', '10.00', 12))
+        self.assertEqual(fills, [
+            (cheap, Decimal('9.00'), 5), (first, Decimal('10.00'), 5), (second, Decimal('10.00'), 2),
+        ])
+
+    def test_partial_fill_rests_the_maker_and_stops_at_the_limit(self):
+        ask = self.rest('sell', '10.00', 10)
+        self.rest('sell', '11.00', 10)
+        taker = self.order('buy', '10.50', 4)
+        self.assertEqual(self.book.match(taker), [(ask, Decimal('10.00'), 4)])
+        self.assertEqual((taker.remaining, ask.remaining), (0, 6))
+        self.assertIn(ask.id, self.book.orders)
+
+        taker = self.order('buy', '10.50', 10)
+        self.assertEqual(self.book.match(taker), [(ask, Decimal('10.00'), 6)])
+        self.assertEqual(taker.remaining, 4)
+        self.assertNotIn(ask.id, self.book.orders)
+
+    def test_company_shares_come_before_asks_at_the_same_price(self):
+        self.book.house_price, self.book.house_shares = Decimal('10.00'), 3
+        ask = self.rest('sell', '10.00', 5)
+        fills = self.book.match(self.order('buy', '10.00', 5))
+        self.assertEqual(fills, [(exchange.HOUSE, Decimal('10.00'), 3), (ask, Decimal('10.00'), 2)])
+        self.assertEqual(self.book.house_shares, 0)
+
+    def test_cancelled_orders_are_skipped(self):
+        first = self.rest('buy', '10.00', 5)
+        second = self.rest('buy', '9.00', 5)
+        self.book.remove(first.id)
+        self.assertEqual(self.book.match(self.order('sell', '8.00', 5)), [(second, Decimal('9.00'), 5)])
+
+    def test_own_resting_orders_are_expired_instead_of_filled(self):
+        own = self.rest('sell', '9.00', 5, profile_id=7)
+        other = self.rest('sell', '10.00', 5)
+        taker = self.order('buy', '10.00', 8, profile_id=7)
+        self.assertEqual(self.book.match(taker), [(other, Decimal('10.00'), 5)])
+        self.assertEqual(self.book.expired, [own])
+        self.assertNotIn(own.id, self.book.orders)
+        self.assertEqual(taker.remaining, 3)
+
+    def test_only_one_engine_holds_the_lock(self):
+        with exchange.engine_lock():
+            with self.assertRaises(exchange.EngineRunning), exchange.engine_lock():
+                pass
+        with exchange.engine_lock():
+            pass
+
+
+class EffectsTest(TransactionTestCase):
+    """Modifiers of active effects, as every process sees them."""
+
+    def setUp(self):
+        user = User.objects.create_user('player@example.com', 'password', username_display='player')
+        self.profile = Profile.objects.create(user=user)
+        self.inventory = Inventory.objects.create(profile=self.profile)
+        self.item = Item.objects.create(name='Coffee', description='', price=1, item_type='booster')
+        Booster.objects.create(item=self.item, booster_type='energy', boost_amount=20, duration=30)
+        InventoryItem.objects.create(inventory=self.inventory, item=self.item, quantity=1)
+        # The shared cache outlives the test database, whose ids start over in the next run.
+        caches['shared'].delete(effects._cache_key(self.profile.pk))
+
+    def test_effects_started_elsewhere_are_seen(self):
+        self.assertEqual(effects.get_modifiers(self.profile.pk), effects.NO_MODIFIERS)
+
+        effects.use_item(self.profile, self.inventory, self.item)
+        # Another process has its own cache connections, but the same shared cache.
+        other_process = caches.create_connection('shared')
+        modifiers = other_process.get(effects._cache_key(self.profile.pk))
+        self.assertEqual(modifiers.energy, 20)
+        self.assertEqual(effects.get_modifiers(self.profile.pk), modifiers)
+
+    def test_entries_expire_with_the_first_effect(self):
+        effects.use_item(self.profile, self.inventory, self.item)
+        modifiers = effects.get_modifiers(self.profile.pk)
+        later = modifiers.expires_at + timedelta(seconds=1)
+        with mock.patch('django.utils.timezone.now', return_value=later), \
+                mock.patch('time.time', return_value=later.timestamp()):
+            self.assertIsNone(caches['shared'].get(effects._cache_key(self.profile.pk)))
+            self.assertEqual(effects.get_modifiers(self.profile.pk), effects.NO_MODIFIERS)
+
+
+class PlayerContextTest(TransactionTestCase):
+    """The cached player context and its invalidation across processes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('player@example.com', 'password', username_display='player')
+        self.profile = Profile.objects.create(user=self.user)
+
+    def level(self):
+        request = RequestFactory().get('/')
+        request._cached_user = self.user
+        return player.get_player(request).profile.level
+
+    def test_invalidation_reaches_every_process(self):
+        self.assertEqual(self.level(), 1)
+        # A write that skips the signals leaves the cached context as it was.
+        Profile.objects.filter(pk=self.profile.pk).update(level=5)
+        self.assertEqual(self.level(), 1)
+
+        # Another process bumping the version, through its own cache connection.
+        other_process = caches.create_connection('shared')
+        other_process.set(player._version_key(self.user.pk), time.time_ns(), None)
+        # Seen once this process's copy of the stamp expires.
+        caches['default'].delete(player._version_key(self.user.pk))
+        self.assertEqual(self.level(), 5)
+
+    def test_cached_requests_only_read_the_process_cache(self):
+        self.level()
+        with mock.patch.object(type(caches['shared']), 'get') as shared_get, self.assertNumQueries(0):
+            self.assertEqual(self.level(), 1)
+        shared_get.assert_not_called()
+
+    def test_arrivals_are_only_resolved_for_travellers(self):
+        with mock.patch.object(player, 'resolve_arrival') as resolve_arrival:
+            self.level()
+        resolve_arrival.assert_not_called()
+
+    def session_request(self, session_hash):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        request.session.update({
+            SESSION_KEY: str(self.user.pk),
+            BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+            HASH_SESSION_KEY: session_hash,
+        })
+        return request
+
+    def test_session_hash_is_verified_like_django(self):
+        request = self.session_request(self.user.get_session_auth_hash())
+        self.assertEqual(player.get_player(request).profile, self.profile)
+
+        request = self.session_request('forged')
+        self.assertIsNone(player.get_player(request))
+        self.assertNotIn(SESSION_KEY, request.session)
+
+    def test_sessions_hashed_with_a_fallback_key_are_upgraded(self):
+        with override_settings(SECRET_KEY='old-secret'):
+            old_hash = self.user.get_session_auth_hash()
+        with override_settings(SECRET_KEY_FALLBACKS=['old-secret']):
+            request = self.session_request(old_hash)
+            self.assertEqual(player.get_player(request).profile, self.profile)
+            self.assertEqual(request.session[HASH_SESSION_KEY], self.user.get_session_auth_hash())
+
+
+@override_settings(ACTION_THROTTLES={'default': (3, 60)}, THROTTLE_IP_FACTOR=2)
+class ThrottleTest(TransactionTestCase):
+    """Token buckets of the action throttles."""
+
+    def setUp(self):
+        # The bucket store outlives the test database; a fresh action keeps earlier runs' buckets apart.
+        self.action = f'test-{uuid.uuid4().hex}'
+        self.now = 1000.0
+        clock = mock.patch('time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_buckets_refill_at_the_configured_rate(self):
+        self.assertEqual([throttle.take(self.action, 1, 'ip') for _ in range(3)], [0, 0, 0])
+        # Empty: one token comes back every period / capacity = 20 seconds.
+        self.assertAlmostEqual(throttle.take(self.action, 1, 'ip'), 20)
+        self.now += 15
+        self.assertAlmostEqual(throttle.take(self.action, 1, 'ip'), 5)
+        self.now += 5
+        self.assertEqual(throttle.take(self.action, 1, 'ip'), 0)
+        # The IP's bucket holds 3 * 2 tokens, refilled at 0.1 a second: 6 - 3 + 2 - 1 are left.
+        self.assertEqual([throttle.take(self.action, None, 'ip') for _ in range(4)], [0] * 4)
+        self.assertAlmostEqual(throttle.take(self.action, None, 'ip'), 10)
+
+    def test_rejections_get_retry_after_without_queries(self):
+        view = throttle.throttle(self.action)(lambda request: HttpResponse())
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+        with self.assertNumQueries(0):
+            statuses = [view(request).status_code for _ in range(6)]
+            response = view(request)
+        self.assertEqual(statuses, [200] * 6)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(throttle.rejections()[self.action], 1)
+
+    def test_logged_in_players_are_limited_by_their_session(self):
+        user = User.objects.create_user('player@example.com', 'password', username_display='player')
+        self.client.force_login(user)
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.2')
+        request.session = self.client.session
+        self.assertEqual(throttle.player_key(request), str(user.pk))
+
+        view = throttle.throttle(self.action)(lambda request: HttpResponse())
+        # Only the session identifies the player, so a client cannot shed the player's bucket.
+        self.assertEqual([view(request).status_code for _ in range(4)], [200, 200, 200, 429])
+        request.COOKIES.clear()
+        self.assertEqual(view(request).status_code, 429)
+
+
+class DesignRegistryTest(TransactionTestCase):
+    """Design data served from the registry and cached querysets."""
+
+    def test_records_stand_in_for_instances(self):
+        location = Location.objects.create(name='Vegas', description='', travel_cost=10, travel_time=5)
+        mission = Mission.objects.create(
+            name='Heist', description='', location=location, experience_reward=1, money_reward=1,
+            mission_type='crime', difficulty='hard', cooldown=1,
+        )
+        record = registry.get().missions[mission.pk]
+        self.assertEqual(record.pk, mission.pk)
+        self.assertEqual(record.location.name, 'Vegas')
+        self.assertEqual(record.get_difficulty_display(), mission.get_difficulty_display())
+        self.assertEqual(str(record), str(mission))
+
+    def test_cached_gang_listing_follows_writes(self):
+        Gang.objects.create(name='Crew', description='', gang_type='criminal')
+        self.assertEqual([gang.name for gang in views._gangs_of_type('criminal')], ['Crew'])
+        Gang.objects.create(name='Mob', description='', gang_type='criminal')
+        self.assertEqual([gang.name for gang in views._gangs_of_type('criminal')], ['Crew', 'Mob'])
+
+
+class CombatSheetTest(TransactionTestCase):
+    """Combat sheets following base stat changes."""
+
+    def setUp(self):
+        user = User.objects.create_user('fighter@example.com', 'password', username_display='fighter')
+        self.profile = Profile.objects.create(user=user)
+        self.sheet = combat.combat_sheets([self.profile.pk])[self.profile.pk]
+
+    def test_base_stat_changes_reach_the_sheet(self):
+        profiles.apply(self.profile, deltas={'strength': 5, 'speed': 2})
+        sheet = CombatSheet.objects.get(pk=self.profile.pk)
+        self.assertEqual((sheet.attack, sheet.speed), (self.sheet.attack + 5, self.sheet.speed + 2))
+
+    def test_other_changes_leave_the_sheet_alone(self):
+        with mock.patch('game.signals.sync_base_stats') as sync:
+            profiles.apply(self.profile, deltas={'money': 100})
+            self.profile.save(update_fields=['energy'])
+        sync.assert_not_called()
+
+    def test_sync_reads_the_stored_stats(self):
+        stale = Profile.objects.get(pk=self.profile.pk)
+        Profile.objects.filter(pk=self.profile.pk).update(strength=F('strength') + 7)
+        combat.sync_base_stats(stale)
+        self.assertEqual(CombatSheet.objects.get(pk=self.profile.pk).attack, self.sheet.attack + 7)
+
+    def test_missing_sheets_are_built_in_bulk(self):
+        knife = Item.objects.create(name='Knife', description='', price=1, item_type='weapon')
+        Weapon.objects.create(item=knife, attack_power=4, durability=10, weapon_type='melee')
+        others = [
+            Profile.objects.create(
+                user=User.objects.create_user(f'fighter{i}@example.com', 'password', username_display=f'fighter{i}'),
+            )
+            for i in range(3)
+        ]
+        InventoryItem.objects.create(inventory=Inventory.objects.create(profile=others[0]), item=knife, equipped=True)
+        CombatSheet.objects.exclude(pk=self.profile.pk).delete()
+        ids = [self.profile.pk, *(profile.pk for profile in others)]
+        # Existing sheets, the missing profiles' gear and stats, and one insert in its own transaction.
+        with self.assertNumQueries(6):
+            sheets = combat.combat_sheets(ids)
+        self.assertEqual(
+            [sheets[pk].attack for pk in ids],
+            [self.sheet.attack, others[0].strength + 4, others[1].strength, others[2].strength],
+        )
+        self.assertEqual(
+            dict(CombatSheet.objects.values_list('pk', 'attack_bonus')),
+            {self.profile.pk: 0, others[0].pk: 4, others[1].pk: 0, others[2].pk: 0},
+        )
+
+
+class TreasuryTest(TransactionTestCase):
+    """Gang treasury ledger: contributions, withdrawals and compaction."""
+
+    def setUp(self):
+        self.gang = Gang.objects.create(name='Crew', description='', gang_type='criminal')
+        self.members = {}
+        for role in ('leader', 'member'):
+            user = User.objects.create_user(f'{role}@example.com', 'password', username_display=role)
+            profile = Profile.objects.create(user=user, money=Decimal('500.00'))
+            GangMember.objects.create(gang=self.gang, profile=profile, role=role)
+            self.members[role] = profile
+
+    def money(self, profile):
+        return Profile.objects.values_list('money', flat=True).get(pk=profile.pk)
+
+    def test_contribute_and_withdraw(self):
+        leader, member = self.members['leader'], self.members['member']
+        treasury.contribute(member, self.gang.pk, Decimal('300.00'))
+        with self.assertRaises(treasury.TreasuryError):
+            treasury.contribute(member, self.gang.pk, Decimal('300.00'))
+        with self.assertRaises(treasury.TreasuryError):
+            treasury.withdraw(member, self.gang.pk, Decimal('10.00'))
+        with self.assertRaises(treasury.TreasuryError):
+            treasury.withdraw(leader, self.gang.pk, Decimal('300.01'))
+        treasury.withdraw(leader, self.gang.pk, Decimal('100.00'))
+
+        self.assertEqual(treasury.balance(self.gang.pk), Decimal('200.00'))
+        self.assertEqual((self.money(leader), self.money(member)), (Decimal('600.00'), Decimal('200.00')))
+        self.assertEqual(
+            treasury.member_totals(self.gang.pk, member.pk),
+            {'contributed': Decimal('300.00'), 'withdrawn': Decimal('0.00')},
+        )
+
+    def test_compaction_keeps_balances_and_folds_late_entries(self):
+        member = self.members['member']
+        treasury.contribute(member, self.gang.pk, Decimal('50.00'))
+        treasury.contribute(member, self.gang.pk, Decimal('25.00'))
+        self.assertEqual(treasury.compact(self.gang.pk), 2)
+        self.assertEqual(treasury.compact(self.gang.pk), 0)
+        self.gang.refresh_from_db()
+        self.assertEqual(self.gang.money, Decimal('75.00'))
+
+        # An entry dated before the last compaction, as if its transaction committed late
+        late = GangLedgerEntry.objects.create(gang=self.gang, kind='adjustment', amount=Decimal('5.00'), experience=3)
+        GangLedgerEntry.objects.filter(pk=late.pk).update(date=timezone.now() - timedelta(hours=1))
+        self.assertEqual(treasury.balance(self.gang.pk), Decimal('80.00'))
+        self.assertEqual(treasury.compact_all(), 1)
+        gang = treasury.with_balances(Gang.objects.filter(pk=self.gang.pk)).get()
+        self.assertEqual((gang.money, gang.balance, gang.total_experience), (Decimal('80.00'), Decimal('80.00'), 3))
+
+
+class ReplayTest(SimpleTestCase):
+    """Packing battle rounds into replay blobs and reading them back."""
+
+    def test_round_trip(self):
+        rounds = [replays.Round(i % 7, 3, 100 - i, 90 - i, replays.ATTACKER_HIT) for i in range(20)]
+        for compress in (True, False):
+            replay = replays.Replay(replays.encode(rounds, compress=compress))
+            self.assertEqual(list(replay), rounds)
+            self.assertEqual(replay[-1], rounds[-1])
+            self.assertEqual(replay.totals(), (sum(i % 7 for i in range(20)), 60))
+        self.assertEqual(len(replays.Replay(b'')), 0)
+
+    def test_out_of_range_values_are_clamped(self):
+        blob = replays.encode([(-5, 70000, -1, 123456, replays.DEFENDER_CRITICAL)])
+        self.assertEqual(list(replays.Replay(blob)), [(0, 0xFFFF, 0, 0xFFFF, replays.DEFENDER_CRITICAL)])
+
+    def test_uncompressed_replays_are_read_in_place(self):
+        blob = replays.encode([(1, 2, 3, 4, 0)] * 3)
+        self.assertIs(replays.Replay(blob)._records.obj, blob)
+
+
+class BattleRecordTest(TransactionTestCase):
+    """Saving a resolved battle with its replay."""
+
+    def test_battle_is_saved_with_its_replay(self):
+        attacker, defender = (
+            Profile.objects.create(
+                user=User.objects.create_user(f'{name}@example.com', 'password', username_display=name),
+            )
+            for name in ('brawler', 'victim')
+        )
+        rounds = [replays.Round(10, 4, 100 - 4 * i, 100 - 10 * (i + 1), replays.ATTACKER_HIT) for i in range(10)]
+        battle = combat.record_battle(attacker, defender, rounds, attacker_won=True, experience_gained=5)
+        battle = Battle.objects.get(pk=battle.pk)
+        self.assertEqual((battle.attacker_damage_dealt, battle.defender_damage_dealt), (100, 40))
+        self.assertEqual(list(battle.rounds), rounds)
+
+
+# Publishes one price tick from a separate interpreter: python -c PUBLISHER <relay path> <topic>
+PUBLISHER = """
+import os, sys, django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LAFraud.settings')
+django.setup()
+from game import live
+live.EventBus(live.Relay(sys.argv[1])).publish(sys.argv[2], 'price', {'symbol': 'ACME', 'price': '12.50'})
+"""
+
+
+class LiveRelayTest(SimpleTestCase):
+    """Live events relayed between processes of the host."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'live.sqlite3')
+        self.bus = live.EventBus(live.Relay(self.path))
+
+    def publish_elsewhere(self, topic):
+        subprocess.run([sys.executable, '-c', PUBLISHER, self.path, topic], check=True, cwd=settings.BASE_DIR)
+
+    def test_events_reach_streams_of_another_process(self):
+        async def receive():
+            subscription = self.bus.subscribe([live.stock_topic('ACME')])
+            try:
+                await asyncio.to_thread(self.publish_elsewhere, live.stock_topic('ACME'))
+                return await asyncio.wait_for(subscription.get(), 5)
+            finally:
+                subscription.close()
+
+        event, frame, data = asyncio.run(receive())
+        self.assertEqual((event, data), ('price', {'symbol': 'ACME', 'price': '12.50'}))
+        self.assertEqual(frame, live.encode_event('price', data))
+
+    def test_unwatched_topics_are_not_written(self):
+        self.publish_elsewhere(live.stock_topic('ACME'))
+        self.assertEqual(self.bus.relay.since(0), [])
+
+
+class AsyncViewsTest(TransactionTestCase):
+    """The async views serve what their synchronous versions serve."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('player@example.com', 'password', username_display='player')
+        self.profile = Profile.objects.create(user=self.user)
+
+    def request(self, factory):
+        request = factory.get('/game/')
+        request._cached_user = self.user
+        request._messages = CookieStorage(request)
+        PlayerContextMiddleware(lambda request: None).process_request(request)
+        return request
+
+    def page(self, response):
+        return re.sub(rb'name="csrfmiddlewaretoken" value="[^"]*"', b'', response.content)
+
+    def test_home_matches_the_sync_view(self):
+        expected = self.page(views.game_home(self.request(RequestFactory())))
+        response = asyncio.run(async_views.game_home(self.request(AsyncRequestFactory())))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.page(response), expected)
+
+    def test_release_does_not_undo_a_new_sentence(self):
+        Profile.objects.filter(pk=self.profile.pk).update(
+            is_in_jail=True, jail_release_time=timezone.now() - timedelta(minutes=1),
+        )
+        request = self.request(AsyncRequestFactory())
+        request.player.profile  # The request holds the expired sentence...
+        later = timezone.now() + timedelta(hours=1)
+        # ...while another request jails the player again.
+        Profile.objects.filter(pk=self.profile.pk).update(jail_release_time=later)
+        asyncio.run(async_views.game_home(request))
+
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.is_in_jail, self.profile.jail_release_time), (True, later))
+
+
+@skipUnless(simulation, 'The balance simulator needs NumPy.')
+class SimulationTest(SimpleTestCase):
+    """The balance simulator on a tiny hand-made design."""
+
+    def design(self, jail_risk=0.0, jail_time=0.0, gym_costs=(0.0,)):
+        import numpy as np
+
+        gyms = len(gym_costs)
+        return simulation.Design(
+            crime_levels=np.array([1.0]), crime_stats=np.zeros((1, 4)), crime_energy=np.array([5.0]),
+            crime_experience=np.array([10.0]), crime_money_min=np.array([15.0]), crime_money_max=np.array([15.0]),
+            crime_jail_risk=np.array([jail_risk]), crime_jail_time=np.array([jail_time]),
+            crime_cooldown=np.array([1.0]),
+            mission_levels=np.array([1.0]), mission_stats=np.zeros((1, 4)), mission_experience=np.array([50.0]),
+            mission_money=np.array([100.0]), mission_cooldown=np.array([10.0]),
+            gym_levels=np.ones(gyms), gym_effectiveness=np.arange(1.0, gyms + 1), gym_cost=np.array(gym_costs),
+            item_prices=np.array([]), achievement_names=('Thief',), achievement_types=('crimes',),
+            achievement_values=np.array([100.0]),
+        )
+
+    def test_seeded_runs_repeat_exactly(self):
+        first = simulation.simulate_shard(self.design(jail_risk=0.3, jail_time=30), 50, 10, 7)
+        second = simulation.simulate_shard(self.design(jail_risk=0.3, jail_time=30), 50, 10, 7)
+        for key in first:
+            self.assertTrue((first[key] == second[key]).all(), key)
+        self.assertTrue((first['experience'] > 0).all())
+
+    def test_jail_time_takes_the_day(self):
+        # Every attempt is caught and jails the player for longer than a whole day.
+        result = simulation.simulate_shard(self.design(jail_risk=1.0, jail_time=1000), 20, 3, 1)
+        self.assertTrue((result['experience'] == 0).all())
+        self.assertTrue((result['jail_days'] <= 1).all())
+
+    def test_players_train_at_the_best_gym_they_can_afford(self):
+        # Without arrests and with fixed loot, money only differs by what training costs.
+        untrained = simulation.simulate_shard(self.design(gym_costs=(1e9,)), 20, 5, 3)
+        # The better gym costs more than anyone has; the cheap one is used instead.
+        trained = simulation.simulate_shard(self.design(gym_costs=(1.0, 1e9)), 20, 5, 3)
+        self.assertTrue((trained['money'] < untrained['money']).all())
+
+
+class TrainingTest(TransactionTestCase):
+    """Gym batches: the closed-form gain, what they cost and how many queries they take."""
+
+    def setUp(self):
+        user = User.objects.create_user('trainee@example.com', 'password', username_display='trainee')
+        self.profile = Profile.objects.create(user=user, money=Decimal('100.00'))
+        self.gym = Gym.objects.create(name='Gym', description='', effectiveness=1.0, cost_per_session=Decimal('2.00'))
+        caches['shared'].delete(effects._cache_key(self.profile.pk))
+
+    def test_gain_formula(self):
+        # Mood drops by one per session: (100 + 99 + ... + 91) / 100
+        self.assertAlmostEqual(training.training_gain(10, 1.0, 100, 100), 9.55)
+        self.assertAlmostEqual(training.training_gain(10, 2.0, 100, 100, enhancement_percentage=50), 28.65)
+        # Sessions past the point where mood runs out gain nothing.
+        self.assertAlmostEqual(training.training_gain(10, 1.0, 3, 100), 0.06)
+        self.assertEqual(training.training_gain(0, 1.0, 100, 100), 0)
+
+    def test_fractions_carry_over_so_batching_does_not_matter(self):
+        other = Profile.objects.create(
+            user=User.objects.create_user('other@example.com', 'password', username_display='other'),
+            money=Decimal('100.00'),
+        )
+        training.train(self.profile, self.gym, 'strength', 10)
+        for _ in range(10):
+            training.train(other, self.gym, 'strength', 1)
+        self.assertEqual((self.profile.strength, other.strength), (19, 19))
+        self.assertAlmostEqual(self.profile.training_progress, 0.55)
+        self.assertAlmostEqual(other.training_progress, 0.55)
+        self.assertEqual(GymSession.objects.get(profile=self.profile).stat_gain, 9)
+
+    def test_energy_and_money_limit_the_batch(self):
+        self.assertEqual(training.max_sessions(self.profile, self.gym), 20)
+        with self.assertRaises(training.TrainingError):
+            training.train(self.profile, self.gym, 'strength', 21)
+        Profile.objects.filter(pk=self.profile.pk).update(money=Decimal('5.00'))
+        self.profile.refresh_from_db()
+        self.assertEqual(training.max_sessions(self.profile, self.gym), 2)
+        training.train(self.profile, self.gym, 'speed')
+        self.assertEqual((self.profile.energy, self.profile.money), (90, Decimal('1.00')))
+
+    def test_a_batch_takes_a_fixed_number_of_queries(self):
+        training.train(self.profile, self.gym, 'strength', 1)
+        with self.assertNumQueries(6):
+            training.train(self.profile, self.gym, 'strength', 10)
+
+
+class BulkOperationsTest(TransactionTestCase):
+    """Operator bulk operations: chunked updates, dry runs and refund validation."""
+
+    def setUp(self):
+        self.profiles = [
+            Profile.objects.create(
+                user=User.objects.create_user(f'bulk{i}@example.com', 'password', username_display=f'bulk{i}'),
+                is_in_jail=i % 2 == 0,
+            )
+            for i in range(5)
+        ]
+
+    def test_chunks_walk_the_queryset_in_primary_key_order(self):
+        chunks = list(operations.chunks(Profile.objects.order_by('-pk'), chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([pk for chunk in chunks for pk, in chunk], [profile.pk for profile in self.profiles])
+
+    def test_operations_update_every_chunk(self):
+        self.assertEqual(operations.refund(Profile.objects.all(), Decimal('2.50'), chunk_size=2), 5)
+        self.assertEqual(operations.release_from_jail(Profile.objects.all(), chunk_size=2), 3)
+        self.assertEqual(set(Profile.objects.values_list('money', 'is_in_jail')), {(Decimal('1002.50'), False)})
+        self.assertEqual(set(Profile.objects.values_list('version', flat=True)), {2, 3})
+
+    def test_dry_run_only_counts(self):
+        self.assertEqual(operations.refund(Profile.objects.all(), 10, dry_run=True), 5)
+        self.assertEqual(operations.release_from_jail(Profile.objects.all(), dry_run=True), 3)
+        self.assertEqual(set(Profile.objects.values_list('money', 'version')), {(Decimal('1000.00'), 1)})
+        self.assertEqual(Profile.objects.filter(is_in_jail=True).count(), 3)
+
+    def test_refund_rejects_amounts_that_are_not_positive_cents(self):
+        for amount in (0, Decimal('-5'), Decimal('0.001'), Decimal('NaN')):
+            with self.subTest(amount=amount), self.assertRaises(ValueError):
+                operations.refund(Profile.objects.all(), amount)
+        with self.assertRaises(CommandError):
+            call_command('bulk_players', 'refund', '--amount', '-5', '--dry-run')
+        self.assertEqual(set(Profile.objects.values_list('money', flat=True)), {Decimal('1000.00')})
+
+    def test_admin_form_rejects_a_negative_refund(self):
+        from accounts.admin import BulkActionForm
+        form = BulkActionForm({'action': '', 'amount': '-5'})
+        self.assertIn('amount', form.errors)
+
+
+class EstimatedCountPaginatorTest(TransactionTestCase):
+    """History changelist counts: cached for unfiltered tables, capped for filtered ones."""
+
+    def setUp(self):
+        caches['default'].clear()
+        user = User.objects.create_user('gymrat@example.com', 'password', username_display='gymrat')
+        self.profile = Profile.objects.create(user=user)
+        gym = Gym.objects.create(name='Gym', description='', effectiveness=1.0, cost_per_session=0)
+        self.sessions = [
+            GymSession.objects.create(
+                profile=self.profile, gym=gym, stat_trained='strength', energy_used=5, stat_gain=i,
+            )
+            for i in range(5)
+        ]
+
+    def paginator(self, queryset):
+        from .admin import EstimatedCountPaginator
+        return EstimatedCountPaginator(queryset.order_by('pk'), 2)
+
+    def test_unfiltered_count_is_exact_after_deletes(self):
+        GymSession.objects.filter(pk__in=[self.sessions[-1].pk, self.sessions[-2].pk]).delete()
+        paginator = self.paginator(GymSession.objects.all())
+        self.assertEqual((paginator.count, paginator.num_pages), (3, 2))
+
+    def test_unfiltered_count_is_cached(self):
+        self.assertEqual(self.paginator(GymSession.objects.all()).count, 5)
+        self.sessions[0].delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator(GymSession.objects.all()).count, 5)
+        caches['default'].clear()
+        self.assertEqual(self.paginator(GymSession.objects.all()).count, 4)
+
+    def test_filtered_count_is_capped(self):
+        paginator = self.paginator(GymSession.objects.filter(profile=self.profile))
+        paginator.max_exact_count = 2
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(self.paginator(GymSession.objects.filter(stat_gain__gte=3)).count, 2)
+
+
+class BankTest(TransactionTestCase):
+    """Lazily accrued interest: whole cents credited, the rest carried over."""
+
+    def setUp(self):
+        self.start = timezone.now() - timedelta(days=30)
+        self.profile = Profile.objects.create(
+            user=User.objects.create_user('saver@example.com', 'password', username_display='saver'),
+            bank_money=Decimal('100.00'),
+            bank_accrued_at=self.start,
+        )
+
+    def test_interest_is_split_into_cents_and_carry(self):
+        interest, carry = bank.accrued_interest(Decimal('100.00'), self.start, self.start + timedelta(days=1))
+        self.assertEqual(interest, Decimal('0.01'))
+        self.assertEqual(carry, Decimal('0.0036986301'))
+        self.assertEqual(
+            bank.accrued_interest(Decimal('100.00'), self.start, self.start + timedelta(days=1), carry)[1],
+            Decimal('0.0073972602'),
+        )
+        self.assertEqual(bank.accrued_interest(Decimal('100.00'), None, self.start), (Decimal('0.00'), 0))
+        self.assertEqual(bank.accrued_interest(Decimal('0.00'), self.start, timezone.now()), (Decimal('0.00'), 0))
+
+    def test_settling_often_loses_nothing(self):
+        other = Profile.objects.create(
+            user=User.objects.create_user('patient@example.com', 'password', username_display='patient'),
+            bank_money=Decimal('100.00'),
+            bank_accrued_at=self.start,
+        )
+        for day in range(1, 11):
+            bank.settle(self.profile, now=self.start + timedelta(days=day))
+        bank.settle(other, now=self.start + timedelta(days=10))
+        # Daily settling credits 0.01 a day but carries 0.0037, paid out as a third cent.
+        self.assertEqual(self.profile.bank_money, other.bank_money)
+        self.assertEqual(other.bank_money, Decimal('100.13'))
+
+    def test_reads_only_settle_whole_cents(self):
+        self.assertEqual(bank.settle(self.profile, now=self.start + timedelta(hours=1)), 0)
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.bank_accrued_at, self.profile.bank_interest_carry), (self.start, 0))
+
+    def test_transfers_settle_and_carry(self):
+        interest = bank.deposit(self.profile, Decimal('50.00'))
+        self.profile.refresh_from_db()
+        self.assertEqual(interest, Decimal('0.41'))
+        self.assertEqual(self.profile.bank_money, Decimal('150.41'))
+        self.assertEqual(self.profile.money, Decimal('950.00'))
+        self.assertGreater(self.profile.bank_interest_carry, 0)
+        with self.assertRaises(bank.BankError):
+            bank.withdraw(self.profile, Decimal('200.00'))
+        with self.assertRaises(bank.BankError):
+            bank.deposit(self.profile, Decimal('0'))
+
+    def test_dormant_accounts_carry_the_remainder(self):
+        self.assertEqual(bank.settle_dormant(now=self.start + timedelta(days=29, hours=12)), 1)
+        self.profile.refresh_from_db()
+        interest, carry = bank.accrued_interest(
+            Decimal('100.00'), self.start, self.start + timedelta(days=29, hours=12),
+        )
+        self.assertEqual(self.profile.bank_money, Decimal('100.00') + interest)
+        self.assertEqual(self.profile.bank_interest_carry, carry)
+
+
+class BoardTest(TransactionTestCase):
+    """Mission and crime boards picked from the design registry."""
+
+    def setUp(self):
+        self.vegas = Location.objects.create(name='Vegas', description='', travel_cost=10, travel_time=5)
+        self.reno = Location.objects.create(name='Reno', description='', travel_cost=10, travel_time=5)
+        self.profile = Profile.objects.create(
+            user=User.objects.create_user('crook@example.com', 'password', username_display='crook'),
+            level=3,
+            current_location=self.vegas,
+        )
+        self.crimes = {
+            name: Crime.objects.create(
+                name=name, description='', required_level=level, required_strength=strength, energy_cost=5,
+                experience_reward=1, money_reward_min=1, money_reward_max=2, jail_risk=0, jail_time=1, cooldown=5,
+            )
+            for name, level, strength in (
+                ('pickpocket', 1, 0), ('burglary', 3, 0), ('robbery', 4, 0), ('mugging', 1, 50),
+            )
+        }
+
+    def mission(self, name, location, level=1):
+        return Mission.objects.create(
+            name=name, description='', location=location, required_level=level, experience_reward=1,
+            money_reward=1, mission_type='crime', difficulty='easy', cooldown=5,
+        )
+
+    def test_crimes_the_player_qualifies_for(self):
+        board = boards.crime_board(self.profile)
+        self.assertEqual([crime.name for crime in board.entries], ['pickpocket', 'burglary'])
+        self.assertEqual(board.cooldowns, {})
+
+    def test_cooling_down_crimes(self):
+        until = timezone.now() + timedelta(minutes=5)
+        pickpocket = self.crimes['pickpocket']
+        CommittedCrime.objects.create(profile=self.profile, crime=pickpocket, success=True, next_available_time=until)
+        CommittedCrime.objects.create(
+            profile=self.profile, crime=self.crimes['burglary'], success=True,
+            next_available_time=timezone.now() - timedelta(minutes=1),
+        )
+        self.assertEqual([crime.name for crime in boards.crime_board(self.profile).entries], ['burglary'])
+        board = boards.crime_board(self.profile, runnable=False)
+        self.assertEqual([crime.name for crime in board.entries], ['pickpocket', 'burglary'])
+        self.assertEqual(board.cooldowns, {pickpocket.pk: until})
+
+    def test_missions_at_the_player_location(self):
+        heist = self.mission('heist', self.vegas)
+        self.mission('casino', self.vegas, level=5)
+        self.mission('ranch', self.reno)
+        self.assertEqual([mission.name for mission in boards.mission_board(self.profile).entries], ['heist'])
+        CompletedMission.objects.create(
+            profile=self.profile, mission=heist, next_available_time=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(boards.mission_board(self.profile).entries, ())
+        with self.assertNumQueries(1):
+            self.assertEqual(list(boards.mission_board(self.profile, runnable=False).cooldowns), [heist.pk])
+
+
+class ExportTest(TransactionTestCase):
+    """Streaming history exports and the watermarks of incremental runs."""
+
+    def setUp(self):
+        self.profile = Profile.objects.create(
+            user=User.objects.create_user('analyst@example.com', 'password', username_display='analyst'),
+        )
+        self.gym = Gym.objects.create(name='Gym', description='', effectiveness=1.0, cost_per_session=0)
+        self.add_sessions(5)
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def add_sessions(self, count):
+        for _ in range(count):
+            GymSession.objects.create(
+                profile=self.profile, gym=self.gym, stat_trained='strength', energy_used=5, stat_gain=1,
+            )
+
+    def ids(self):
+        return list(GymSession.objects.order_by('pk').values_list('pk', flat=True))
+
+    def test_stream_tracks_its_progress(self):
+        ids = self.ids()
+        chunks, progress = exports.stream('gym_sessions', 'csv', after=ids[1])
+        self.assertEqual(progress.rows, 0)
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual(lines[0], ','.join(exports.EXPORTS['gym_sessions'].fields))
+        self.assertEqual([int(line.split(',')[0]) for line in lines[1:]], ids[2:])
+        self.assertEqual((progress.rows, progress.last_id), (3, ids[-1]))
+
+    @mock.patch.object(exports, 'BATCH_SIZE', 2)
+    def test_column_batches(self):
+        chunks, progress = exports.stream('gym_sessions', 'column_batches')
+        batches = [json.loads(line) for line in zlib.decompress(b''.join(chunks), wbits=31).splitlines()]
+        self.assertEqual([batch['id'] for batch in batches], [self.ids()[:2], self.ids()[2:4], self.ids()[4:]])
+        self.assertEqual(set(batches[0]), set(exports.EXPORTS['gym_sessions'].fields))
+        self.assertEqual(progress.rows, 5)
+
+    def export(self, *args):
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=len(self.runs))):
+            call_command('export_history', 'gym_sessions', '--output-dir', self.output_dir, *args, stdout=io.StringIO())
+        path, = set(os.listdir(self.output_dir)) - self.runs
+        self.runs.add(path)
+        with open(os.path.join(self.output_dir, path)) as output:
+            return [int(row['id']) for row in csv.DictReader(output)]
+
+    def test_incremental_runs_resume_after_the_watermark(self):
+        self.runs = set()
+        ids = self.ids()
+        self.assertEqual(self.export('--incremental'), ids)
+        self.add_sessions(2)
+        self.assertEqual(self.export('--incremental'), self.ids()[5:])
+        watermark = ExportWatermark.objects.get(name='gym_sessions')
+        self.assertEqual((watermark.last_id, watermark.rows_exported), (self.ids()[-1], 7))
+        # Nothing new: the watermark stays where it is.
+        self.assertEqual(self.export('--incremental'), [])
+        self.assertEqual(ExportWatermark.objects.get(name='gym_sessions').rows_exported, 7)
+        # --after overrides the watermark, and full exports leave it alone.
+        self.assertEqual(self.export('--incremental', '--after', str(ids[2])), self.ids()[3:])
+        self.assertEqual(self.export(), self.ids())
+        self.assertEqual(ExportWatermark.objects.get(name='gym_sessions').rows_exported, 11)
+
+    def test_failed_run_keeps_the_watermark(self):
+        def failing(*args):
+            yield b'id\n'
+            raise OSError('disk full')
+
+        with mock.patch.object(exports, 'stream', return_value=(failing(), exports.Progress(0))):
+            with self.assertRaises(OSError):
+                call_command('export_history', 'gym_sessions', '--incremental', '--output-dir', self.output_dir)
+        self.assertEqual(ExportWatermark.objects.get(name='gym_sessions').last_id, 0)
+
+
+class QuantileSketchTest(SimpleTestCase):
+    """The economy snapshot's quantile sketch against exact quantiles."""
+
+    QUANTILES = (0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999, 1)
+
+    def setUp(self):
+        rng = random.Random(1234)
+        # Cash is heavy-tailed: a lognormal spread over several orders of magnitude.
+        self.values = [rng.lognormvariate(8, 2) for _ in range(20000)]
+
+    def exact(self, values, q):
+        return sorted(values)[int(q * (len(values) - 1))]
+
+    def assertWithinBound(self, sketch, values, accuracy):
+        for q in self.QUANTILES:
+            exact = self.exact(values, q)
+            with self.subTest(q=q):
+                self.assertLessEqual(abs(sketch.quantile(q) - exact), accuracy * exact * (1 + 1e-9))
+
+    def test_relative_error_bound(self):
+        for accuracy in (0.01, 0.05):
+            sketch = economy.QuantileSketch(accuracy)
+            for value in self.values:
+                sketch.add(value)
+            self.assertWithinBound(sketch, self.values, accuracy)
+        self.assertIsNone(economy.QuantileSketch().quantile(0.5))
+
+    def test_merge_matches_a_single_sketch(self):
+        whole = economy.QuantileSketch()
+        parts = [economy.QuantileSketch() for _ in range(3)]
+        for i, value in enumerate(self.values):
+            whole.add(value)
+            parts[i % 3].add(value)
+        merged = economy.QuantileSketch()
+        for part in parts:
+            merged.merge(part)
+        self.assertEqual((merged.count, merged.min, merged.max), (whole.count, whole.min, whole.max))
+        self.assertEqual([merged.quantile(q) for q in self.QUANTILES], [whole.quantile(q) for q in self.QUANTILES])
+        self.assertWithinBound(merged, self.values, 0.01)
+        with self.assertRaises(ValueError):
+            merged.merge(economy.QuantileSketch(0.05))
+
+    def test_values_at_or_below_zero_report_the_minimum(self):
+        sketch = economy.QuantileSketch()
+        for value in (-50, 0, 0, 10, 20):
+            sketch.add(value)
+        self.assertEqual((sketch.quantile(0), sketch.quantile(0.5)), (-50, -50))
+        self.assertLessEqual(abs(sketch.quantile(1) - 20), 0.01 * 20)
+
+
+class HistoryPaginationTest(TransactionTestCase):
+    """Keyset pages of a player's history."""
+
+    def setUp(self):
+        self.profile, self.rival = (
+            Profile.objects.create(
+                user=User.objects.create_user(f'{name}@example.com', 'password', username_display=name),
+            )
+            for name in ('veteran', 'rival')
+        )
+        self.gym = Gym.objects.create(name='Gym', description='', effectiveness=1.0, cost_per_session=0)
+        self.noon = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+    def add_sessions(self, dates):
+        sessions = [
+            GymSession.objects.create(
+                profile=self.profile, gym=self.gym, stat_trained='strength', energy_used=5, stat_gain=1,
+            )
+            for _ in dates
+        ]
+        for session, date in zip(sessions, dates):
+            GymSession.objects.filter(pk=session.pk).update(date=date)
+        return [session.pk for session in sessions]
+
+    def walk(self, name, size, between_pages=None):
+        pks, cursor = [], None
+        while True:
+            page = history.page(name, self.profile, cursor, size=size)
+            pks += [row.pk for row in page.entries]
+            if page.next_cursor is None:
+                return pks
+            if between_pages:
+                between_pages()
+            cursor = page.next_cursor
+
+    def test_ties_on_the_date_are_broken_by_id(self):
+        # Seven sessions at the same instant, with a newer and an older one around them.
+        tied = self.add_sessions([self.noon] * 7)
+        newer, = self.add_sessions([self.noon + timedelta(minutes=1)])
+        older, = self.add_sessions([self.noon - timedelta(minutes=1)])
+        expected = [newer, *reversed(tied), older]
+        for size in (1, 2, 3, 7, 9, 10):
+            with self.subTest(size=size):
+                self.assertEqual(self.walk('gym', size), expected)
+
+    def test_page_boundaries_hold_while_rows_are_inserted(self):
+        pks = self.add_sessions([self.noon - timedelta(minutes=i) for i in range(10)])
+        inserted = []
+
+        def play():
+            # New sessions, one of them at the very date of the page boundary.
+            inserted.extend(self.add_sessions([timezone.now(), self.noon - timedelta(minutes=2)]))
+
+        # Pages after a cursor hold exactly the rows older than it, whatever was added since.
+        self.assertEqual(self.walk('gym', 3, between_pages=play), pks)
+        walked = self.walk('gym', 3)
+        self.assertEqual(len(walked), len(set(walked)))
+        self.assertEqual(set(walked), {*pks, *inserted})
+
+    def test_battles_merge_both_sides_in_order(self):
+        dates = [self.noon] * 4 + [self.noon - timedelta(minutes=1)] * 3
+        battles = []
+        for i, date in enumerate(dates):
+            sides = (self.profile, self.rival) if i % 2 else (self.rival, self.profile)
+            battle = combat.record_battle(*sides, [(1, 1, 10, 10, 0)], attacker_won=True)
+            Battle.objects.filter(pk=battle.pk).update(date=date)
+            battles.append(battle.pk)
+        expected = sorted(battles, key=lambda pk: (dates[battles.index(pk)], pk), reverse=True)
+        for size in (1, 2, 3, 7):
+            with self.subTest(size=size):
+                self.assertEqual(self.walk('battles', size), expected)
+
+    def test_malformed_cursors_are_rejected(self):
+        for cursor in ('', 'x.1', '1', '99999999999999999999999.1'):
+            with self.subTest(cursor=cursor), self.assertRaises(history.HistoryError):
+                history.decode_cursor(cursor)
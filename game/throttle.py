@@ -0,0 +1,164 @@
+"""
+Rate limits for action endpoints.
+
+Every throttled action has a token bucket per player and per client IP. A
+bucket holds up to ``capacity`` tokens and refills ``capacity`` tokens every
+``period`` seconds; each request takes one token from both of its buckets or is
+turned away with a 429. The check happens before the view runs and touches
+neither the game tables nor the session.
+
+The buckets are rows of a small SQLite database of their own, next to the
+shared cache, so every process on the host draws from the same buckets: a
+check is one ``BEGIN IMMEDIATE`` transaction reading and rewriting both rows,
+which never waits on the game database's lock. The player is the user id stored
+in the session, which the view that follows loads anyway; requests without a
+logged-in session are limited by IP only.
+
+Rates come from ``settings.ACTION_THROTTLES`` as ``{action: (capacity, period)}``
+with a ``'default'`` entry; an IP's buckets are ``THROTTLE_IP_FACTOR`` times
+larger, since players can share an address. Rejections are counted per action
+for monitoring (``rejections()``).
+"""
+import hashlib
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.db import connection
+from django.http import HttpResponse
+
+# Every action a view is throttled under, for ``rejections()``.
+ACTIONS = set()
+
+# One check in this many also deletes the buckets idle long enough to be full again.
+PURGE_EVERY = 1000
+
+# Seconds a bucket's row waits for another process's check to finish.
+BUSY_TIMEOUT = 5
+
+_local = threading.local()
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+    ' WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS rejection (action TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID',
+)
+
+
+def _path():
+    # One store per game database, so test databases on the host do not share buckets.
+    name = hashlib.md5(str(connection.settings_dict['NAME']).encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'lafraud-throttle-{name}.sqlite3')
+
+
+def _store():
+    """This thread's connection to the bucket store, opened (and the store created) on first use."""
+    path = _path()
+    store = getattr(_local, 'store', None)
+    if store is None or _local.path != path:
+        store = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        # Buckets are disposable: losing the last writes in a crash only refills them early.
+        store.execute('PRAGMA journal_mode=WAL')
+        store.execute('PRAGMA synchronous=OFF')
+        for statement in _SCHEMA:
+            store.execute(statement)
+        _local.store, _local.path = store, path
+    return store
+
+
+def rate(action):
+    """``(capacity, period)`` of the action's per-player bucket."""
+    return settings.ACTION_THROTTLES.get(action, settings.ACTION_THROTTLES['default'])
+
+
+def _refill(bucket, capacity, period, now):
+    if bucket is None:
+        return capacity
+    tokens, updated_at = bucket
+    return min(capacity, tokens + (now - updated_at) * capacity / period)
+
+
+def take(action, player_id, ip):
+    """
+    Take a token from the action's buckets for ``player_id`` and ``ip``.
+
+    Returns 0 if the request may go ahead, otherwise the seconds until the
+    emptier bucket has a token again; nothing is taken from either bucket then.
+    """
+    capacity, period = rate(action)
+    buckets = {f'{action}:ip:{ip}': capacity * settings.THROTTLE_IP_FACTOR}
+    if player_id is not None:
+        buckets[f'{action}:player:{player_id}'] = capacity
+    store = _store()
+    now = time.time()
+    # The write lock is taken up front, so concurrent checks of any process queue here.
+    store.execute('BEGIN IMMEDIATE')
+    try:
+        stored = {
+            key: (tokens, updated_at)
+            for key, tokens, updated_at in store.execute(
+                f'SELECT key, tokens, updated_at FROM bucket WHERE key IN ({",".join("?" * len(buckets))})',
+                list(buckets),
+            )
+        }
+        tokens = {key: _refill(stored.get(key), size, period, now) for key, size in buckets.items()}
+        wait = max((1 - tokens[key]) * period / size for key, size in buckets.items())
+        if wait <= 0:
+            store.executemany(
+                'INSERT INTO bucket VALUES (?, ?, ?)'
+                ' ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+                [(key, left - 1, now) for key, left in tokens.items()],
+            )
+        else:
+            store.execute(
+                'INSERT INTO rejection VALUES (?, 1) ON CONFLICT (action) DO UPDATE SET count = count + 1',
+                (action,),
+            )
+        if random.randrange(PURGE_EVERY) == 0:
+            longest = max(period for _, period in settings.ACTION_THROTTLES.values())
+            store.execute('DELETE FROM bucket WHERE updated_at < ?', (now - longest,))
+        store.execute('COMMIT')
+    except BaseException:
+        store.execute('ROLLBACK')
+        raise
+    return max(wait, 0)
+
+
+def _reject(wait):
+    response = HttpResponse("Too many requests, slow down.", status=429, content_type='text/plain')
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def rejections():
+    """``{action: number of requests turned away}`` by every process on the host."""
+    counts = dict(_store().execute('SELECT action, count FROM rejection'))
+    return {action: counts.get(action, 0) for action in sorted(ACTIONS)}
+
+
+def player_key(request):
+    """The id of the user logged in to the request's session, or None; the user itself is not loaded."""
+    session = getattr(request, 'session', None)
+    return session.get(SESSION_KEY) if session is not None else None
+
+
+def throttle(action):
+    """Decorate a view so requests beyond the action's rate get a 429 before the view runs."""
+    ACTIONS.add(action)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            wait = take(action, player_key(request), request.META.get('REMOTE_ADDR'))
+            if wait:
+                return _reject(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
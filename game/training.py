@@ -0,0 +1,115 @@
+"""
+Gym training engine.
+
+Each session costs ``ENERGY_PER_SESSION`` energy plus the gym's fee and gains
+``BASE_GAIN * effectiveness * (mood / max_mood) * (1 + enhancement / 100)``
+points of the trained stat, where mood boosters and training enhancers come from
+the player's active effects. Training is tiring: every session costs
+``MOOD_PER_SESSION`` mood, so the mood term is an arithmetic series and the total
+gain of N sessions has a closed form. Stats are whole numbers, so the fractional
+part of a batch's gain is kept in ``Profile.training_progress`` and added to the
+next batch, which makes the total gain the same however the sessions are
+batched. A batch is applied with a single conditional UPDATE and logged as one
+aggregated GymSession.
+"""
+import math
+
+from django.db import transaction
+
+from . import profiles, travel
+from .effects import effective_mood, get_modifiers
+from .models import GymSession
+
+ENERGY_PER_SESSION = 5
+BASE_GAIN = 1.0
+MOOD_PER_SESSION = 1
+
+STATS = [choice for choice, label in GymSession.STAT_CHOICES]
+
+
+class TrainingError(Exception):
+    """Raised when a training batch cannot be run."""
+
+
+def mood_after(mood, sessions):
+    """Player's mood after ``sessions`` consecutive sessions."""
+    return max(mood - MOOD_PER_SESSION * sessions, 0)
+
+
+def training_gain(sessions, effectiveness, mood, max_mood, enhancement_percentage=0):
+    """Total stat gain of ``sessions`` consecutive sessions, in closed form."""
+    if sessions <= 0 or max_mood <= 0:
+        return 0.0
+    # sum(max(mood - MOOD_PER_SESSION * k, 0) for k in range(sessions))
+    productive = min(sessions, max(math.ceil(mood / MOOD_PER_SESSION), 0))
+    mood_sum = productive * mood - MOOD_PER_SESSION * productive * (productive - 1) / 2
+    return BASE_GAIN * effectiveness * (mood_sum / max_mood) * (1 + enhancement_percentage / 100)
+
+
+def split_gain(progress, gain):
+    """``(whole points, fraction left over)`` of ``gain`` added to the carried ``progress``."""
+    total = progress + gain
+    whole = math.floor(total)
+    return whole, total - whole
+
+
+def max_sessions(profile, gym):
+    """Number of sessions the player can afford with their current energy and money."""
+    sessions = profile.energy // ENERGY_PER_SESSION
+    if gym.cost_per_session > 0:
+        sessions = min(sessions, int(profile.money // gym.cost_per_session))
+    return max(sessions, 0)
+
+
+def train(profile, gym, stat, sessions=None):
+    """
+    Run ``sessions`` gym sessions (all the player can afford by default) in one batch.
+
+    The profile row is only updated if it still holds the energy, money and mood the
+    gain was computed from, so concurrent requests cannot overspend. Returns the
+    logged GymSession and refreshes ``profile`` in memory.
+    """
+    if stat not in STATS:
+        raise TrainingError(f"{stat} cannot be trained.")
+    if profile.is_in_jail or profile.is_in_hospital:
+        raise TrainingError("You cannot train right now.")
+    if travel.is_travelling(profile):
+        raise TrainingError("You cannot train while travelling.")
+    if profile.level < gym.required_level:
+        raise TrainingError(f"You need to be level {gym.required_level} to train at {gym.name}.")
+
+    affordable = max_sessions(profile, gym)
+    if sessions is None:
+        sessions = affordable
+    if sessions <= 0 or sessions > affordable:
+        raise TrainingError("You don't have enough energy or money to train.")
+
+    modifiers = get_modifiers(profile.pk)
+    gain, progress = split_gain(profile.training_progress, training_gain(
+        sessions, gym.effectiveness, effective_mood(profile, modifiers), profile.max_mood, modifiers.training,
+    ))
+    energy_used = sessions * ENERGY_PER_SESSION
+    cost = gym.cost_per_session * sessions
+    mood = mood_after(profile.mood, sessions)
+
+    with transaction.atomic():
+        updated = profiles.apply(
+            profile,
+            deltas={'energy': -energy_used, 'money': -cost, stat: gain},
+            values={'mood': mood, 'training_progress': progress},
+            where={
+                'energy__gte': energy_used,
+                'money__gte': cost,
+                'mood': profile.mood,
+                'training_progress': profile.training_progress,
+                'is_in_jail': False,
+                'is_in_hospital': False,
+                'travel_destination__isnull': True,
+            },
+        )
+        if not updated:
+            raise TrainingError("Your stats changed while training. Please try again.")
+        session = GymSession.objects.create(
+            profile=profile, gym=gym, stat_trained=stat, energy_used=energy_used, stat_gain=gain,
+        )
+    return session
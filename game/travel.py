@@ -0,0 +1,136 @@
+"""
+Travel engine.
+
+A Location's ``travel_cost`` and ``travel_time`` are measured from the Home City,
+so a trip between two other locations goes through it. Costs and times for every
+pair of locations are precomputed into the Route table, which is rebuilt whenever
+a location is edited. A trip stores its departure and arrival times on the
+profile; arrival is resolved lazily the next time the profile is read.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Profile
+from . import caching, profiles, registry
+from .models import Location, Mission, Route
+
+
+class TravelError(Exception):
+    """Raised when a trip cannot be started."""
+
+
+def rebuild_routes():
+    """Recompute the all-pairs Route table from the current locations."""
+    locations = list(Location.objects.only('travel_cost', 'travel_time'))
+    routes = [
+        Route(
+            origin=origin,
+            destination=destination,
+            cost=origin.travel_cost + destination.travel_cost,
+            travel_time=origin.travel_time + destination.travel_time,
+        )
+        for origin in locations
+        for destination in locations
+        if origin.pk != destination.pk
+    ]
+    with transaction.atomic():
+        Route.objects.all().delete()
+        Route.objects.bulk_create(routes, batch_size=1000)
+        caching.bump_on_commit(Route)
+
+
+def routes_from(origin_id):
+    """
+    Return ``[(location, cost, travel_time)]`` for every destination reachable from
+    ``origin_id`` (None for the Home City), read from the design registry.
+    """
+    return registry.get().routes_from(origin_id)
+
+
+def route_between(origin_id, destination):
+    """Return ``(cost, travel_time)`` of a trip from ``origin_id`` to ``destination``."""
+    if origin_id is None:
+        return destination.travel_cost, destination.travel_time
+    route = Route.objects.filter(origin_id=origin_id, destination=destination).values_list(
+        'cost', 'travel_time',
+    ).first()
+    if route is None:
+        raise TravelError(f"There is no route to {destination.name}.")
+    return route
+
+
+def is_travelling(profile):
+    return profile.travel_destination_id is not None
+
+
+def resolve_arrival(profile, now=None):
+    """
+    Complete ``profile``'s trip if its arrival time has passed.
+
+    Returns True if the profile arrived. Safe to call on every read: it only writes
+    when an arrival is due, and the conditional update makes it idempotent.
+    """
+    if profile.travel_destination_id is None or profile.arrival_time > (now or timezone.now()):
+        return False
+    arrival = {
+        'current_location_id': F('travel_destination_id'),
+        'travel_destination_id': None,
+        'departure_time': None,
+        'arrival_time': None,
+    }
+    if not profiles.apply(profile, values=arrival, where={'travel_destination_id': profile.travel_destination_id}):
+        # Another request completed the trip first.
+        profile.refresh_from_db(fields=list(arrival))
+    return True
+
+
+def _unable_to_travel(profile):
+    """Why ``profile`` cannot start a trip, or None if it can."""
+    if profile.is_in_jail:
+        return "You are in jail and cannot travel."
+    if profile.is_in_hospital:
+        return "You are in the hospital and cannot travel."
+    if is_travelling(profile):
+        return "You are already travelling."
+    return None
+
+
+def start_travel(profile, destination):
+    """Pay for and start a trip to ``destination``; the profile arrives after the route's time."""
+    reason = _unable_to_travel(profile)
+    if reason:
+        raise TravelError(reason)
+    if profile.current_location_id == destination.pk:
+        raise TravelError(f"You are already in {destination.name}.")
+
+    cost, travel_time = route_between(profile.current_location_id, destination)
+    now = timezone.now()
+    arrival_time = now + timedelta(minutes=travel_time)
+    updated = profiles.apply(
+        profile,
+        deltas={'money': -cost},
+        values={'travel_destination': destination, 'departure_time': now, 'arrival_time': arrival_time},
+        where={
+            'money__gte': cost,
+            'travel_destination__isnull': True,
+            'is_in_jail': False,
+            'is_in_hospital': False,
+        },
+    )
+    if not updated:
+        # The row changed since the profile was read; report what stands in the way now.
+        profile.refresh_from_db(fields=['money', 'travel_destination', 'is_in_jail', 'is_in_hospital'])
+        raise TravelError(_unable_to_travel(profile) or f"You can't afford the trip to {destination.name}.")
+    return arrival_time
+
+
+def players_at(location):
+    """Players currently at ``location`` (not counting those travelling away)."""
+    return Profile.objects.filter(current_location=location, travel_destination__isnull=True)
+
+
+def missions_at(location):
+    return Mission.objects.filter(location=location)
@@ -0,0 +1,130 @@
+"""
+Gang treasuries.
+
+Contributions and withdrawals are appended to GangLedgerEntry instead of
+rewriting ``Gang.money``, so members contributing at the same time only insert
+rows and never queue on the gang's row. ``Gang.money`` and ``Gang.experience``
+hold the running totals of the entries marked ``compacted``; a balance is that
+total plus the entries not marked yet. ``compact`` folds the pending entries
+into the totals and runs periodically (``compact_gang_ledgers``).
+
+Withdrawals lock the gang's row while they check the balance, so two of them
+cannot both spend the same money; contributions never take that lock.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import caching, profiles
+from .models import Gang, GangLedgerEntry, GangMember
+
+# Roles that may withdraw from the treasury and see members' contributions.
+OFFICER_ROLES = ('leader', 'officer')
+
+
+class TreasuryError(Exception):
+    """Raised when money cannot be moved in or out of a gang's treasury."""
+
+
+def _recent(field):
+    """Sum of ``field`` over a gang's entries not yet compacted, for use in annotations."""
+    entries = (
+        GangLedgerEntry.objects.filter(gang=OuterRef('pk'), compacted=False)
+        .order_by()
+        .values('gang')
+        .annotate(total=Sum(field))
+        .values('total')
+    )
+    return Subquery(entries)
+
+
+def with_balances(gangs):
+    """Annotate a Gang queryset with ``balance`` and ``total_experience`` in the same query."""
+    return gangs.annotate(
+        balance=F('money') + Coalesce(_recent('amount'), Value(Decimal('0.00'))),
+        total_experience=F('experience') + Coalesce(_recent('experience'), Value(0)),
+    )
+
+
+def balance(gang_id):
+    return with_balances(Gang.objects.filter(pk=gang_id)).values_list('balance', flat=True).get()
+
+
+def contribute(profile, gang_id, amount):
+    """Move ``amount`` from the player's wallet into the gang's treasury."""
+    if amount <= 0:
+        raise TreasuryError("Enter a positive amount.")
+    if not GangMember.objects.filter(gang_id=gang_id, profile=profile).exists():
+        raise TreasuryError("You are not a member of this gang.")
+    with transaction.atomic():
+        if not profiles.apply(profile, deltas={'money': -amount}, where={'money__gte': amount}):
+            raise TreasuryError("You don't have that much money.")
+        entry = GangLedgerEntry.objects.create(gang_id=gang_id, profile=profile, kind='contribution', amount=amount)
+    return entry
+
+
+def withdraw(profile, gang_id, amount):
+    """Move ``amount`` from the gang's treasury to the player, who must be an officer of the gang."""
+    if amount <= 0:
+        raise TreasuryError("Enter a positive amount.")
+    if not GangMember.objects.filter(gang_id=gang_id, profile=profile, role__in=OFFICER_ROLES).exists():
+        raise TreasuryError("Only the gang's leader and officers can withdraw money.")
+    with transaction.atomic():
+        # Serializes withdrawals (and compaction) of this gang; contributions keep appending.
+        Gang.objects.select_for_update().filter(pk=gang_id).values_list('pk').get()
+        if balance(gang_id) < amount:
+            raise TreasuryError("The treasury doesn't hold that much.")
+        entry = GangLedgerEntry.objects.create(gang_id=gang_id, profile=profile, kind='withdrawal', amount=-amount)
+        profiles.apply(profile, deltas={'money': amount})
+    return entry
+
+
+def compact(gang_id):
+    """
+    Fold the gang's pending entries into its running totals and mark them compacted.
+
+    The entries are picked by id inside the transaction that folds them, so an
+    entry still being written elsewhere is simply left for the next run.
+    Returns the number of entries folded.
+    """
+    with transaction.atomic():
+        Gang.objects.select_for_update().filter(pk=gang_id).values_list('pk').get()
+        entry_ids = list(
+            GangLedgerEntry.objects.filter(gang_id=gang_id, compacted=False).values_list('pk', flat=True)
+        )
+        if not entry_ids:
+            return 0
+        entries = GangLedgerEntry.objects.filter(pk__in=entry_ids)
+        totals = entries.aggregate(count=Count('pk'), amount=Sum('amount'), experience=Sum('experience'))
+        Gang.objects.filter(pk=gang_id).update(
+            money=F('money') + totals['amount'],
+            experience=F('experience') + totals['experience'],
+        )
+        entries.update(compacted=True)
+        caching.bump_on_commit(Gang)
+    return totals['count']
+
+
+def compact_all():
+    """Compact every gang with pending entries; returns the number of gangs."""
+    gang_ids = GangLedgerEntry.objects.filter(compacted=False).values_list('gang_id', flat=True).distinct()
+    return sum(1 for gang_id in list(gang_ids) if compact(gang_id))
+
+
+def member_history(gang_id, profile_id, limit=50):
+    """A member's latest ledger entries, read from the (gang, profile, date) index."""
+    return GangLedgerEntry.objects.filter(gang_id=gang_id, profile_id=profile_id).order_by('-date')[:limit]
+
+
+def member_totals(gang_id, profile_id):
+    """``{'contributed', 'withdrawn'}`` by one member, from the same index range."""
+    totals = GangLedgerEntry.objects.filter(gang_id=gang_id, profile_id=profile_id).aggregate(
+        contributed=Sum('amount', filter=Q(kind='contribution')),
+        withdrawn=Sum('amount', filter=Q(kind='withdrawal')),
+    )
+    return {
+        'contributed': totals['contributed'] or Decimal('0.00'),
+        'withdrawn': -(totals['withdrawn'] or Decimal('0.00')),
+    }
@@ -1,18 +1,51 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+if settings.ASYNC_VIEWS:
+    # ASGI deployment: serve the read-heavy pages from their async versions.
+    from . import async_views
+    read_views = async_views
+else:
+    read_views = views
+
 urlpatterns = [
-    path('', views.game_home, name='game_home'),
+    path('', read_views.game_home, name='game_home'),
     path('inventory/', views.inventory, name='inventory'),
     path('shop/', views.shop, name='shop'),
     path('buy-item/<int:item_id>/', views.buy_item, name='buy_item'),
+    path('equip-item/<int:item_id>/', views.equip_item, name='equip_item'),
+    path('use-item/<int:item_id>/', views.use_item, name='use_item'),
     path('crimes/', views.crimes, name='crimes'),
     path('missions/', views.missions, name='missions'),
     path('gym/', views.gym, name='gym'),
-    path('properties/', views.properties, name='properties'),
+    path('gym/<int:gym_id>/train/', views.train, name='train'),
+    path('properties/', read_views.properties, name='properties'),
+    path('vaults/<int:vault_id>/deposit/', views.vault_deposit, name='vault_deposit'),
+    path('vaults/<int:vault_id>/withdraw/', views.vault_withdraw, name='vault_withdraw'),
+    path('vaults/sweep/', views.vault_sweep, name='vault_sweep'),
     path('travel/', views.travel, name='travel'),
+    path('travel/<int:location_id>/', views.travel_to, name='travel_to'),
+    path('bank/deposit/', views.bank_deposit, name='bank_deposit'),
+    path('bank/withdraw/', views.bank_withdraw, name='bank_withdraw'),
     path('gangs/', views.gangs, name='gangs'),
-    path('stock-market/', views.stock_market, name='stock_market'),
+    path('gangs/treasury/contribute/', views.gang_contribute, name='gang_contribute'),
+    path('gangs/treasury/withdraw/', views.gang_withdraw, name='gang_withdraw'),
+    path('gangs/members/<int:profile_id>/history/', views.gang_member_history, name='gang_member_history'),
+    path('history/<str:name>/', views.action_history, name='action_history'),
+    path('players/', views.player_search, name='player_search'),
+    path('battles/<int:battle_id>/replay/', views.battle_replay, name='battle_replay'),
+    path('stock-market/', read_views.stock_market, name='stock_market'),
+    path('stock-market/<int:stock_id>/order/', views.place_stock_order, name='place_stock_order'),
+    path('stock-market/orders/<int:order_id>/cancel/', views.cancel_stock_order, name='cancel_stock_order'),
     path('achievements/', views.achievements, name='achievements'),
-]
\ No newline at end of file
+    path('economy/', views.economy_dashboard, name='economy_dashboard'),
+    path('export/<str:name>/', views.export_history, name='export_history'),
+    path('throttle/', views.throttle_stats, name='throttle_stats'),
+    path('cache/', views.cache_stats, name='cache_stats'),
+]
+
+if settings.ASYNC_VIEWS:
+    # Server-sent events need the ASGI stack; a WSGI worker would be held per open stream.
+    urlpatterns.append(path('live/', async_views.live_updates, name='live_updates'))
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Vaults: owned properties that store money.
+
+Money moves between ``Profile.money`` and ``OwnedProperty.stored_money`` inside
+one transaction made of two conditional UPDATEs. The wallet balance and the
+vault's ``storage_capacity`` are checked in the statements' WHERE clauses, so
+concurrent deposits can never overdraw a wallet or overfill a vault; when
+either update matches no row the transaction is rolled back.
+"""
+import operator
+from decimal import Decimal
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+
+from . import profiles
+from .models import OwnedProperty
+
+
+class VaultError(Exception):
+    """Raised when money cannot be moved into or out of a vault."""
+
+
+def vaults_of(profile):
+    return OwnedProperty.objects.filter(profile=profile, property__property_type='vault')
+
+
+def _debit_wallet(profile, amount):
+    if not profiles.apply(profile, deltas={'money': -amount}, where={'money__gte': amount}):
+        raise VaultError("You don't have that much money.")
+
+
+def deposit(profile, vault_id, amount):
+    """Move ``amount`` from the wallet into the vault ``vault_id``."""
+    if amount <= 0:
+        raise VaultError("Enter a positive amount.")
+    with transaction.atomic():
+        stored = vaults_of(profile).filter(
+            pk=vault_id, stored_money__lte=F('property__storage_capacity') - amount,
+        ).update(stored_money=F('stored_money') + amount)
+        if not stored:
+            raise VaultError("The vault doesn't have room for that much.")
+        _debit_wallet(profile, amount)
+
+
+def withdraw(profile, vault_id, amount):
+    """Move ``amount`` from the vault ``vault_id`` into the wallet."""
+    if amount <= 0:
+        raise VaultError("Enter a positive amount.")
+    with transaction.atomic():
+        taken = vaults_of(profile).filter(pk=vault_id, stored_money__gte=amount).update(
+            stored_money=F('stored_money') - amount,
+        )
+        if not taken:
+            raise VaultError("The vault doesn't hold that much.")
+        profiles.apply(profile, deltas={'money': amount})
+
+
+def sweep(profile, amount=None):
+    """
+    Spread ``amount`` of the wallet (all of it by default) across the player's vaults.
+
+    The vaults with the most free room are filled first. All vaults are credited
+    with one UPDATE whose per-row conditions re-check the capacities, and the
+    whole sweep is undone if any vault filled up in the meantime. Returns
+    ``{vault_id: amount}`` of what was stored.
+    """
+    amount = profile.money if amount is None else amount
+    if amount <= 0:
+        raise VaultError("There is no money to sweep.")
+
+    free_room = (
+        vaults_of(profile)
+        .annotate(free=F('property__storage_capacity') - F('stored_money'))
+        .filter(free__gt=0)
+        .order_by('-free', 'pk')
+        .values_list('pk', 'free')
+    )
+    allocation = {}
+    remaining = amount
+    for vault_id, free in free_room:
+        if remaining <= 0:
+            break
+        allocation[vault_id] = min(free, remaining)
+        remaining -= allocation[vault_id]
+    if not allocation:
+        raise VaultError("Your vaults are full.")
+    total = amount - remaining
+
+    with transaction.atomic():
+        room_left = reduce(operator.or_, (
+            Q(pk=vault_id, stored_money__lte=F('property__storage_capacity') - share)
+            for vault_id, share in allocation.items()
+        ))
+        stored = vaults_of(profile).filter(room_left).update(stored_money=F('stored_money') + Case(
+            *(When(pk=vault_id, then=Value(share)) for vault_id, share in allocation.items()),
+            default=Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=15, decimal_places=2),
+        ))
+        if stored != len(allocation):
+            raise VaultError("Your vaults changed while sweeping, please try again.")
+        _debit_wallet(profile, total)
+    return allocation
@@ -1,20 +1,46 @@
+from decimal import Decimal, InvalidOperation
+
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 
 from accounts.models import Profile
+from . import (
+    bank, boards, caching, combat, economy, effects, exchange, exports, history, portfolio, profiles, registry,
+    search, training, travel as travel_engine, treasury, vaults,
+)
 from .models import (
-    Item, Inventory, InventoryItem, Property, OwnedProperty, Location, Mission, CompletedMission,
-    Gang, GangMember, Crime, CommittedCrime, Gym, GymSession, Battle, Bounty,
-    StockMarket, StockOwnership, Achievement, EarnedAchievement
+    Item, Inventory, InventoryItem, OwnedProperty, Location, CompletedMission,
+    Gang, GangMember, CommittedCrime, Gym, GymSession, Battle, Bounty,
+    StockMarket, StockOrder, EarnedAchievement
 )
+from .throttle import rejections, throttle
+
+
+def _get_inventory(player):
+    """Return the player's inventory, creating it on first use."""
+    if player.inventory_id is not None:
+        # Loaded together with the profile by the player context.
+        return player.profile.inventory
+    inventory, created = Inventory.objects.get_or_create(profile=player.profile)
+    return inventory
+
+
+@caching.cached_queryset(Gang)
+def _gangs_of_type(gang_type):
+    return Gang.objects.filter(gang_type=gang_type)
 
 
 @login_required
 def game_home(request):
     """Home page for the game."""
-    profile = request.user.profile
+    profile = request.player.profile
+    bank.settle(profile)
     
     # Get player stats
     stats = {
@@ -31,7 +57,7 @@ def game_home(request):
         'knowledge_points': profile.knowledge_points,
         'money': profile.money,
         'bank_money': profile.bank_money,
-        'current_location': profile.current_location,
+        'current_location': profile.location_name,
     }
     
     # Check if player is in jail or hospital
@@ -45,17 +71,23 @@ def game_home(request):
     # Check if player can be released from jail or hospital
     now = timezone.now()
     if profile.is_in_jail and profile.jail_release_time and profile.jail_release_time <= now:
-        profile.is_in_jail = False
-        profile.jail_release_time = None
-        profile.save()
-        messages.success(request, 'You have been released from jail!')
+        released = profiles.apply(
+            profile,
+            values={'is_in_jail': False, 'jail_release_time': None},
+            where={'is_in_jail': True, 'jail_release_time__lte': now},
+        )
+        if released:
+            messages.success(request, 'You have been released from jail!')
         status['is_in_jail'] = False
     
     if profile.is_in_hospital and profile.hospital_release_time and profile.hospital_release_time <= now:
-        profile.is_in_hospital = False
-        profile.hospital_release_time = None
-        profile.save()
-        messages.success(request, 'You have been released from the hospital!')
+        released = profiles.apply(
+            profile,
+            values={'is_in_hospital': False, 'hospital_release_time': None},
+            where={'is_in_hospital': True, 'hospital_release_time__lte': now},
+        )
+        if released:
+            messages.success(request, 'You have been released from the hospital!')
         status['is_in_hospital'] = False
     
     # Get recent activities
@@ -78,10 +110,10 @@ def game_home(request):
 @login_required
 def inventory(request):
     """View for player's inventory."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Get or create inventory
-    inventory, created = Inventory.objects.get_or_create(profile=profile)
+    inventory = _get_inventory(request.player)
     
     # Get inventory items
     inventory_items = InventoryItem.objects.filter(inventory=inventory)
@@ -98,10 +130,10 @@ def inventory(request):
 @login_required
 def shop(request):
     """View for the shop."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Get available items
-    items = Item.objects.filter(is_available=True)
+    items = registry.get().available_items
     
     context = {
         'profile': profile,
@@ -111,10 +143,11 @@ def shop(request):
     return render(request, 'game/shop.html', context)
 
 
+@throttle('shop')
 @login_required
 def buy_item(request, item_id):
     """View for buying an item."""
-    profile = request.user.profile
+    profile = request.player.profile
     item = get_object_or_404(Item, id=item_id, is_available=True)
     
     # Check if player has enough money
@@ -123,31 +156,77 @@ def buy_item(request, item_id):
         return redirect('shop')
     
     # Get or create inventory
-    inventory, created = Inventory.objects.get_or_create(profile=profile)
+    inventory = _get_inventory(request.player)
+    
+    with transaction.atomic():
+        # Update player's money, unless another request spent it first
+        if not profiles.apply(profile, deltas={'money': -item.price}, where={'money__gte': item.price}):
+            messages.error(request, f"You don't have enough money to buy {item.name}.")
+            return redirect('shop')
+        
+        # Check if player already has this item
+        inventory_item, created = InventoryItem.objects.get_or_create(
+            inventory=inventory,
+            item=item,
+            defaults={'quantity': 0}
+        )
+        
+        # Update inventory item quantity
+        InventoryItem.objects.filter(pk=inventory_item.pk).update(quantity=F('quantity') + 1)
     
-    # Check if player already has this item
-    inventory_item, created = InventoryItem.objects.get_or_create(
-        inventory=inventory,
-        item=item,
-        defaults={'quantity': 0}
+    messages.success(request, f"You have bought {item.name} for ${item.price}.")
+    return redirect('inventory')
+
+
+@throttle('inventory')
+@login_required
+def equip_item(request, item_id):
+    """View for equipping or unequipping a weapon, armor or temporary item."""
+    if request.method != 'POST':
+        return redirect('inventory')
+    
+    inventory = _get_inventory(request.player)
+    inventory_item = get_object_or_404(
+        InventoryItem.objects.select_related('item'),
+        inventory=inventory, item_id=item_id, quantity__gte=1,
     )
     
-    # Update inventory item quantity
-    inventory_item.quantity += 1
-    inventory_item.save()
+    if inventory_item.item.item_type not in ('weapon', 'armor', 'temporary'):
+        messages.error(request, f"{inventory_item.item.name} cannot be equipped.")
+        return redirect('inventory')
     
-    # Update player's money
-    profile.money -= item.price
-    profile.save()
+    inventory_item.equipped = not inventory_item.equipped
+    inventory_item.save(update_fields=['equipped'])
     
-    messages.success(request, f"You have bought {item.name} for ${item.price}.")
+    action = 'equipped' if inventory_item.equipped else 'unequipped'
+    messages.success(request, f"You {action} {inventory_item.item.name}.")
+    return redirect('inventory')
+
+
+@throttle('inventory')
+@login_required
+def use_item(request, item_id):
+    """View for using a booster or training enhancer from the inventory."""
+    if request.method != 'POST':
+        return redirect('inventory')
+    
+    profile = request.player.profile
+    item = get_object_or_404(Item, id=item_id)
+    
+    try:
+        effect = effects.use_item(profile, _get_inventory(request.player), item)
+    except effects.EffectError as e:
+        messages.error(request, str(e))
+        return redirect('inventory')
+    
+    messages.success(request, f"You used {item.name}. Its effect lasts until {effect.expires_at:%H:%M}.")
     return redirect('inventory')
 
 
 @login_required
 def crimes(request):
     """View for crimes."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Check if player is in jail or hospital
     if profile.is_in_jail:
@@ -158,21 +237,17 @@ def crimes(request):
         messages.error(request, "You are in the hospital and cannot commit crimes.")
         return redirect('game_home')
     
-    # Get available crimes
-    crimes = Crime.objects.filter(required_level__lte=profile.level)
-    
-    # Get committed crimes with cooldown
-    committed_crimes = CommittedCrime.objects.filter(profile=profile)
-    crime_cooldowns = {}
+    if travel_engine.is_travelling(profile):
+        messages.error(request, "You are travelling and cannot commit crimes.")
+        return redirect('game_home')
     
-    for committed_crime in committed_crimes:
-        if committed_crime.next_available_time > timezone.now():
-            crime_cooldowns[committed_crime.crime.id] = committed_crime.next_available_time
+    # Get available crimes with their cooldowns
+    board = boards.crime_board(profile, runnable=False)
     
     context = {
         'profile': profile,
-        'crimes': crimes,
-        'crime_cooldowns': crime_cooldowns,
+        'crimes': board.entries,
+        'crime_cooldowns': board.cooldowns,
     }
     
     return render(request, 'game/crimes.html', context)
@@ -181,7 +256,7 @@ def crimes(request):
 @login_required
 def missions(request):
     """View for missions."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Check if player is in jail or hospital
     if profile.is_in_jail:
@@ -192,21 +267,17 @@ def missions(request):
         messages.error(request, "You are in the hospital and cannot do missions.")
         return redirect('game_home')
     
-    # Get available missions
-    missions = Mission.objects.filter(required_level__lte=profile.level)
-    
-    # Get completed missions with cooldown
-    completed_missions = CompletedMission.objects.filter(profile=profile)
-    mission_cooldowns = {}
+    if travel_engine.is_travelling(profile):
+        messages.error(request, "You are travelling and cannot do missions.")
+        return redirect('game_home')
     
-    for completed_mission in completed_missions:
-        if completed_mission.next_available_time > timezone.now():
-            mission_cooldowns[completed_mission.mission.id] = completed_mission.next_available_time
+    # Get available missions at the player's location with their cooldowns
+    board = boards.mission_board(profile, runnable=False)
     
     context = {
         'profile': profile,
-        'missions': missions,
-        'mission_cooldowns': mission_cooldowns,
+        'missions': board.entries,
+        'mission_cooldowns': board.cooldowns,
     }
     
     return render(request, 'game/missions.html', context)
@@ -215,7 +286,7 @@ def missions(request):
 @login_required
 def gym(request):
     """View for the gym."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Check if player is in jail or hospital
     if profile.is_in_jail:
@@ -226,8 +297,12 @@ def gym(request):
         messages.error(request, "You are in the hospital and cannot go to the gym.")
         return redirect('game_home')
     
+    if travel_engine.is_travelling(profile):
+        messages.error(request, "You are travelling and cannot go to the gym.")
+        return redirect('game_home')
+    
     # Get available gyms
-    gyms = Gym.objects.filter(required_level__lte=profile.level)
+    gyms = registry.get().gyms.up_to(profile.level)
     
     context = {
         'profile': profile,
@@ -237,13 +312,44 @@ def gym(request):
     return render(request, 'game/gym.html', context)
 
 
+@throttle('train')
+@login_required
+def train(request, gym_id):
+    """View for training at a gym, by default with all of the player's energy."""
+    if request.method != 'POST':
+        return redirect('gym')
+    
+    profile = request.player.profile
+    gym = get_object_or_404(Gym, id=gym_id)
+    
+    # Number of sessions to run; empty means all the player can afford
+    try:
+        sessions = int(request.POST['sessions']) if request.POST.get('sessions') else None
+    except ValueError:
+        messages.error(request, "Invalid number of sessions.")
+        return redirect('gym')
+    
+    try:
+        session = training.train(profile, gym, request.POST.get('stat'), sessions)
+    except training.TrainingError as e:
+        messages.error(request, str(e))
+        return redirect('gym')
+    
+    messages.success(
+        request,
+        f"You trained {session.get_stat_trained_display()} at {gym.name} using {session.energy_used} energy "
+        f"and gained {session.stat_gain} points."
+    )
+    return redirect('gym')
+
+
 @login_required
 def properties(request):
     """View for properties."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Get available properties
-    properties = Property.objects.all()
+    properties = registry.get().properties
     
     # Get owned properties
     owned_properties = OwnedProperty.objects.filter(profile=profile)
@@ -257,10 +363,62 @@ def properties(request):
     return render(request, 'game/properties.html', context)
 
 
+def _vault_transfer(request, vault_id, operation, verb):
+    if request.method != 'POST':
+        return redirect('properties')
+    
+    profile = request.player.profile
+    amount = _posted_amount(request)
+    if amount is None:
+        messages.error(request, "Enter a valid amount.")
+        return redirect('properties')
+    
+    try:
+        operation(profile, vault_id, amount)
+    except vaults.VaultError as e:
+        messages.error(request, str(e))
+        return redirect('properties')
+    
+    messages.success(request, f"You {verb} ${amount}.")
+    return redirect('properties')
+
+
+@throttle('money')
+@login_required
+def vault_deposit(request, vault_id):
+    """View for storing money in a vault."""
+    return _vault_transfer(request, vault_id, vaults.deposit, 'stored')
+
+
+@throttle('money')
+@login_required
+def vault_withdraw(request, vault_id):
+    """View for taking money out of a vault."""
+    return _vault_transfer(request, vault_id, vaults.withdraw, 'took out')
+
+
+@throttle('money')
+@login_required
+def vault_sweep(request):
+    """View for spreading the wallet across all of the player's vaults."""
+    if request.method != 'POST':
+        return redirect('properties')
+    
+    profile = request.player.profile
+    try:
+        stored = vaults.sweep(profile)
+    except vaults.VaultError as e:
+        messages.error(request, str(e))
+        return redirect('properties')
+    
+    messages.success(request, f"You stored ${sum(stored.values())} across {len(stored)} vaults.")
+    return redirect('properties')
+
+
 @login_required
 def travel(request):
     """View for travel."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Check if player is in jail or hospital
     if profile.is_in_jail:
@@ -271,31 +429,95 @@ def travel(request):
         messages.error(request, "You are in the hospital and cannot travel.")
         return redirect('game_home')
     
-    # Get available locations
-    locations = Location.objects.all()
+    # Get destinations with their cost and time from the current location
+    routes = travel_engine.routes_from(profile.current_location_id)
     
     context = {
         'profile': profile,
-        'locations': locations,
+        'routes': routes,
+        'is_travelling': travel_engine.is_travelling(profile),
     }
     
     return render(request, 'game/travel.html', context)
 
 
+@throttle('travel')
+@login_required
+def travel_to(request, location_id):
+    """View for starting a trip to another location."""
+    if request.method != 'POST':
+        return redirect('travel')
+    
+    profile = request.player.profile
+    destination = get_object_or_404(Location, id=location_id)
+    
+    try:
+        arrival_time = travel_engine.start_travel(profile, destination)
+    except travel_engine.TravelError as e:
+        messages.error(request, str(e))
+        return redirect('travel')
+    
+    messages.success(request, f"You are travelling to {destination.name} and will arrive at {arrival_time:%H:%M}.")
+    return redirect('game_home')
+
+
+def _posted_amount(request, field='amount'):
+    """The money amount posted in the form, rounded to the cent, or None if it isn't a number."""
+    try:
+        amount = Decimal(request.POST.get(field, '')).quantize(bank.CENT)
+    except InvalidOperation:
+        return None
+    return None if amount.is_nan() else amount
+
+
+def _bank_transfer(request, operation, verb):
+    if request.method != 'POST':
+        return redirect('game_home')
+    
+    profile = request.player.profile
+    amount = _posted_amount(request)
+    if amount is None:
+        messages.error(request, "Enter a valid amount.")
+        return redirect('game_home')
+    
+    try:
+        operation(profile, amount)
+    except bank.BankError as e:
+        messages.error(request, str(e))
+        return redirect('game_home')
+    
+    messages.success(request, f"You {verb} ${amount}.")
+    return redirect('game_home')
+
+
+@throttle('money')
+@login_required
+def bank_deposit(request):
+    """View for depositing money in the bank."""
+    return _bank_transfer(request, bank.deposit, 'deposited')
+
+
+@throttle('money')
+@login_required
+def bank_withdraw(request):
+    """View for withdrawing money from the bank."""
+    return _bank_transfer(request, bank.withdraw, 'withdrew')
+
+
 @login_required
 def gangs(request):
     """View for gangs."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Get gangs of the player's character type
-    gangs = Gang.objects.filter(gang_type=profile.character_type)
+    gangs = _gangs_of_type(profile.character_type)
     
     # Check if player is in a gang
-    try:
-        gang_membership = GangMember.objects.get(profile=profile)
-        player_gang = gang_membership.gang
-        player_role = gang_membership.role
-    except GangMember.DoesNotExist:
+    player = request.player
+    if player.gang_id is not None:
+        player_gang = treasury.with_balances(Gang.objects.filter(pk=player.gang_id)).get()
+        player_role = player.gang_role
+    else:
         player_gang = None
         player_role = None
     
@@ -309,33 +531,208 @@ def gangs(request):
     return render(request, 'game/gangs.html', context)
 
 
+def _treasury_transfer(request, operation, verb):
+    if request.method != 'POST':
+        return redirect('gangs')
+    
+    player = request.player
+    if player.gang_id is None:
+        messages.error(request, "You are not in a gang.")
+        return redirect('gangs')
+    amount = _posted_amount(request)
+    if amount is None:
+        messages.error(request, "Enter a valid amount.")
+        return redirect('gangs')
+    
+    try:
+        operation(player.profile, player.gang_id, amount)
+    except treasury.TreasuryError as e:
+        messages.error(request, str(e))
+        return redirect('gangs')
+    
+    messages.success(request, f"You {verb} ${amount}.")
+    return redirect('gangs')
+
+
+@throttle('money')
+@login_required
+def gang_contribute(request):
+    """View for contributing money to the player's gang."""
+    return _treasury_transfer(request, treasury.contribute, 'contributed')
+
+
+@throttle('money')
+@login_required
+def gang_withdraw(request):
+    """View for officers withdrawing money from the gang's treasury."""
+    return _treasury_transfer(request, treasury.withdraw, 'withdrew')
+
+
+@login_required
+def gang_member_history(request, profile_id):
+    """View for officers to see a member's contributions to the treasury."""
+    player = request.player
+    if player.gang_id is None or player.gang_role not in treasury.OFFICER_ROLES:
+        messages.error(request, "Only the gang's leader and officers can see contribution histories.")
+        return redirect('gangs')
+    member = get_object_or_404(
+        GangMember.objects.select_related('profile__user'), gang_id=player.gang_id, profile_id=profile_id,
+    )
+    
+    context = {
+        'profile': player.profile,
+        'member': member,
+        'entries': treasury.member_history(player.gang_id, profile_id),
+        'totals': treasury.member_totals(player.gang_id, profile_id),
+    }
+    
+    return render(request, 'game/gang_member_history.html', context)
+
+
+@login_required
+def action_history(request, name):
+    """View for browsing the player's crimes, missions, gym sessions or battles, a page at a time."""
+    if name not in history.HISTORIES:
+        raise Http404("Unknown history.")
+    profile = request.player.profile
+    try:
+        page = history.page(name, profile, request.GET.get('before'))
+    except history.HistoryError as e:
+        messages.error(request, str(e))
+        return redirect('action_history', name=name)
+    
+    context = {
+        'profile': profile,
+        'name': name,
+        'names': list(history.HISTORIES),
+        'entries': page.entries,
+        'next_cursor': page.next_cursor,
+        'first_page': 'before' not in request.GET,
+    }
+    
+    return render(request, 'game/history.html', context)
+
+
+@login_required
+def player_search(request):
+    """View for finding players by display name."""
+    query = request.GET.get('q', '').strip()
+    matches = search.search(query) if query else []
+    # Levels and gangs of the matches, in the order they were ranked
+    players = Profile.objects.select_related('user').in_bulk(
+        [match.user_id for match in matches], field_name='user_id',
+    )
+    gangs = dict(
+        GangMember.objects.filter(profile__user_id__in=players).values_list('profile__user_id', 'gang__name')
+    )
+    # Effective attack and defense, to size up opponents
+    user_ids = {player.pk: user_id for user_id, player in players.items()}
+    sheets = {user_ids[profile_id]: sheet for profile_id, sheet in combat.combat_sheets(list(user_ids)).items()}
+    
+    context = {
+        'profile': request.player.profile,
+        'query': query,
+        'results': [
+            (match, players.get(match.user_id), gangs.get(match.user_id), sheets.get(match.user_id))
+            for match in matches
+        ],
+    }
+    
+    return render(request, 'game/player_search.html', context)
+
+
+@login_required
+def battle_replay(request, battle_id):
+    """View for replaying one of the player's battles round by round."""
+    profile = request.player.profile
+    battle = get_object_or_404(
+        Battle.objects.select_related('attacker__user', 'defender__user'),
+        Q(attacker=profile) | Q(defender=profile),
+        id=battle_id,
+    )
+    
+    context = {
+        'profile': profile,
+        'battle': battle,
+        'rounds': battle.rounds,
+    }
+    
+    return render(request, 'game/battle_replay.html', context)
+
+
 @login_required
 def stock_market(request):
     """View for the stock market."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Get available stocks
     stocks = StockMarket.objects.all()
     
-    # Get owned stocks
-    owned_stocks = StockOwnership.objects.filter(profile=profile)
+    # Get the player's positions, valued in the same query, and open orders
+    positions = portfolio.positions(profile)
+    open_orders = StockOrder.objects.filter(profile=profile, status='open').select_related('stock')
     
     context = {
         'profile': profile,
         'stocks': stocks,
-        'owned_stocks': owned_stocks,
+        'positions': positions,
+        'portfolio': portfolio.valuation(profile),
+        'open_orders': open_orders,
+        'live_stocks': [stock.symbol for stock in stocks],
     }
     
     return render(request, 'game/stock_market.html', context)
 
 
+@throttle('stocks')
+@login_required
+def place_stock_order(request, stock_id):
+    """View for placing a limit order on a stock."""
+    if request.method != 'POST':
+        return redirect('stock_market')
+    
+    profile = request.player.profile
+    stock = get_object_or_404(StockMarket, id=stock_id)
+    price = _posted_amount(request, 'price')
+    try:
+        quantity = int(request.POST.get('quantity', ''))
+    except ValueError:
+        quantity = None
+    if price is None or quantity is None:
+        messages.error(request, "Enter a valid price and number of shares.")
+        return redirect('stock_market')
+    
+    try:
+        exchange.place_order(profile, stock, request.POST.get('side'), price, quantity)
+    except exchange.ExchangeError as e:
+        messages.error(request, str(e))
+        return redirect('stock_market')
+    
+    messages.success(request, f"Your order for {quantity} shares of {stock.symbol} at ${price} has been placed.")
+    return redirect('stock_market')
+
+
+@throttle('stocks')
+@login_required
+def cancel_stock_order(request, order_id):
+    """View for cancelling an open stock order."""
+    if request.method != 'POST':
+        return redirect('stock_market')
+    
+    if exchange.cancel_order(request.player.profile, order_id):
+        messages.success(request, "Your order will be cancelled shortly.")
+    else:
+        messages.error(request, "That order is no longer open.")
+    return redirect('stock_market')
+
+
 @login_required
 def achievements(request):
     """View for achievements."""
-    profile = request.user.profile
+    profile = request.player.profile
     
     # Get all achievements
-    achievements = Achievement.objects.all()
+    achievements = registry.get().achievements
     
     # Get earned achievements
     earned_achievements = EarnedAchievement.objects.filter(profile=profile)
@@ -347,4 +744,54 @@ def achievements(request):
         'earned_achievement_ids': earned_achievement_ids,
     }
     
-    return render(request, 'game/achievements.html', context)
\ No newline at end of file
+    return render(request, 'game/achievements.html', context)
+
+
+@staff_member_required
+def export_history(request, name):
+    """
+    Stream an analytics export to staff.
+    
+    Query parameters: ``format`` (csv, jsonl or column_batches), ``gzip=1`` and ``after``,
+    the last id the client already has.
+    """
+    if name not in exports.EXPORTS:
+        raise Http404("Unknown export.")
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return HttpResponseBadRequest("Unknown format.")
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        return HttpResponseBadRequest("after must be an id.")
+    compress = request.GET.get('gzip') == '1'
+    
+    chunks, _ = exports.stream(name, fmt, after, compress)
+    response = StreamingHttpResponse(chunks, content_type=exports.content_type(fmt, compress))
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(name, fmt, compress)}"'
+    return response
+
+
+@staff_member_required
+def economy_dashboard(request):
+    """Money supply and cash distribution over time, read from the economy snapshots only."""
+    snapshots = economy.history()
+    
+    context = {
+        'snapshots': snapshots,
+        'latest': snapshots[-1] if snapshots else None,
+    }
+    
+    return render(request, 'game/economy.html', context)
+
+
+@staff_member_required
+def throttle_stats(request):
+    """Requests turned away by each action throttle, for monitoring."""
+    return JsonResponse({'rejections': rejections()})
+
+
+@staff_member_required
+def cache_stats(request):
+    """Cache hits and misses of this process by namespace, for monitoring."""
+    return JsonResponse({'namespaces': caching.stats()})